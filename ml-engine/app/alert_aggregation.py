@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from .alerts import dispatcher
+from .config import get_settings
+from .schemas import AlertPayload
+from .state_backend import state
+
+GroupKey = Tuple[str, str]
+
+_SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2}
+
+
+@dataclass
+class _AlertGroup:
+    """Alerts of one type in one zone within the current window."""
+    opened_at: float
+    first: AlertPayload
+    folded: List[AlertPayload] = field(default_factory=list)
+    tourists: Set[str] = field(default_factory=set)
+
+
+class AlertAggregator:
+    """Groups alert storms into digests before they reach the dispatcher.
+
+    For aggregated types, the first alert for a (zone, type) in a window is
+    dispatched as usual; for the rest only the admin panel fan-out is
+    suppressed and folded into a single digest when the window closes.
+    Each folded alert is still delivered to its own tourist and family.
+    A sliding-window count per group is kept for monitoring. Other alert
+    types pass straight through.
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[AlertPayload], None],
+        aggregate_types: Optional[Set[str]] = None,
+        window_seconds: Optional[float] = None,
+        count_window_seconds: Optional[float] = None,
+        max_digests: int = 200,
+    ) -> None:
+        settings = get_settings()
+        self._dispatch = dispatch
+        self.aggregate_types = aggregate_types if aggregate_types is not None else {
+            t.strip() for t in settings.alert_aggregate_types.split(",") if t.strip()
+        }
+        self.window_seconds = window_seconds or settings.alert_aggregate_window_seconds
+        self.count_window_seconds = count_window_seconds or settings.alert_count_window_seconds
+        self._groups: Dict[GroupKey, _AlertGroup] = {}
+        self._counts: Dict[GroupKey, Deque[float]] = defaultdict(deque)
+        self.max_digests = max_digests
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, alert: AlertPayload) -> bool:
+        """Dispatch an alert, folding its admin panel delivery into a digest during a storm.
+
+        Returns:
+            True if the alert was dispatched to every recipient, False if
+            its admin panel delivery was folded into a digest
+        """
+        if alert.alert_type not in self.aggregate_types:
+            self._dispatch(alert)
+            return True
+
+        self._start()
+        key = (alert.metadata.get("zone", "*"), alert.alert_type)
+        now = time.monotonic()
+        expired = None
+
+        with self._lock:
+            counts = self._counts[key]
+            counts.append(now)
+            self._trim(counts, now)
+
+            group = self._groups.get(key)
+            if group is not None and now - group.opened_at >= self.window_seconds:
+                expired = self._groups.pop(key)
+                group = None
+
+            if group is None:
+                self._groups[key] = _AlertGroup(opened_at=now, first=alert, tourists={alert.tourist_id})
+                passed = True
+            else:
+                group.folded.append(alert)
+                group.tourists.add(alert.tourist_id)
+                passed = False
+
+        if expired is not None:
+            self._emit_digest(key, expired)
+        self._dispatch(alert if passed else alert.model_copy(update={"folded": True}))
+        return passed
+
+    def flush(self, force: bool = False) -> int:
+        """Close expired (or, with `force`, all) groups and emit their digests."""
+        now = time.monotonic()
+        with self._lock:
+            keys = [
+                key for key, group in self._groups.items()
+                if force or now - group.opened_at >= self.window_seconds
+            ]
+            closed = [(key, self._groups.pop(key)) for key in keys]
+            for key in list(self._counts):
+                self._trim(self._counts[key], now)
+                if not self._counts[key]:
+                    del self._counts[key]
+
+        return sum(self._emit_digest(key, group) for key, group in closed)
+
+    def window_counts(self) -> List[Dict[str, object]]:
+        """Alerts per (zone, type) over the sliding count window."""
+        now = time.monotonic()
+        with self._lock:
+            rows = []
+            for (zone, alert_type), counts in self._counts.items():
+                self._trim(counts, now)
+                if counts:
+                    rows.append({"zone": zone, "alert_type": alert_type, "count": len(counts)})
+        return sorted(rows, key=lambda row: row["count"], reverse=True)
+
+    def recent_digests(self, limit: int = 50) -> List[AlertPayload]:
+        """Most recent digests of every worker, oldest first."""
+        return state.range("alert_digests", "all", model=AlertPayload)[-limit:]
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.flush(force=True)
+
+    def _start(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name="alert-aggregator", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        interval = max(0.5, min(self.window_seconds / 4, 5.0))
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[ALERT] Aggregation flush error: {e}")
+
+    def _trim(self, counts: Deque[float], now: float) -> None:
+        while counts and now - counts[0] > self.count_window_seconds:
+            counts.popleft()
+
+    def _emit_digest(self, key: GroupKey, group: _AlertGroup) -> int:
+        if not group.folded:
+            return 0
+        zone, alert_type = key
+        alerts = [group.first, *group.folded]
+        severity = max((a.severity for a in alerts), key=_SEVERITY_RANK.__getitem__)
+        tourists = sorted(group.tourists)
+        # Epoch seconds: observations may mix naive and aware timestamps
+        by_time = sorted(alerts, key=lambda a: a.timestamp.timestamp())
+        where = f" in {zone}" if zone != "*" else ""
+
+        digest = AlertPayload(
+            tourist_id="*",
+            trip_id="*",
+            timestamp=datetime.now(timezone.utc),
+            alert_type="digest",
+            severity=severity,  # type: ignore[arg-type]
+            message=(
+                f"{len(group.folded)} more {alert_type} alerts{where} "
+                f"from {len(tourists)} tourists in the last {int(self.window_seconds)}s."
+            ),
+            metadata={
+                "zone": zone,
+                "grouped_type": alert_type,
+                "count": str(len(alerts)),
+                "folded": str(len(group.folded)),
+                "tourist_count": str(len(tourists)),
+                "tourists": ",".join(tourists[:50]),
+                "first_at": by_time[0].timestamp.isoformat(),
+                "last_at": by_time[-1].timestamp.isoformat(),
+            },
+        )
+        with state.atomic():
+            state.append("alert_digests", "all", digest.timestamp.timestamp(), digest)
+            state.trim("alert_digests", "all", keep=self.max_digests)
+        self._dispatch(digest)
+        return 1
+
+
+aggregator = AlertAggregator(dispatcher.dispatch)
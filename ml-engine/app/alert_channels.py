@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from typing import Dict, List, Optional, Sequence, Type
+
+from .schemas import AlertPayload
+
+
+class ChannelError(Exception):
+    """Raised by a channel when a delivery attempt fails and may be retried."""
+
+
+class AlertChannel:
+    """Delivery adapter for one notification channel (SMS, push, ...).
+
+    Subclasses implement `send`; the dispatcher handles queueing, retries
+    and dead-lettering. `recipients` lists the AlertPayload recipients the
+    channel serves.
+    """
+
+    name: str = "channel"
+    recipients: Sequence[str] = ()
+
+    def __init__(self, recipients: Optional[Sequence[str]] = None) -> None:
+        if recipients is not None:
+            self.recipients = tuple(recipients)
+
+    def accepts(self, alert: AlertPayload) -> bool:
+        return any(r in self.recipients for r in alert.recipients)
+
+    async def send(self, alert: AlertPayload) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Release provider connections, if any."""
+
+
+class ConsoleChannel(AlertChannel):
+    """Logs alerts to stdout (the default until real providers are wired up)."""
+
+    name = "console"
+    recipients = ("tourist", "admin_panel", "family")
+
+    async def send(self, alert: AlertPayload) -> None:
+        print(
+            f"[ALERT] {alert.alert_type.upper()} for {alert.tourist_id}/{alert.trip_id}: "
+            f"{alert.message} (severity={alert.severity})"
+        )
+
+
+class MockChannel(AlertChannel):
+    """In-memory channel for local runs and tests.
+
+    Records every delivered alert and can simulate provider latency and
+    transient failures.
+    """
+
+    name = "mock"
+    recipients = ("tourist", "admin_panel", "family")
+
+    def __init__(
+        self,
+        recipients: Optional[Sequence[str]] = None,
+        latency_seconds: float = 0.0,
+        failure_rate: float = 0.0,
+        name: Optional[str] = None,
+    ) -> None:
+        super().__init__(recipients)
+        if name is not None:
+            self.name = name
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self.delivered: List[AlertPayload] = []
+        self.attempts = 0
+
+    async def send(self, alert: AlertPayload) -> None:
+        self.attempts += 1
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ChannelError(f"{self.name}: simulated delivery failure")
+        self.delivered.append(alert)
+
+
+CHANNEL_TYPES: Dict[str, Type[AlertChannel]] = {
+    ConsoleChannel.name: ConsoleChannel,
+    MockChannel.name: MockChannel,
+}
+
+
+def register_channel_type(channel_type: Type[AlertChannel]) -> None:
+    """Make a channel adapter selectable through `alert_channels`."""
+    CHANNEL_TYPES[channel_type.name] = channel_type
+
+
+def build_channels(names: str) -> List[AlertChannel]:
+    """Instantiate channels from a comma-separated list of adapter names."""
+    channels: List[AlertChannel] = []
+    for name in (n.strip() for n in names.split(",")):
+        if not name:
+            continue
+        channel_type = CHANNEL_TYPES.get(name)
+        if channel_type is None:
+            raise ValueError(f"Unknown alert channel '{name}' (known: {', '.join(CHANNEL_TYPES)})")
+        channels.append(channel_type())
+    return channels
+
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .config import get_settings
+from .schemas import AlertPayload
+from .state_backend import StateBackend, state
+
+
+class AlertStore:
+    """Bounded alert history with a per-trip time index.
+
+    Retention is enforced against wall-clock time whenever a trip gets a
+    new alert, with a cap on alerts per trip and on the number of trips
+    tracked; the least recently alerted trips are evicted first. Alerts
+    are kept as time series in the state backend, one per trip.
+    """
+
+    NAMESPACE = "alerts"
+
+    def __init__(
+        self,
+        backend: StateBackend,
+        retention_hours: float = 72,
+        max_alerts_per_trip: int = 1000,
+        max_trips: int = 10000,
+    ) -> None:
+        self.backend = backend
+        self.retention = timedelta(hours=retention_hours)
+        self.max_alerts_per_trip = max_alerts_per_trip
+        self.max_trips = max_trips
+
+    @classmethod
+    def from_settings(cls) -> "AlertStore":
+        settings = get_settings()
+        return cls(
+            state,
+            retention_hours=settings.alert_retention_hours,
+            max_alerts_per_trip=settings.alert_max_per_trip,
+            max_trips=settings.alert_max_trips,
+        )
+
+    def add(self, alert: AlertPayload) -> None:
+        ns = self.NAMESPACE
+        with self.backend.atomic():
+            new_trip = self.backend.last_ts(ns, alert.trip_id) is None
+            self.backend.append(ns, alert.trip_id, alert.timestamp.timestamp(), alert)
+            self.backend.trim(
+                ns,
+                alert.trip_id,
+                before=time.time() - self.retention.total_seconds(),
+                keep=self.max_alerts_per_trip,
+            )
+            if new_trip:
+                # Only a new trip can take the store over its trip limit
+                self.backend.limit_series(ns, self.max_trips)
+
+    def query(
+        self,
+        trip_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        severity: Optional[str] = None,
+        alert_type: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[List[AlertPayload], int]:
+        """Alerts for a trip in time order.
+
+        Returns:
+            (page of alerts, total number matching the filters)
+        """
+        alerts = self.backend.range(
+            self.NAMESPACE,
+            trip_id,
+            since=since.timestamp() if since else None,
+            until=until.timestamp() if until else None,
+            model=AlertPayload,
+        )
+
+        if severity is not None:
+            alerts = [a for a in alerts if a.severity == severity]
+        if alert_type is not None:
+            alerts = [a for a in alerts if a.alert_type == alert_type]
+
+        total = len(alerts)
+        end = None if limit is None else offset + limit
+        return alerts[offset:end], total
+
+    def recent(self, since: datetime) -> List[AlertPayload]:
+        """Retained alerts of every trip at or after `since`."""
+        return self.backend.range_all(self.NAMESPACE, since.timestamp(), model=AlertPayload)
+
+    def history(self, trip_id: str) -> List[AlertPayload]:
+        """All retained alerts for a trip."""
+        return self.query(trip_id)[0]
+
+    def stats(self) -> Dict[str, int]:
+        trips, alerts = self.backend.series_stats(self.NAMESPACE)
+        return {"trips": trips, "alerts": alerts}
+
+
+alert_store = AlertStore.from_settings()
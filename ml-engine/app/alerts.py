@@ -1,36 +1,222 @@
 from __future__ import annotations
 
-from typing import Dict, List
-
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from .alert_channels import AlertChannel, build_channels
+from .alert_store import alert_store
+from .config import get_settings
+from .realtime import hub
 from .schemas import AlertPayload
+from .state_backend import state
+
+
+@dataclass
+class DeadLetter:
+    channel: str
+    alert: AlertPayload
+    error: str
+    attempts: int
+    failed_at: datetime = field(default_factory=datetime.utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            "channel": self.channel,
+            "trip_id": self.alert.trip_id,
+            "tourist_id": self.alert.tourist_id,
+            "alert_type": self.alert.alert_type,
+            "error": self.error,
+            "attempts": self.attempts,
+            "failed_at": self.failed_at.isoformat(),
+        }
+
+
+class ChannelMetrics:
+    """Delivery counters and recent latencies for one channel."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.enqueued = 0
+        self.delivered = 0
+        self.retried = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+
+    def observe_latency(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def snapshot(self, queue_depth: int) -> dict:
+        latencies = sorted(self._latencies)
+        p50 = latencies[len(latencies) // 2] if latencies else None
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+        return {
+            "queue_depth": queue_depth,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "dead_lettered": self.dead_lettered,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
 
 
 class AlertDispatcher:
-    """Stub dispatcher; extend with SMS/email/push providers."""
-
-    def __init__(self) -> None:
-        self._history: Dict[str, List[AlertPayload]] = {}
+    """Fans alerts out to notification channels without blocking ingest.
+
+    Each channel has its own bounded queue and worker pool on a dispatcher
+    event loop running in a background thread. Failed deliveries are
+    retried with exponential backoff and dead-lettered once attempts are
+    exhausted (or the channel's queue is full).
+    """
+
+    def __init__(self, channels: Optional[List[AlertChannel]] = None) -> None:
+        self.settings = get_settings()
+        self._channels: Dict[str, AlertChannel] = {}
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._metrics: Dict[str, ChannelMetrics] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+
+        for channel in channels if channels is not None else build_channels(self.settings.alert_channels):
+            self.add_channel(channel)
+
+    def add_channel(self, channel: AlertChannel) -> None:
+        """Register a channel adapter; may be called while running."""
+        self._channels[channel.name] = channel
+        self._metrics[channel.name] = ChannelMetrics()
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._start_channel(channel), self._loop).result()
 
     def dispatch(self, alert: AlertPayload) -> None:
-        key = alert.trip_id
-        self._history.setdefault(key, []).append(alert)
-        # Replace print statements with vendor integrations
-        print(
-            f"[ALERT] {alert.alert_type.upper()} for {alert.tourist_id}/{alert.trip_id}: "
-            f"{alert.message} (severity={alert.severity})"
-        )
+        """Queue an alert on every channel serving its recipients."""
+        hub.publish_alert(alert)
+        self.start()
+        enqueued_at = time.monotonic()
+        for channel in list(self._channels.values()):
+            if channel.accepts(alert):
+                self._loop.call_soon_threadsafe(self._enqueue, channel.name, alert, enqueued_at)
 
     def history(self, trip_id: str) -> List[AlertPayload]:
-        return self._history.get(trip_id, [])
+        return alert_store.history(trip_id)
+
+    def metrics(self) -> Dict[str, dict]:
+        return {
+            name: self._metrics[name].snapshot(self._queues[name].qsize() if name in self._queues else 0)
+            for name in self._channels
+        }
+
+    def dead_letters(self, limit: int = 100) -> List[dict]:
+        """Most recent dead letters of every worker, oldest first."""
+        return state.range("dead_letters", "all")[-limit:]
+
+    # ============ Lifecycle ============
+
+    def start(self) -> None:
+        if self._started.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+                self._thread.start()
+        self._started.wait()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Drain queues (up to `timeout` seconds) and stop the dispatcher loop."""
+        if self._loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(timeout), self._loop)
+        try:
+            future.result(timeout + 1)
+        except Exception as e:
+            print(f"[ALERT] Dispatcher shutdown error: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=1)
+        with self._lock:
+            self._started.clear()
+            self._loop = None
+            self._thread = None
+            self._queues = {}
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        for channel in list(self._channels.values()):
+            loop.run_until_complete(self._start_channel(channel))
+        self._loop = loop
+        self._started.set()
+        loop.run_forever()
+        loop.close()
+
+    async def _start_channel(self, channel: AlertChannel) -> None:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.settings.alert_channel_queue_size)
+        self._queues[channel.name] = queue
+        for _ in range(max(1, self.settings.alert_channel_workers)):
+            asyncio.get_running_loop().create_task(self._worker(channel, queue))
+
+    async def _shutdown(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues.values())),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            print("[ALERT] Dispatcher stopped with undelivered alerts")
+        for channel in self._channels.values():
+            await channel.close()
+        for task in asyncio.all_tasks():
+            if task is not asyncio.current_task():
+                task.cancel()
+
+    # ============ Delivery ============
+
+    def _enqueue(self, name: str, alert: AlertPayload, enqueued_at: float) -> None:
+        metrics = self._metrics[name]
+        try:
+            self._queues[name].put_nowait((alert, enqueued_at))
+            metrics.enqueued += 1
+        except asyncio.QueueFull:
+            metrics.dropped += 1
+            self._dead_letter(name, alert, "queue full", 0)
+
+    async def _worker(self, channel: AlertChannel, queue: asyncio.Queue) -> None:
+        metrics = self._metrics[channel.name]
+        max_attempts = max(1, self.settings.alert_max_attempts)
+        while True:
+            alert, enqueued_at = await queue.get()
+            try:
+                for attempt in range(1, max_attempts + 1):
+                    try:
+                        await asyncio.wait_for(channel.send(alert), self.settings.alert_send_timeout_seconds)
+                    except Exception as e:
+                        if attempt == max_attempts:
+                            self._dead_letter(channel.name, alert, str(e) or type(e).__name__, attempt)
+                            break
+                        metrics.retried += 1
+                        delay = self.settings.alert_retry_base_seconds * (2 ** (attempt - 1))
+                        await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                    else:
+                        metrics.delivered += 1
+                        metrics.observe_latency(time.monotonic() - enqueued_at)
+                        break
+            finally:
+                queue.task_done()
+
+    def _dead_letter(self, name: str, alert: AlertPayload, error: str, attempts: int) -> None:
+        self._metrics[name].dead_lettered += 1
+        dead_letter = DeadLetter(channel=name, alert=alert, error=error, attempts=attempts)
+        with state.atomic():
+            state.append("dead_letters", "all", time.time(), dead_letter.to_dict())
+            state.trim("dead_letters", "all", keep=self.settings.alert_dead_letter_size)
+        print(f"[ALERT] Dead-lettered {alert.alert_type} for {alert.trip_id} on {name}: {error}")
 
 
 dispatcher = AlertDispatcher()
-
-
-
-
-
-
-
-
-
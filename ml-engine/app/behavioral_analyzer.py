@@ -8,15 +8,17 @@ assess distress probability, and support investigation.
 from __future__ import annotations
 
 import logging
-from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple
-from collections import defaultdict
 
 import numpy as np
 from haversine import haversine, Unit
 
 from .schemas import Observation
 from .config import get_settings
+from .incident_heatmap import get_incident_heatmap
+from .state_backend import state
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -26,10 +28,8 @@ class BehavioralAnalyzer:
     """Analyzes tourist behavior patterns for anomaly detection."""
     
     def __init__(self):
-        # Store behavioral baselines per tourist
-        self._baselines: Dict[str, Dict] = {}
-        # Store recent observation history
-        self._history: Dict[str, List[Observation]] = defaultdict(list)
+        # Behavioral baselines ("baselines") and recent observation history
+        # ("behavior_history") live in the state backend, per trip
         # Maximum history to keep (24 hours of observations)
         self._max_history_hours = 24
     
@@ -38,14 +38,13 @@ class BehavioralAnalyzer:
         key = f"{obs.tourist_id}::{obs.trip_id}"
         
         # Add to history
-        self._history[key].append(obs)
-        
-        # Prune old observations (keep last 24 hours)
-        cutoff = obs.timestamp - timedelta(hours=self._max_history_hours)
-        self._history[key] = [
-            o for o in self._history[key]
-            if o.timestamp >= cutoff
-        ]
+        ts = obs.timestamp.timestamp()
+        with state.atomic():
+            state.append("behavior_history", key, ts, obs)
+            
+            # Prune old observations (keep last 24 hours)
+            newest = state.last_ts("behavior_history", key)
+            state.trim("behavior_history", key, before=newest - self._max_history_hours * 3600)
     
     def get_observation_history(
         self,
@@ -55,15 +54,19 @@ class BehavioralAnalyzer:
     ) -> List[Observation]:
         """Get observation history for a tourist."""
         key = f"{tourist_id}::{trip_id}"
-        history = self._history.get(key, [])
+        latest = state.last_ts("behavior_history", key)
         
-        if not history:
+        if latest is None:
             return []
         
         # Filter by time window
-        latest = history[-1].timestamp
-        cutoff = latest - timedelta(hours=hours)
-        return [obs for obs in history if obs.timestamp >= cutoff]
+        return state.range("behavior_history", key, since=latest - hours * 3600, model=Observation)
+    
+    @staticmethod
+    def _position(obs: Observation, history: List[Observation]) -> Tuple[int, int]:
+        """Slice of time-ordered `history` with obs's timestamp (empty if none)."""
+        times = [o.timestamp for o in history]
+        return bisect_left(times, obs.timestamp), bisect_right(times, obs.timestamp)
     
     def detect_location_dropoff(
         self,
@@ -73,17 +76,35 @@ class BehavioralAnalyzer:
         """
         Detect sudden GPS signal loss or location jumps.
         
+        `obs` is compared with its neighbours in time, so a late observation
+        is checked against the points it arrived between, not the newest one.
+        
         Returns:
             Dict with anomaly details if detected, None otherwise
         """
         if history is None:
             history = self.get_observation_history(obs.tourist_id, obs.trip_id, hours=1)
         
-        if len(history) < 2:
-            return None
+        lo, hi = self._position(obs, history)
+        pairs = []
+        if lo > 0:
+            pairs.append((history[lo - 1], obs))
+        if hi < len(history):
+            pairs.append((obs, history[hi]))
         
-        prev_obs = history[-1]
+        for prev_obs, curr_obs in pairs:
+            result = self._compare_fixes(prev_obs, curr_obs)
+            if result:
+                return result
         
+        # Check 3: Signal loss (implemented at storage level)
+        # This would be detected by lack of observations
+        
+        return None
+    
+    @staticmethod
+    def _compare_fixes(prev_obs: Observation, obs: Observation) -> Optional[Dict]:
+        """Accuracy degradation or location jump between consecutive observations."""
         # Check 1: Sudden accuracy degradation
         if obs.accuracy_m > 100 and prev_obs.accuracy_m < 30:
             return {
@@ -116,9 +137,6 @@ class BehavioralAnalyzer:
                     'message': f'Location jumped {distance_m:.0f}m in {time_diff:.0f}s (impossible speed: {speed_kmh:.0f} km/h)'
                 }
         
-        # Check 3: Signal loss (implemented at storage level)
-        # This would be detected by lack of observations
-        
         return None
     
     def analyze_movement_pattern(
@@ -130,6 +148,10 @@ class BehavioralAnalyzer:
         Analyze movement patterns for anomalies.
         
         Detects: erratic movement, unusual speeds, backtracking, circling
+        
+        Checks the 5-observation windows of `history` that contain `obs`:
+        only the one ending at it if it is the newest, up to 5 if it
+        arrived late.
         """
         if history is None:
             history = self.get_observation_history(obs.tourist_id, obs.trip_id, hours=2)
@@ -137,8 +159,16 @@ class BehavioralAnalyzer:
         if len(history) < 5:
             return None  # Need at least 5 points for pattern analysis
         
-        recent = history[-5:]  # Last 5 observations
-        
+        _, hi = self._position(obs, history)
+        for end in range(max(hi, 5), min(hi + 4, len(history)) + 1):
+            result = self._window_anomaly(history[end - 5:end])
+            if result:
+                return result
+        return None
+    
+    @staticmethod
+    def _window_anomaly(recent: List[Observation]) -> Optional[Dict]:
+        """Movement anomaly within a window of consecutive observations."""
         # Calculate movement metrics
         speeds = []
         directions = []
@@ -291,6 +321,12 @@ class BehavioralAnalyzer:
             signals.append(f"Very high speed ({obs.speed_mps * 3.6:.0f} km/h)")
             score += 10
         
+        # Signal 7: History of incidents around here at this hour
+        incident_risk = get_incident_heatmap().risk(obs.lat, obs.lng, hour)
+        if incident_risk >= 0.3:
+            signals.append(f"Area with past incidents at this hour (density risk {incident_risk:.0%})")
+            score += round(15 * incident_risk)
+        
         # Calculate risk level
         if score >= 60:
             risk_level = "high"
@@ -305,8 +341,9 @@ class BehavioralAnalyzer:
         """Get or create behavioral baseline for a tourist."""
         key = f"{tourist_id}::{trip_id}"
         
-        if key in self._baselines:
-            return self._baselines[key]
+        baseline = state.get("baselines", key)
+        if baseline is not None:
+            return baseline
         
         # Create new baseline from history
         history = self.get_observation_history(tourist_id, trip_id, hours=24)
@@ -317,7 +354,7 @@ class BehavioralAnalyzer:
                 'avg_speed_kmh': 4.0,
                 'typical_hours': list(range(8, 22)),  # 8 AM - 10 PM
                 'max_inactivity_min': 30,
-                'created_at': datetime.now()
+                'created_at': datetime.now().isoformat()
             }
         else:
             # Calculate from history
@@ -330,13 +367,13 @@ class BehavioralAnalyzer:
                 hours.add(obs.timestamp.hour)
             
             baseline = {
-                'avg_speed_kmh': np.mean(speeds) if speeds else 4.0,
+                'avg_speed_kmh': float(np.mean(speeds)) if speeds else 4.0,
                 'typical_hours': sorted(hours),
                 'max_inactivity_min': 30,
-                'created_at': datetime.now()
+                'created_at': datetime.now().isoformat()
             }
         
-        self._baselines[key] = baseline
+        state.set("baselines", key, baseline)
         return baseline
 
 
@@ -5,18 +5,21 @@ Provides REST endpoints for blockchain identity operations.
 
 from __future__ import annotations
 
+import asyncio
 import sys
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel, Field
 
 # Add parent directory to path to import blockchain module
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from blockchain.ethereum_service import (
+    BlockchainConfig,
     get_ethereum_service,
+    get_existing_ethereum_service,
     TransactionResult,
     VerificationResult,
 )
@@ -49,22 +52,64 @@ class BlockchainResponse(BaseModel):
     tx_hash: Optional[str] = None
     block_number: Optional[int] = None
     gas_used: Optional[int] = None
+    status: Optional[str] = None
     error: Optional[str] = None
 
 
+class TransactionStatusResponse(BaseModel):
+    """Response for a queued transaction's status."""
+    hash_id: str
+    user_id: str
+    status: str
+    confirmed: bool
+    tx_hash: Optional[str] = None
+    block_number: Optional[int] = None
+    gas_used: Optional[int] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
+
+
+class ProofVerifyRequest(BaseModel):
+    """Request body for verifying a batch inclusion proof."""
+    hash_id: str = Field(..., description="Record hash (0x-prefixed)")
+    user_id: str = Field(..., description="User the record belongs to")
+    event_type: Literal["REGISTER", "LOGIN"] = Field(..., description="REGISTER or LOGIN")
+    root: str = Field(..., description="Anchored batch Merkle root")
+    proof: List[str] = Field(default_factory=list, description="Sibling hashes from leaf to root")
+
+
 class VerifyResponse(BaseModel):
     """Response for hash verification."""
     exists: bool
     hash_id: str
     message: str
+    root: Optional[str] = None
+    method: str = "contract"
     error: Optional[str] = None
 
 
+class BatchProofResponse(BaseModel):
+    """Merkle inclusion proof for a batched record."""
+    hash_id: str
+    user_id: str
+    event_type: str
+    sealed: bool
+    anchored: bool
+    root: Optional[str] = None
+    proof: List[str] = []
+    leaf_index: Optional[int] = None
+    batch_size: int = 0
+
+
 class UserRecordsResponse(BaseModel):
     """Response for user records query."""
     user_id: str
     record_count: int
     records: list
+    offset: int = 0
+    limit: int = 0
+    has_more: bool = False
     summary: Optional[dict] = None
 
 
@@ -79,6 +124,27 @@ class GlobalStatsResponse(BaseModel):
     account_address: Optional[str] = None
 
 
+# ============ Lifecycle ============
+
+@router.on_event("startup")
+async def recover_batches():
+    """In batch mode, anchor records a previous process left unsealed or unanchored."""
+    if not BlockchainConfig().batch_mode:
+        return
+    service = await asyncio.to_thread(get_ethereum_service)
+    queued = await service.recover_batches()
+    if queued:
+        print(f"[Blockchain] Re-queued {queued} batch root(s) left by a previous run")
+
+
+@router.on_event("shutdown")
+async def stop_transaction_pipeline():
+    """Stop background transaction workers (if the service was ever started)."""
+    service = get_existing_ethereum_service()
+    if service is not None:
+        await service.shutdown()
+
+
 # ============ Endpoints ============
 
 @router.get("/health")
@@ -91,7 +157,10 @@ async def blockchain_health():
         "network": service.config.rpc_url,
         "chain_id": service.config.chain_id,
         "account": service.account_address,
-        "contract_deployed": service.config.contract_address is not None
+        "contract_deployed": service.config.contract_address is not None,
+        "batch_mode": service.config.batch_mode,
+        "indexer": service.indexer.status() if service.indexer else None,
+        "connection": service.connection.status() if service.connection else None
     }
 
 
@@ -107,7 +176,8 @@ async def store_registration(request: RegistrationRequest, req: Request):
     - Name (hashed)
     - Timestamp
     
-    Returns the blockchain transaction details and hash ID.
+    Returns the hash ID immediately with a pending status; the transaction
+    is submitted in the background. Poll `/blockchain/tx/{hash_id}`.
     """
     service = get_ethereum_service()
     
@@ -128,11 +198,12 @@ async def store_registration(request: RegistrationRequest, req: Request):
     if result.success:
         return BlockchainResponse(
             success=True,
-            message="Registration recorded on blockchain",
+            message="Registration queued for blockchain",
             hash_id=result.hash_id,
             tx_hash=result.tx_hash,
             block_number=result.block_number,
-            gas_used=result.gas_used
+            gas_used=result.gas_used,
+            status=result.status
         )
     else:
         return BlockchainResponse(
@@ -153,7 +224,8 @@ async def store_login(request: LoginRequest, req: Request):
     - IP Address
     - Timestamp
     
-    Returns the blockchain transaction details and hash ID.
+    Returns the hash ID immediately with a pending status; the transaction
+    is submitted in the background. Poll `/blockchain/tx/{hash_id}`.
     """
     service = get_ethereum_service()
     
@@ -176,11 +248,12 @@ async def store_login(request: LoginRequest, req: Request):
     if result.success:
         return BlockchainResponse(
             success=True,
-            message="Login recorded on blockchain",
+            message="Login queued for blockchain",
             hash_id=result.hash_id,
             tx_hash=result.tx_hash,
             block_number=result.block_number,
-            gas_used=result.gas_used
+            gas_used=result.gas_used,
+            status=result.status
         )
     else:
         return BlockchainResponse(
@@ -190,6 +263,41 @@ async def store_login(request: LoginRequest, req: Request):
         )
 
 
+@router.get("/tx/{hash_id}", response_model=TransactionStatusResponse)
+async def get_transaction_status(hash_id: str):
+    """
+    Get the status of a queued registration/login transaction.
+    
+    Args:
+        hash_id: The hash ID returned by /register or /login
+    
+    Returns:
+        Pipeline status (pending, submitted, confirmed, timed_out, failed) and receipt details.
+    """
+    service = get_ethereum_service()
+    status = service.get_transaction_status(hash_id)
+    
+    if status is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Transaction not found"
+        )
+    
+    data = status.to_dict()
+    return TransactionStatusResponse(
+        hash_id=data["hash_id"],
+        user_id=data["user_id"],
+        status=data["status"],
+        confirmed=data["status"] == "confirmed",
+        tx_hash=data["tx_hash"],
+        block_number=data["block_number"],
+        gas_used=data["gas_used"],
+        error=data["error"],
+        created_at=data["created_at"],
+        updated_at=data["updated_at"]
+    )
+
+
 @router.get("/verify/{hash_id}", response_model=VerifyResponse)
 async def verify_hash(hash_id: str):
     """
@@ -213,26 +321,94 @@ async def verify_hash(hash_id: str):
     if not hash_id.startswith("0x"):
         hash_id = "0x" + hash_id
     
-    result = service.verify_hash(hash_id)
+    result = await asyncio.to_thread(service.verify_hash, hash_id)
     
     return VerifyResponse(
         exists=result.exists,
         hash_id=hash_id,
         message="Hash verified" if result.exists else "Hash not found",
+        root=result.root,
+        method=result.method,
         error=result.error
     )
 
 
+@router.post("/verify-proof", response_model=VerifyResponse)
+async def verify_batch_proof(request: ProofVerifyRequest):
+    """
+    Verify a batched hash with its Merkle inclusion proof.
+    
+    The proof is checked locally; only the batch root's anchoring is
+    looked up on chain (and cached once confirmed).
+    """
+    service = get_ethereum_service()
+    
+    hash_id = request.hash_id if request.hash_id.startswith("0x") else "0x" + request.hash_id
+    result = await asyncio.to_thread(
+        service.verify_hash,
+        hash_id,
+        proof=request.proof,
+        root=request.root,
+        user_id=request.user_id,
+        event_type=request.event_type
+    )
+    
+    return VerifyResponse(
+        exists=result.exists,
+        hash_id=hash_id,
+        message="Hash verified" if result.exists else "Hash not found",
+        root=result.root,
+        method=result.method,
+        error=result.error
+    )
+
+
+@router.get("/proof/{hash_id}", response_model=BatchProofResponse)
+async def get_batch_proof(hash_id: str):
+    """
+    Get the Merkle inclusion proof for a hash recorded in batch mode.
+    
+    Args:
+        hash_id: The record hash (with or without 0x prefix)
+    """
+    service = get_ethereum_service()
+    record = service.get_batch_proof(hash_id)
+    
+    if record is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No batch proof for this hash"
+        )
+    
+    # The anchoring check may be an eth_call; keep it off the event loop
+    anchored = (
+        record.root is not None
+        and await asyncio.to_thread(service.is_root_anchored, record.root)
+    )
+    
+    return BatchProofResponse(
+        **record.to_dict(),
+        sealed=record.root is not None,
+        anchored=anchored
+    )
+
+
 @router.get("/user/{user_id}/records", response_model=UserRecordsResponse)
-async def get_user_records(user_id: str):
+async def get_user_records(
+    user_id: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=500)
+):
     """
-    Get all blockchain records for a user.
+    Get a page of blockchain records for a user.
     
     Args:
         user_id: The user's unique identifier
+        offset: Index of the first record to return
+        limit: Maximum number of records to return
     
     Returns:
-        List of all registration and login records for the user.
+        Registration and login records for the user, plus the total count.
     """
     service = get_ethereum_service()
     
@@ -242,13 +418,16 @@ async def get_user_records(user_id: str):
             detail="Blockchain service not available"
         )
     
-    records = service.get_user_records(user_id)
+    records, total = service.get_user_records_page(user_id, offset, limit)
     summary = service.get_user_summary(user_id)
     
     return UserRecordsResponse(
         user_id=user_id,
-        record_count=len(records),
+        record_count=total,
         records=records,
+        offset=offset,
+        limit=limit,
+        has_more=offset + len(records) < total,
         summary=summary
     )
 
@@ -276,6 +455,31 @@ async def get_global_stats():
     )
 
 
+@router.post("/index/reconcile")
+async def reconcile_index():
+    """
+    Compare the local event index against on-chain totals.
+    
+    The contract is the source of truth; on a mismatch the index is
+    rebuilt from its start block.
+    """
+    service = get_ethereum_service()
+    
+    if service.indexer is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Event indexer is not enabled"
+        )
+    
+    if not service.is_connected:
+        raise HTTPException(
+            status_code=503,
+            detail="Blockchain service not available"
+        )
+    
+    return await asyncio.to_thread(service.indexer.reconcile)
+
+
 @router.post("/generate-hash/registration")
 async def generate_registration_hash_only(request: RegistrationRequest):
     """
@@ -18,10 +18,91 @@ class Settings(BaseSettings):
         default=BASE_DIR / "data" / "historical_observations.csv"
     )
     danger_zones_path: Path = Field(default=BASE_DIR / "data" / "danger_zones.geojson")
+    gazetteer_path: Path = Field(default=BASE_DIR / "data" / "gazetteer.json")
+    road_graph_path: Path = Field(default=BASE_DIR / "data" / "road_network.osm")
 
     route_deviation_threshold_m: float = Field(default=120.0)
     inactivity_threshold_minutes: int = Field(default=15)
-    alert_buffer_minutes: int = Field(default=5)
+    alert_buffer_minutes: int = Field(default=5)  # per trip and alert type
+    geofence_changelog_size: int = Field(default=100000)
+
+    # Offline routing (cost = travel time * (1 + weight * zone penalty / 100))
+    routing_danger_weight: float = Field(default=4.0)
+    routing_alternatives: int = Field(default=3)
+    routing_max_snap_m: float = Field(default=1000.0)
+    routing_use_cch: bool = Field(default=True)
+    routing_cch_dir: Path = Field(default=BASE_DIR / "data" / "road_network.cch")
+    route_segment_cache_size: int = Field(default=100000)
+    route_batch_max_routes: int = Field(default=1000)
+    # Metres inside a zone at which its penalty reaches ~63% of the full value,
+    # and the speed used to turn exposure metres into minutes
+    route_exposure_scale_m: float = Field(default=200.0)
+    route_exposure_speed_kmh: float = Field(default=40.0)
+
+    # Danger zone raster (cell size ~110 m at 0.001; nearby buffer ~1.1 km at 0.01)
+    hazard_cell_deg: float = Field(default=0.001)
+    hazard_nearby_buffer_deg: float = Field(default=0.01)
+
+    # Observation ingest: trip-hashed shards, bounded queue per shard, how long
+    # to wait for queue space (then 503) and for the result (then 202)
+    stream_shards: int = Field(default=4)
+    stream_queue_size: int = Field(default=1000)
+    stream_enqueue_timeout_seconds: float = Field(default=0.5)
+    stream_result_timeout_seconds: float = Field(default=10.0)
+    # Observations further behind their trip's newest point are stored unchecked
+    observation_max_lateness_seconds: float = Field(default=1800.0)
+
+    # Per-trip state (routes, observations, throttles, geofence status, alert
+    # history, caches): "memory" (single worker process) or "sqlite" (shared
+    # by every worker on the host through state_db_path)
+    state_backend: str = Field(default="memory")
+    state_db_path: Path = Field(default=BASE_DIR / "data" / "state.sqlite")
+    # Live positions, event subscribers and alert storm windows stay per
+    # process, so a second worker on the same data_dir refuses to start
+    # unless this is set (see README "Running Several Workers")
+    allow_multiple_workers: bool = Field(default=False)
+
+    # Incident heatmap: hourly KDE of past alerts on a grid over these bounds
+    # (cell ~550 m at 0.005), memory-mapped from heatmap_path
+    heatmap_path: Path = Field(default=BASE_DIR / "data" / "incident_heatmap.npy")
+    heatmap_min_lat: float = Field(default=25.0)
+    heatmap_min_lng: float = Field(default=89.8)
+    heatmap_max_lat: float = Field(default=26.2)
+    heatmap_max_lng: float = Field(default=92.9)
+    heatmap_cell_deg: float = Field(default=0.005)
+    heatmap_bandwidth_m: float = Field(default=500.0)
+    heatmap_hour_bandwidth: float = Field(default=1.5)
+    heatmap_saturation: float = Field(default=3.0)
+
+    # Live position index (grid cell size in degrees, ~1.1 km at 0.01)
+    spatial_cell_deg: float = Field(default=0.01)
+    live_position_ttl_minutes: float = Field(default=60.0)
+
+    # Alert storm aggregation (comma-separated alert types grouped by zone)
+    alert_aggregate_types: str = Field(default="danger_zone")
+    alert_aggregate_window_seconds: float = Field(default=60.0)
+    alert_count_window_seconds: float = Field(default=300.0)
+
+    # Destination safety (itineraries): alert radius and lookback, distance
+    # over which a zone's penalty fades, cached (destination, hour) scores
+    destination_alert_radius_m: float = Field(default=2000.0)
+    destination_alert_lookback_hours: float = Field(default=72.0)
+    destination_zone_scale_m: float = Field(default=1000.0)
+    destination_cache_size: int = Field(default=10000)
+
+    # Alert history retention
+    alert_retention_hours: float = Field(default=72.0)
+    alert_max_per_trip: int = Field(default=1000)
+    alert_max_trips: int = Field(default=10000)
+
+    # Alert delivery (comma-separated channel adapters, see app/alert_channels.py)
+    alert_channels: str = Field(default="console")
+    alert_channel_workers: int = Field(default=4)
+    alert_channel_queue_size: int = Field(default=1000)
+    alert_max_attempts: int = Field(default=3)
+    alert_retry_base_seconds: float = Field(default=0.5)
+    alert_send_timeout_seconds: float = Field(default=10.0)
+    alert_dead_letter_size: int = Field(default=1000)
 
     model_filename: str = Field(default="anomaly_iforest.joblib")
     random_state: Optional[int] = Field(default=42)
@@ -0,0 +1,466 @@
+"""Customizable contraction hierarchy (CCH) for the road graph.
+
+Preprocessing is split in two, so a danger-zone change only redoes the
+cheap part:
+
+1. Topology (metric independent): nodes are ranked by geometric nested
+   dissection, the graph is contracted in rank order (chordal completion)
+   and every lower triangle of the resulting upward graph is recorded.
+2. Customization: given per-edge weights, upward/downward arc weights are
+   computed by relaxing the triangles level by level, vectorized with
+   numpy.
+
+Both parts are saved as ``.npy`` files and opened with ``mmap_mode="r"``,
+so every worker process shares the same pages and starts without
+rebuilding. Workers build into their own temporary directories and the
+first one to move its result into place wins; the others open that one.
+Only the most recent metrics are kept, in memory and on disk. Queries walk the elimination tree upwards from both endpoints;
+common ancestors double as via-nodes for route alternatives.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .file_lock import file_lock
+from .road_graph import RoadGraph
+
+_TOPOLOGY = (
+    "rank", "parent", "indptr", "arc_tail", "arc_head",
+    "tri_down", "tri_up", "tri_target", "tri_levels", "tri_by_target_ptr", "tri_by_target",
+)
+_METRIC = ("up_w", "down_w", "up_edge", "down_edge")
+# Customized metrics kept per hierarchy (danger-aware and plain, plus the
+# previous zone set while workers catch up with a reload)
+MAX_METRICS = 4
+
+
+def _open(path: Path) -> np.ndarray:
+    # Plain ndarray view of the mapping; memmap's subclass hooks slow down indexing
+    return np.load(path, mmap_mode="r").view(np.ndarray)
+
+
+def _tmp_path(path: Path) -> Path:
+    """Per-process build location next to `path`."""
+    return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+
+def graph_fingerprint(graph: RoadGraph) -> str:
+    digest = hashlib.sha1()
+    for array in (graph.node_ids, graph.indptr, graph.indices):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def nested_dissection_order(
+    lat: np.ndarray,
+    lng: np.ndarray,
+    eu: np.ndarray,
+    ev: np.ndarray,
+    leaf_size: int = 32,
+) -> np.ndarray:
+    """Nodes from lowest to highest rank, separators ranked above their halves.
+
+    Each part is split at the median of its longer axis; the smaller set of
+    endpoints of the edges crossing the split becomes the separator.
+    """
+    n = len(lat)
+    x = lng * math.cos(math.radians(float(np.mean(lat)))) if n else lng
+    in_b = np.zeros(n, dtype=bool)
+    in_sep = np.zeros(n, dtype=bool)
+    out: List[np.ndarray] = []
+
+    def dissect(nodes: np.ndarray, eu: np.ndarray, ev: np.ndarray) -> None:
+        if len(nodes) <= leaf_size:
+            out.append(nodes)
+            return
+        coord = x[nodes] if np.ptp(x[nodes]) >= np.ptp(lat[nodes]) else lat[nodes]
+        half = np.argsort(coord, kind="stable")[len(nodes) // 2:]
+        in_b[nodes] = False
+        in_b[nodes[half]] = True
+
+        cross = in_b[eu] != in_b[ev]
+        a_end = np.where(in_b[eu[cross]], ev[cross], eu[cross])
+        b_end = np.where(in_b[eu[cross]], eu[cross], ev[cross])
+        a_sep, b_sep = np.unique(a_end), np.unique(b_end)
+        sep = a_sep if len(a_sep) <= len(b_sep) else b_sep
+        in_sep[sep] = True
+
+        keep = ~cross & ~in_sep[eu] & ~in_sep[ev]
+        a_edges = keep & ~in_b[eu]
+        b_edges = keep & in_b[eu]
+        a_nodes = nodes[~in_b[nodes] & ~in_sep[nodes]]
+        b_nodes = nodes[in_b[nodes] & ~in_sep[nodes]]
+        a_eu, a_ev, b_eu, b_ev = eu[a_edges], ev[a_edges], eu[b_edges], ev[b_edges]
+
+        dissect(a_nodes, a_eu, a_ev)
+        dissect(b_nodes, b_eu, b_ev)
+        out.append(sep)
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 10_000))
+    try:
+        dissect(np.arange(n), eu, ev)
+    finally:
+        sys.setrecursionlimit(limit)
+    return np.concatenate(out) if out else np.zeros(0, dtype=np.int64)
+
+
+class Metric:
+    """Customized arc weights for per-edge `edge_w`.
+
+    ``up_edge``/``down_edge`` hold the cheapest original edge an arc stands
+    for, or -1; an arc whose weight is below that edge's is a shortcut.
+    """
+
+    def __init__(
+        self,
+        edge_w: np.ndarray,
+        up_w: np.ndarray,
+        down_w: np.ndarray,
+        up_edge: np.ndarray,
+        down_edge: np.ndarray,
+    ) -> None:
+        self.edge_w = edge_w
+        self.up_w = up_w
+        self.down_w = down_w
+        self.up_edge = up_edge
+        self.down_edge = down_edge
+
+
+class ContractionHierarchy:
+    """Metric-independent CCH topology over a `RoadGraph`.
+
+    Upward arcs ``(tail, head)`` always point from lower to higher rank and
+    are sorted by ``tail * n + head``. A metric assigns each arc an upward
+    weight (tail -> head) and a downward weight (head -> tail).
+    """
+
+    def __init__(self, graph: RoadGraph, arrays: Dict[str, np.ndarray], path: Optional[Path] = None) -> None:
+        self.graph = graph
+        self.path = path
+        for name in _TOPOLOGY:
+            setattr(self, name, arrays[name])
+        self._metrics: "OrderedDict[str, Metric]" = OrderedDict()
+        self._metrics_lock = threading.Lock()
+        self._scratch = threading.local()
+
+    @property
+    def num_arcs(self) -> int:
+        return len(self.arc_head)
+
+    # ============ Topology ============
+
+    @classmethod
+    def build(cls, graph: RoadGraph, leaf_size: int = 32) -> "ContractionHierarchy":
+        n = graph.num_nodes
+        src = graph.edge_sources().astype(np.int64)
+        dst = graph.indices.astype(np.int64)
+        loops = src == dst
+        pairs = np.unique(np.sort(np.column_stack([src[~loops], dst[~loops]]), axis=1), axis=0).reshape(-1, 2)
+
+        order = nested_dissection_order(graph.lat, graph.lng, pairs[:, 0], pairs[:, 1], leaf_size)
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n)
+
+        # Chordal completion: contracting v links all its upward neighbours,
+        # which it suffices to add to the lowest of them (v's parent)
+        up: List[set] = [set() for _ in range(n)]
+        swap = rank[pairs[:, 0]] > rank[pairs[:, 1]]
+        lo = np.where(swap, pairs[:, 1], pairs[:, 0])
+        hi = np.where(swap, pairs[:, 0], pairs[:, 1])
+        for a, b in zip(lo.tolist(), hi.tolist()):
+            up[a].add(b)
+
+        rank_list = rank.tolist()
+        parent = np.full(n, -1, dtype=np.int64)
+        level = [0] * n
+        for v in order.tolist():
+            above = up[v]
+            if not above:
+                continue
+            p = min(above, key=rank_list.__getitem__)
+            parent[v] = p
+            up[p].update(above)
+            up[p].discard(p)
+            for x in above:
+                if level[x] <= level[v]:
+                    level[x] = level[v] + 1
+
+        degree = np.array([len(s) for s in up], dtype=np.int64)
+        tails = np.repeat(np.arange(n, dtype=np.int64), degree)
+        heads = np.fromiter((h for s in up for h in sorted(s)), dtype=np.int64, count=len(tails))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(degree, out=indptr[1:])
+        keys = tails * n + heads
+        del up
+
+        # Lower triangles (v, a, b) with rank a < rank b: arcs v-a, v-b and a-b.
+        # Nodes are visited by level so the triangles come out grouped by it;
+        # a level's triangles only read arcs finished by lower levels.
+        arc_dtype = np.int32 if len(keys) < 2**31 else np.int64
+        count = degree * (degree - 1) // 2
+        total = int(count.sum())
+        tri_down = np.empty(total, dtype=arc_dtype)
+        tri_up = np.empty(total, dtype=arc_dtype)
+        tri_target = np.empty(total, dtype=arc_dtype)
+        level = np.array(level, dtype=np.int64)
+        pos = 0
+        for v in np.argsort(level, kind="stable").tolist():
+            d = int(degree[v])
+            if d < 2:
+                continue
+            lo = int(indptr[v])
+            row = heads[lo:lo + d]
+            by_rank = np.argsort(rank[row])
+            i, j = np.triu_indices(d, 1)
+            a, b = row[by_rank][i], row[by_rank][j]
+            end = pos + len(i)
+            tri_down[pos:end] = lo + by_rank[i]
+            tri_up[pos:end] = lo + by_rank[j]
+            tri_target[pos:end] = np.searchsorted(keys, a * n + b)
+            pos = end
+
+        node_levels = np.bincount(level, weights=count, minlength=1).astype(np.int64)
+        tri_levels = np.zeros(len(node_levels) + 1, dtype=np.int64)
+        np.cumsum(node_levels, out=tri_levels[1:])
+
+        tri_by_target = np.argsort(tri_target, kind="stable").astype(np.int32 if total < 2**31 else np.int64)
+        tri_by_target_ptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tri_target, minlength=len(keys)), out=tri_by_target_ptr[1:])
+
+        arrays = {
+            "rank": rank, "parent": parent, "indptr": indptr, "arc_tail": tails, "arc_head": heads,
+            "tri_down": tri_down, "tri_up": tri_up, "tri_target": tri_target, "tri_levels": tri_levels,
+            "tri_by_target_ptr": tri_by_target_ptr, "tri_by_target": tri_by_target,
+        }
+        return cls(graph, arrays)
+
+    @classmethod
+    def load_or_build(cls, graph: RoadGraph, directory: Path) -> "ContractionHierarchy":
+        """Open the saved topology for this graph, building and saving it if needed."""
+        directory = Path(directory)
+        fingerprint = graph_fingerprint(graph)
+        cch = cls._open_saved(graph, directory, fingerprint)
+        if cch is not None:
+            return cch
+
+        cch = cls.build(graph)
+        tmp = _tmp_path(directory)
+        tmp.mkdir(parents=True)
+        try:
+            for name in _TOPOLOGY:
+                np.save(tmp / f"{name}.npy", getattr(cch, name))
+            (tmp / "meta.json").write_text(json.dumps({"graph": fingerprint, "arcs": cch.num_arcs}))
+            with file_lock(directory.with_name(f"{directory.name}.lock")):
+                # Another worker may have saved the same topology meanwhile;
+                # only a stale one is replaced
+                if cls._open_saved(graph, directory, fingerprint) is None:
+                    shutil.rmtree(directory, ignore_errors=True)
+                    tmp.replace(directory)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return cls.load_or_build(graph, directory)
+
+    @classmethod
+    def _open_saved(cls, graph: RoadGraph, directory: Path, fingerprint: str) -> Optional["ContractionHierarchy"]:
+        meta_path = directory / "meta.json"
+        try:
+            if not meta_path.exists() or json.loads(meta_path.read_text()).get("graph") != fingerprint:
+                return None
+            arrays = {name: _open(directory / f"{name}.npy") for name in _TOPOLOGY}
+        except (OSError, ValueError):
+            return None  # being replaced
+        return cls(graph, arrays, directory)
+
+    # ============ Customization ============
+
+    def customize(self, weights: np.ndarray) -> Metric:
+        """Arc weights for per-edge `weights` (indexed like `graph.indices`)."""
+        n = self.graph.num_nodes
+        weights = np.asarray(weights, dtype=np.float64)
+        up_w = np.full(self.num_arcs, np.inf)
+        down_w = np.full(self.num_arcs, np.inf)
+        up_edge = np.full(self.num_arcs, -1, dtype=np.int64)
+        down_edge = np.full(self.num_arcs, -1, dtype=np.int64)
+
+        src = self.graph.edge_sources().astype(np.int64)
+        dst = self.graph.indices.astype(np.int64)
+        edge_ids = np.flatnonzero(src != dst)
+        src, dst = src[edge_ids], dst[edge_ids]
+        upward = self.rank[src] < self.rank[dst]
+        lo = np.where(upward, src, dst)
+        hi = np.where(upward, dst, src)
+        arcs = np.searchsorted(self.arc_tail * n + self.arc_head, lo * n + hi)
+
+        for mask, arc_w, arc_edge in ((upward, up_w, up_edge), (~upward, down_w, down_edge)):
+            ids, arc = edge_ids[mask], arcs[mask]
+            # Cheapest parallel edge per arc: sort by weight, keep each arc's first
+            order = np.lexsort((weights[ids], arc))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = arc[order][1:] != arc[order][:-1]
+            chosen = order[first]
+            arc_w[arc[chosen]] = weights[ids[chosen]]
+            arc_edge[arc[chosen]] = ids[chosen]
+
+        for start, end in zip(self.tri_levels[:-1], self.tri_levels[1:]):
+            down, up, target = self.tri_down[start:end], self.tri_up[start:end], self.tri_target[start:end]
+            # a -> v -> b and b -> v -> a
+            np.minimum.at(up_w, target, down_w[down] + up_w[up])
+            np.minimum.at(down_w, target, down_w[up] + up_w[down])
+
+        return Metric(weights, up_w, down_w, up_edge, down_edge)
+
+    def metric(self, weights: np.ndarray) -> Metric:
+        """Customized metric for `weights`, reusing a saved one when available."""
+        weights = np.ascontiguousarray(weights, dtype=np.float64)
+        key = hashlib.sha1(weights.tobytes()).hexdigest()[:16]
+        with self._metrics_lock:
+            if key in self._metrics:
+                self._metrics.move_to_end(key)
+                return self._metrics[key]
+
+        metric_dir = self.path / f"metric-{key}" if self.path is not None else None
+        if metric_dir is not None and metric_dir.exists():
+            metric = Metric(weights, *(_open(metric_dir / f"{name}.npy") for name in _METRIC))
+        else:
+            metric = self.customize(weights)
+            if metric_dir is not None:
+                self._save_metric(metric, metric_dir)
+                metric = Metric(weights, *(_open(metric_dir / f"{name}.npy") for name in _METRIC))
+
+        with self._metrics_lock:
+            self._metrics[key] = metric
+            while len(self._metrics) > MAX_METRICS:
+                self._metrics.popitem(last=False)
+        return metric
+
+    def _save_metric(self, metric: Metric, metric_dir: Path) -> None:
+        tmp = _tmp_path(metric_dir)
+        tmp.mkdir(parents=True)
+        try:
+            for name in _METRIC:
+                np.save(tmp / f"{name}.npy", getattr(metric, name))
+            try:
+                tmp.replace(metric_dir)
+            except OSError:
+                # Same weights saved by another worker first: use theirs
+                if not metric_dir.exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        # Drop older metrics; workers still mapping them keep their pages
+        saved = sorted(self.path.glob("metric-*"), key=lambda path: path.stat().st_mtime, reverse=True)
+        for old in saved[MAX_METRICS:]:
+            if old != metric_dir:
+                shutil.rmtree(old, ignore_errors=True)
+
+    # ============ Queries ============
+
+    def _upward(self, start: int, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Upward search over the elimination-tree ancestors of `start`.
+
+        Every upward neighbour of a node is also its ancestor, so the chain
+        (in increasing rank) is a topological order and each node's arcs are
+        relaxed once, vectorized.
+
+        Returns:
+            (chain, dist, via): ancestors of `start` including itself, their
+            distances, and the arc each was reached by (-1 for none)
+        """
+        chain = [start]
+        parent = self.parent
+        while parent[chain[-1]] != -1:
+            chain.append(int(parent[chain[-1]]))
+        chain = np.array(chain, dtype=np.int64)
+        # Node -> chain position; only entries for this chain are ever read,
+        # so the per-thread buffer never needs clearing
+        position = getattr(self._scratch, "position", None)
+        if position is None:
+            position = self._scratch.position = np.empty(self.graph.num_nodes, dtype=np.int64)
+        position[chain] = np.arange(len(chain))
+        dist = np.full(len(chain), np.inf)
+        dist[0] = 0.0
+        via = np.full(len(chain), -1, dtype=np.int64)
+
+        for i, node in enumerate(chain.tolist()):
+            if dist[i] == np.inf:
+                continue
+            lo, hi = int(self.indptr[node]), int(self.indptr[node + 1])
+            if lo == hi:
+                continue
+            heads = position[self.arc_head[lo:hi]]
+            cand = dist[i] + weights[lo:hi]
+            better = cand < dist[heads]
+            dist[heads[better]] = cand[better]
+            via[heads[better]] = np.arange(lo, hi)[better]
+        return chain, dist, via
+
+    def routes(self, source: int, target: int, metric: Metric) -> Iterator[Tuple[float, List[int]]]:
+        """(cost, edges) through each common ancestor, cheapest first.
+
+        The first result is the shortest path; later ones are via-node
+        alternatives and may repeat nodes, which callers should check.
+        """
+        f_chain, f_dist, f_via = self._upward(source, metric.up_w)
+        b_chain, b_dist, b_via = self._upward(target, metric.down_w)
+        _, fi, bi = np.intersect1d(f_chain, b_chain, assume_unique=True, return_indices=True)
+        costs = f_dist[fi] + b_dist[bi]
+        order = np.argsort(costs, kind="stable")
+        f_index = {node: i for i, node in enumerate(f_chain.tolist())}
+        b_index = {node: i for i, node in enumerate(b_chain.tolist())}
+
+        for k in order[np.isfinite(costs[order])].tolist():
+            meet = int(f_chain[fi[k]])
+            edges: List[int] = []
+            up_arcs = []
+            node = meet
+            while node != source:
+                arc = int(f_via[f_index[node]])
+                up_arcs.append(arc)
+                node = int(self.arc_tail[arc])
+            for arc in reversed(up_arcs):
+                self._unpack(arc, True, metric, edges)
+            node = meet
+            while node != target:
+                arc = int(b_via[b_index[node]])
+                self._unpack(arc, False, metric, edges)
+                node = int(self.arc_tail[arc])
+            yield float(costs[k]), edges
+
+    def _unpack(self, arc: int, upward: bool, metric: Metric, out: List[int]) -> None:
+        """Expand an arc (tail -> head if `upward`, else head -> tail) into original edges."""
+        stack = [(arc, upward)]
+        while stack:
+            arc, upward = stack.pop()
+            weight = metric.up_w[arc] if upward else metric.down_w[arc]
+            edge = int(metric.up_edge[arc] if upward else metric.down_edge[arc])
+            if edge >= 0 and metric.edge_w[edge] == weight:
+                out.append(edge)
+                continue
+            tris = self.tri_by_target[self.tri_by_target_ptr[arc]:self.tri_by_target_ptr[arc + 1]]
+            down, up = self.tri_down[tris], self.tri_up[tris]
+            if upward:
+                # a -> v then v -> b
+                first, second = (down, False), (up, True)
+                sums = metric.down_w[down] + metric.up_w[up]
+            else:
+                # b -> v then v -> a
+                first, second = (up, False), (down, True)
+                sums = metric.down_w[up] + metric.up_w[down]
+            match = np.flatnonzero(sums == weight)
+            if not len(match):
+                raise RuntimeError(f"CCH arc {arc} has no matching triangle; metric is stale")
+            j = match[0]
+            stack.extend([(int(second[0][j]), second[1]), (int(first[0][j]), first[1])])
@@ -0,0 +1,223 @@
+"""Safety scores for named destinations, used to plan itineraries.
+
+Destination names are matched against a local gazetteer
+(``data/gazetteer.json``: name, aliases, lat, lng), exactly or with
+difflib for misspellings. A destination's score starts at 100 and loses
+points for:
+
+- nearby danger zones, by risk level and the zone's risk profile for the
+  hour, fading with distance;
+- alerts raised nearby recently (from the alert store), weighted by
+  severity and counted double at a similar time of day;
+- travelling at night or around dawn and dusk.
+
+Scores are cached per destination and clock hour, so planning an
+itinerary needs no model call per destination.
+"""
+from __future__ import annotations
+
+import difflib
+import json
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import shapely
+
+from .alert_store import alert_store
+from .config import get_settings
+from .detection import engine
+from .road_graph import haversine_m
+from .route_scoring import _get_zone_index
+from .schemas import AlertPayload
+
+SEVERITY_WEIGHTS = {"high": 3.0, "medium": 2.0, "low": 1.0}
+MAX_ALERT_PENALTY = 30.0
+ALERT_SATURATION = 10.0  # weighted alerts for ~63% of the maximum penalty
+SIMILAR_HOURS = 2  # alerts within this many hours of day count fully
+
+# Located recent alerts with their latitudes and longitudes
+_RecentAlerts = Tuple[List[AlertPayload], np.ndarray, np.ndarray]
+
+
+def _time_penalty(hour: int) -> float:
+    if hour >= 20 or hour < 6:
+        return 10.0
+    if 6 <= hour < 8 or 18 <= hour < 20:
+        return 5.0
+    return 0.0
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9 ]+", "", name.lower()).strip()
+
+
+@dataclass(frozen=True)
+class Place:
+    name: str
+    lat: float
+    lng: float
+
+
+@dataclass
+class DestinationSafety:
+    """Score of one destination and what it is made of."""
+    destination: str  # as requested
+    place: Place  # gazetteer match
+    score: float
+    zone_penalty: float
+    alert_penalty: float
+    time_penalty: float
+    nearby_zones: List[str] = field(default_factory=list)
+    nearby_alerts: int = 0
+
+
+class DestinationSafetyService:
+    """Gazetteer lookup plus cached per-destination safety scores."""
+
+    def __init__(
+        self,
+        gazetteer_path: Path,
+        alert_radius_m: float = 2000.0,
+        alert_lookback_hours: float = 72.0,
+        zone_scale_m: float = 1000.0,
+        cache_size: int = 10000,
+    ) -> None:
+        self.alert_radius_m = alert_radius_m
+        self.alert_lookback = timedelta(hours=alert_lookback_hours)
+        self.zone_scale_m = zone_scale_m
+        self.cache_size = cache_size
+        self._places: Dict[str, Place] = {}
+        self._load_gazetteer(Path(gazetteer_path))
+        self._cache: "OrderedDict[Tuple[str, datetime], DestinationSafety]" = OrderedDict()
+        self._zones_version = engine.zones_version
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "DestinationSafetyService":
+        settings = get_settings()
+        return cls(
+            gazetteer_path=settings.gazetteer_path,
+            alert_radius_m=settings.destination_alert_radius_m,
+            alert_lookback_hours=settings.destination_alert_lookback_hours,
+            zone_scale_m=settings.destination_zone_scale_m,
+            cache_size=settings.destination_cache_size,
+        )
+
+    def _load_gazetteer(self, path: Path) -> None:
+        if not path.exists():
+            return
+        with path.open() as f:
+            for entry in json.load(f):
+                place = Place(entry["name"], float(entry["lat"]), float(entry["lng"]))
+                for name in [entry["name"], *entry.get("aliases", [])]:
+                    self._places.setdefault(_normalize(name), place)
+
+    def locate(self, destination: str) -> Optional[Place]:
+        """Gazetteer entry for a destination name, tolerating small misspellings."""
+        key = _normalize(destination)
+        place = self._places.get(key)
+        if place is None:
+            close = difflib.get_close_matches(key, self._places.keys(), n=1, cutoff=0.8)
+            place = self._places[close[0]] if close else None
+        return place
+
+    def assess(self, destination: str, when: Optional[datetime] = None) -> Optional[DestinationSafety]:
+        """Safety of a destination at a time (default now); None if it isn't in the gazetteer."""
+        return self._assess(destination, when, {})
+
+    def scores(self, destinations: List[str], when: Optional[datetime] = None) -> Dict[str, float]:
+        """Scores of the destinations found in the gazetteer, keyed by requested name."""
+        recent: Dict[datetime, _RecentAlerts] = {}  # fetched once for every cache miss
+        scores = {}
+        for destination in destinations:
+            result = self._assess(destination, when, recent)
+            if result is not None:
+                scores[destination] = result.score
+        return scores
+
+    def _assess(
+        self, destination: str, when: Optional[datetime], recent: Dict[datetime, _RecentAlerts]
+    ) -> Optional[DestinationSafety]:
+        place = self.locate(destination)
+        if place is None:
+            return None
+        bucket = (when or datetime.now()).replace(minute=0, second=0, microsecond=0)
+        key = (place.name, bucket)
+        with self._lock:
+            if self._zones_version != engine.zones_version:
+                self._cache.clear()
+                self._zones_version = engine.zones_version
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return replace(cached, destination=destination)
+
+        result = self._compute(destination, place, bucket, recent)
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _recent_alerts(self, bucket: datetime, recent: Dict[datetime, _RecentAlerts]) -> _RecentAlerts:
+        """Located alerts within the lookback of `bucket`, with their coordinates."""
+        if bucket not in recent:
+            alerts = [
+                a for a in alert_store.recent(bucket - self.alert_lookback)
+                if a.lat is not None and a.lng is not None
+            ]
+            recent[bucket] = (
+                alerts,
+                np.array([a.lat for a in alerts], dtype=np.float64),
+                np.array([a.lng for a in alerts], dtype=np.float64),
+            )
+        return recent[bucket]
+
+    def _compute(
+        self, destination: str, place: Place, bucket: datetime, recent: Dict[datetime, _RecentAlerts]
+    ) -> DestinationSafety:
+        # Danger zones: full penalty inside, fading with distance
+        index = _get_zone_index()
+        zone_penalty, nearby_zones = 0.0, []
+        if index.tree is not None:
+            point = shapely.points(index.project(np.array([place.lng, place.lat])))
+            distances = shapely.distance(index.polygons, point)
+            fade = np.exp(-distances / self.zone_scale_m)
+            zone_penalty = float((index.penalties * index.hour_weights(bucket) * fade).sum())
+            nearby_zones = [engine._danger_polygons[z][1] for z in np.flatnonzero(distances <= self.zone_scale_m)]
+
+        # Recent alerts raised nearby
+        alerts, lat, lng = self._recent_alerts(bucket, recent)
+        alert_penalty, nearby_alerts = 0.0, 0
+        if alerts:
+            near = np.flatnonzero(haversine_m(place.lat, place.lng, lat, lng) <= self.alert_radius_m)
+            weighted = 0.0
+            for i in near.tolist():
+                alert = alerts[i]
+                hours_apart = abs(alert.timestamp.hour - bucket.hour)
+                similar = min(hours_apart, 24 - hours_apart) <= SIMILAR_HOURS
+                weighted += SEVERITY_WEIGHTS.get(alert.severity, 1.0) * (1.0 if similar else 0.5)
+            alert_penalty = MAX_ALERT_PENALTY * (1.0 - np.exp(-weighted / ALERT_SATURATION))
+            nearby_alerts = len(near)
+
+        time_penalty = _time_penalty(bucket.hour)
+        score = max(0.0, min(100.0, 100.0 - zone_penalty - alert_penalty - time_penalty))
+        return DestinationSafety(
+            destination=destination,
+            place=place,
+            score=score,
+            zone_penalty=zone_penalty,
+            alert_penalty=float(alert_penalty),
+            time_penalty=time_penalty,
+            nearby_zones=nearby_zones,
+            nearby_alerts=nearby_alerts,
+        )
+
+
+destination_safety = DestinationSafetyService.from_settings()
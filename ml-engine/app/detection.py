@@ -1,22 +1,53 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+import threading
+from datetime import timedelta
 from typing import List, Optional, Tuple
 
 from haversine import Unit, haversine
 from shapely import geometry
-from shapely.geometry import Point, shape
+from shapely.geometry import shape
 import joblib
 import numpy as np
 
 from .config import get_settings
+from .hazard_raster import HazardRaster
+from .realtime import hub
+from .reorder import reorder_buffer
+from .spatial_index import position_index
 from .schemas import AlertPayload, GeofenceStatus, Observation, RoutePlan
+from .state_backend import state
 from .storage import store
 from .training import ModelBundle, load_or_train_model
 
 
 settings = get_settings()
 
+# Hourly risk multipliers for zones without a `risk_profile`: 1.5 at night
+# (20:00-06:00), 1.2 around dawn and dusk, 1.0 during the day
+DEFAULT_RISK_PROFILE = np.array([1.5] * 6 + [1.2] * 2 + [1.0] * 10 + [1.2] * 2 + [1.5] * 4)
+
+
+def parse_risk_profile(value) -> np.ndarray:
+    """Hourly risk multipliers (24 values) from a zone's `risk_profile` property.
+
+    Accepts a list of 24 multipliers or a mapping of "start-end" hour ranges
+    (wrapping past midnight, e.g. "20-6") to multipliers; hours not covered
+    by a range are 1.0. A missing profile gives `DEFAULT_RISK_PROFILE`.
+    """
+    if value is None:
+        return DEFAULT_RISK_PROFILE.copy()
+    if isinstance(value, list):
+        if len(value) != 24:
+            raise ValueError(f"risk_profile needs 24 hourly values, got {len(value)}")
+        return np.array(value, dtype=np.float64)
+    profile = np.ones(24)
+    for hours, multiplier in value.items():
+        start, end = (int(h) % 24 for h in hours.split("-"))
+        span = (end - start) % 24 or 24
+        profile[(start + np.arange(span)) % 24] = float(multiplier)
+    return profile
+
 
 def distance_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
     return haversine(a, b, unit=Unit.METERS)
@@ -33,14 +64,64 @@ def min_distance_to_route(obs: Observation, plan: RoutePlan) -> float:
 class DetectionEngine:
     def __init__(self) -> None:
         self.model_bundle: ModelBundle = load_or_train_model()
-        self._danger_polygons = self._load_danger_zones()
-        self._last_motion: dict[str, datetime] = {}
+        self.zones_version = 0
+        # Revision of the zones file published by /danger-zones/reload in any
+        # worker; workers behind it reload (see `sync_danger_zones`)
+        self._zones_revision = self._published_zones_revision()
+        self._zones_lock = threading.Lock()
+        self.reload_danger_zones()
+
+    def reload_danger_zones(self) -> int:
+        """(Re)load danger zones and rebuild their rasters.
+
+        Returns:
+            The new zones version; caches derived from the zones compare
+            against it to invalidate themselves
+        """
+        zones, risk_profiles = self._load_danger_zones()
+        polygons = [polygon for polygon, _, _, _ in zones]
+        hazard = HazardRaster(polygons, cell_deg=settings.hazard_cell_deg)
+        nearby_hazard = HazardRaster(
+            [polygon.buffer(settings.hazard_nearby_buffer_deg) for polygon in polygons],
+            cell_deg=settings.hazard_cell_deg,
+        )
+        self._danger_polygons, self.zone_risk_profiles = zones, risk_profiles
+        self.hazard, self.nearby_hazard = hazard, nearby_hazard
+        self.zones_version += 1
+        return self.zones_version
+
+    def publish_danger_zones(self) -> int:
+        """Reload the danger zones here and have every other worker follow.
+
+        Returns:
+            The new (local) zones version
+        """
+        with self._zones_lock:
+            self._zones_revision = state.incr("danger_zones", "revision")
+            return self.reload_danger_zones()
+
+    def danger_zones_stale(self) -> bool:
+        return self._published_zones_revision() != self._zones_revision
+
+    def sync_danger_zones(self) -> None:
+        """Reload the danger zones if another worker published a newer revision."""
+        with self._zones_lock:
+            revision = self._published_zones_revision()
+            if revision != self._zones_revision:
+                self.reload_danger_zones()
+                self._zones_revision = revision
 
-    def _load_danger_zones(self) -> List[Tuple[geometry.Polygon, str, str, str]]:
+    @staticmethod
+    def _published_zones_revision() -> int:
+        return state.get("danger_zones", "revision") or 0
+
+    def _load_danger_zones(self) -> Tuple[List[Tuple[geometry.Polygon, str, str, str]], np.ndarray]:
+        """Zone (polygon, name, risk level, advisory) tuples and their hourly risk profiles."""
         danger_features: List[Tuple[geometry.Polygon, str, str, str]] = []
+        risk_profiles: List[np.ndarray] = []
         path = settings.danger_zones_path
         if not path.exists():
-            return danger_features
+            return danger_features, np.ones((0, 24))
 
         import json
 
@@ -57,7 +138,8 @@ class DetectionEngine:
                         props.get("advisory", ""),
                     )
                 )
-        return danger_features
+                risk_profiles.append(parse_risk_profile(props.get("risk_profile")))
+        return danger_features, np.array(risk_profiles).reshape(-1, 24)
 
     def process_observation(self, obs: Observation) -> List[AlertPayload]:
         alerts: List[AlertPayload] = []
@@ -72,9 +154,19 @@ class DetectionEngine:
         from .behavioral_analyzer import get_behavioral_analyzer
         analyzer = get_behavioral_analyzer()
         
-        # Add observation to behavioral history
+        # Add observation to behavioral history (inserted in time order)
+        arrival = reorder_buffer.admit(obs)
         analyzer.add_observation(obs)
-        history = analyzer.get_observation_history(obs.tourist_id, obs.trip_id, hours=2)
+        if arrival.expired:
+            print(
+                f"[STREAM] {obs.tourist_id}/{obs.trip_id}: observation "
+                f"{arrival.lateness_seconds:.0f}s behind the trip, stored without checks"
+            )
+            return []
+        # A late observation's windows reach back 2 h from it
+        history = analyzer.get_observation_history(
+            obs.tourist_id, obs.trip_id, hours=2 + arrival.lateness_seconds / 3600
+        )
 
         # Check 1: Route deviation (existing)
         if route:
@@ -91,14 +183,16 @@ class DetectionEngine:
                 )
 
         # Check 2: Inactivity (existing)
-        inactivity_alert = self._check_inactivity(obs)
+        inactivity_alert = self._check_inactivity(obs, late=arrival.late)
         if inactivity_alert:
             alerts.append(inactivity_alert)
 
-        # Check 3: Danger zone (existing)
-        danger_alert = self._check_danger_zone(obs)
-        if danger_alert:
-            alerts.append(danger_alert)
+        # Check 3: Danger zone (existing). Skipped for late observations,
+        # which must not move the trip's live position and zone status back
+        if not arrival.late:
+            danger_alert = self._check_danger_zone(obs)
+            if danger_alert:
+                alerts.append(danger_alert)
 
         # Check 4: Basic anomaly (existing Isolation Forest)
         anomaly_alert = self._anomaly_score(obs)
@@ -138,15 +232,23 @@ class DetectionEngine:
                 dispatched.append(alert)
         return dispatched
 
-    def _check_inactivity(self, obs: Observation) -> Optional[AlertPayload]:
+    def _check_inactivity(self, obs: Observation, late: bool = False) -> Optional[AlertPayload]:
+        """Alert when the trip hasn't moved for the inactivity threshold.
+
+        The last motion time only moves forward, and late observations
+        can update it but never alert: later points were already checked.
+        """
         key = f"{obs.tourist_id}::{obs.trip_id}"
-        last_motion = self._last_motion.get(key, obs.timestamp)
+        last_motion = state.get("last_motion", key)
         if obs.speed_mps > 0.4:
-            self._last_motion[key] = obs.timestamp
+            if last_motion is None or obs.timestamp.timestamp() > last_motion:
+                state.set("last_motion", key, obs.timestamp.timestamp())
+            return None
+        if late:
             return None
 
         threshold = timedelta(minutes=settings.inactivity_threshold_minutes)
-        if obs.timestamp - last_motion > threshold:
+        if last_motion is not None and obs.timestamp.timestamp() - last_motion > threshold.total_seconds():
             return self._build_alert(
                 obs,
                 "long_inactivity",
@@ -158,6 +260,14 @@ class DetectionEngine:
 
     def _check_danger_zone(self, obs: Observation) -> Optional[AlertPayload]:
         zone = self._detect_zone(obs)
+        position_index.update(
+            obs.tourist_id,
+            obs.trip_id,
+            obs.lat,
+            obs.lng,
+            obs.timestamp,
+            zone["name"] if zone else None,
+        )
         status = GeofenceStatus(
             tourist_id=obs.tourist_id,
             trip_id=obs.trip_id,
@@ -169,7 +279,9 @@ class DetectionEngine:
             lng=obs.lng,
             last_updated=obs.timestamp,
         )
-        store.update_geofence_status(status)
+        previous = store.get_geofence_status(obs.tourist_id, obs.trip_id)
+        if store.update_geofence_status(status):
+            hub.publish_geofence(status, previous)
 
         if zone:
             return self._build_alert(
@@ -182,11 +294,15 @@ class DetectionEngine:
         return None
 
     def _detect_zone(self, obs: Observation) -> Optional[dict[str, str]]:
-        point = Point(obs.lng, obs.lat)
-        for polygon, name, risk, advisory in self._danger_polygons:
-            if polygon.contains(point):
-                return {"name": name, "risk": risk, "advisory": advisory}
-        return None
+        zone_id = self.hazard.first_zone_at(obs.lat, obs.lng)
+        if zone_id is None:
+            return None
+        _, name, risk, advisory = self._danger_polygons[zone_id]
+        return {"name": name, "risk": risk, "advisory": advisory}
+
+    def zones_nearby(self, lat: float, lng: float) -> List[str]:
+        """Names of danger zones within the nearby buffer of a point."""
+        return [self._danger_polygons[z][1] for z in self.nearby_hazard.zones_at(lat, lng)]
 
     def _anomaly_score(self, obs: Observation) -> Optional[AlertPayload]:
         features = np.array(
@@ -226,6 +342,8 @@ class DetectionEngine:
             severity=severity,  # type: ignore[arg-type]
             message=message,
             metadata=metadata,
+            lat=obs.lat,
+            lng=obs.lng,
         )
 
 
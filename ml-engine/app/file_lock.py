@@ -0,0 +1,70 @@
+"""Advisory locks on files, shared by the worker processes on a host.
+
+Uses ``fcntl.flock`` on POSIX and ``msvcrt.locking`` (on the first byte)
+on Windows, each imported only on its own platform.
+"""
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(f: IO, blocking: bool) -> bool:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.05)
+
+    def _unlock(f: IO) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock(f: IO, blocking: bool) -> bool:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _unlock(f: IO) -> None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def try_lock(path: Path) -> IO | None:
+    """Take an exclusive lock on `path` without waiting.
+
+    Returns:
+        The open lock file (the lock is held until it is closed), or None
+        if another process holds it
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    f = open(path, "a+")
+    if not _lock(f, blocking=False):
+        f.close()
+        return None
+    return f
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on `path` for the enclosed block, waiting for it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+") as f:
+        _lock(f, blocking=True)
+        try:
+            yield
+        finally:
+            _unlock(f)
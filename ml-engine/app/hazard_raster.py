@@ -0,0 +1,195 @@
+"""Rasterized danger-zone lookup.
+
+The area covered by the danger zones is split into a lat/lng grid at load
+time. Every cell is classified per zone as fully inside, boundary
+(partially covered) or outside, and cells with the same classification
+share one entry in a small table, so the grid itself is a single int32
+array. A point lookup is an array index; exact geometry is only evaluated
+for zones whose boundary runs through the point's cell.
+"""
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely import geometry
+from shapely.geometry import LineString
+
+OUTSIDE = -1
+
+_Combo = Tuple[Tuple[int, ...], Tuple[int, ...]]
+
+
+class HazardRaster:
+    """Grid of per-cell zone coverage over a list of polygons (lng/lat)."""
+
+    def __init__(
+        self,
+        polygons: Sequence[geometry.base.BaseGeometry],
+        cell_deg: float = 0.001,
+        max_cells: int = 4_000_000,
+    ) -> None:
+        self.polygons = list(polygons)
+        for polygon in self.polygons:
+            shapely.prepare(polygon)
+
+        self.lookups = 0
+        self.exact_checks = 0
+        self._combos: List[_Combo] = []
+
+        if not self.polygons:
+            self.cell_deg = cell_deg
+            self.origin = (0.0, 0.0)
+            self.grid = np.full((0, 0), OUTSIDE, dtype=np.int32)
+            return
+
+        min_x, min_y, max_x, max_y = shapely.total_bounds(self.polygons)
+        while True:
+            nx = math.floor((max_x - min_x) / cell_deg) + 1
+            ny = math.floor((max_y - min_y) / cell_deg) + 1
+            if nx * ny <= max_cells:
+                break
+            cell_deg *= 2
+
+        self.cell_deg = cell_deg
+        self.origin = (min_x, min_y)
+        self.grid = np.full((ny, nx), OUTSIDE, dtype=np.int32)
+        self._build()
+
+    # ============ Build ============
+
+    def _build(self) -> None:
+        ny, nx = self.grid.shape
+        min_x, min_y = self.origin
+        cell = self.cell_deg
+        full: Dict[int, List[int]] = {}
+        boundary: Dict[int, List[int]] = {}
+
+        for zone_id, polygon in enumerate(self.polygons):
+            x0, y0, x1, y1 = polygon.bounds
+            c0, r0 = self._cell_of(x0, y0)
+            c1, r1 = self._cell_of(x1, y1)
+            cols, rows = np.meshgrid(np.arange(c0, c1 + 1), np.arange(r0, r1 + 1))
+            cols, rows = cols.ravel(), rows.ravel()
+
+            boxes = shapely.box(
+                min_x + cols * cell,
+                min_y + rows * cell,
+                min_x + (cols + 1) * cell,
+                min_y + (rows + 1) * cell,
+            )
+            inside = shapely.contains_properly(polygon, boxes)
+            touched = shapely.intersects(polygon, boxes)
+
+            flat = rows * nx + cols
+            for index in flat[inside]:
+                full.setdefault(int(index), []).append(zone_id)
+            for index in flat[touched & ~inside]:
+                boundary.setdefault(int(index), []).append(zone_id)
+
+        codes: Dict[_Combo, int] = {}
+        flat_grid = self.grid.reshape(-1)
+        for index in full.keys() | boundary.keys():
+            combo = (tuple(full.get(index, ())), tuple(boundary.get(index, ())))
+            code = codes.get(combo)
+            if code is None:
+                code = codes[combo] = len(self._combos)
+                self._combos.append(combo)
+            flat_grid[index] = code
+
+    def _cell_of(self, x: float, y: float) -> Tuple[int, int]:
+        ny, nx = self.grid.shape
+        col = math.floor((x - self.origin[0]) / self.cell_deg)
+        row = math.floor((y - self.origin[1]) / self.cell_deg)
+        return min(max(col, 0), nx - 1), min(max(row, 0), ny - 1)
+
+    def _code(self, lat: float, lng: float) -> int:
+        col = math.floor((lng - self.origin[0]) / self.cell_deg)
+        row = math.floor((lat - self.origin[1]) / self.cell_deg)
+        ny, nx = self.grid.shape
+        if 0 <= row < ny and 0 <= col < nx:
+            return int(self.grid[row, col])
+        return OUTSIDE
+
+    # ============ Queries ============
+
+    def zones_at(self, lat: float, lng: float) -> List[int]:
+        """Indices of the zones containing a point, in zone order."""
+        self.lookups += 1
+        code = self._code(lat, lng)
+        if code == OUTSIDE:
+            return []
+        inside, boundary = self._combos[code]
+        if not boundary:
+            return list(inside)
+
+        self.exact_checks += 1
+        hits = [z for z in boundary if shapely.contains_xy(self.polygons[z], lng, lat)]
+        return sorted(inside + tuple(hits))
+
+    def first_zone_at(self, lat: float, lng: float) -> Optional[int]:
+        zones = self.zones_at(lat, lng)
+        return zones[0] if zones else None
+
+    def segment_zones(self, lat1: float, lng1: float, lat2: float, lng2: float) -> List[int]:
+        """Indices of the zones a straight segment intersects, in zone order."""
+        candidates = self._zones_in_bbox(min(lat1, lat2), min(lng1, lng2), max(lat1, lat2), max(lng1, lng2))
+        if not candidates:
+            return []
+
+        # An endpoint in a fully covered cell settles that zone without geometry
+        settled = set()
+        for lat, lng in ((lat1, lng1), (lat2, lng2)):
+            code = self._code(lat, lng)
+            if code != OUTSIDE:
+                settled.update(self._combos[code][0])
+
+        line = None
+        hits = []
+        for zone_id in candidates:
+            if zone_id in settled:
+                hits.append(zone_id)
+                continue
+            if line is None:
+                line = LineString([(lng1, lat1), (lng2, lat2)])
+                self.exact_checks += 1
+            if shapely.intersects(self.polygons[zone_id], line):
+                hits.append(zone_id)
+        return hits
+
+    def _zones_in_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[int]:
+        ny, nx = self.grid.shape
+        if nx == 0:
+            return []
+        min_x, min_y = self.origin
+        max_x = min_x + nx * self.cell_deg
+        max_y = min_y + ny * self.cell_deg
+        if max_lng < min_x or min_lng > max_x or max_lat < min_y or min_lat > max_y:
+            return []
+
+        c0, r0 = self._cell_of(min_lng, min_lat)
+        c1, r1 = self._cell_of(max_lng, max_lat)
+        codes = np.unique(self.grid[r0:r1 + 1, c0:c1 + 1])
+        zones = set()
+        for code in codes[codes != OUTSIDE]:
+            inside, boundary = self._combos[code]
+            zones.update(inside)
+            zones.update(boundary)
+        return sorted(zones)
+
+    def stats(self) -> Dict[str, float]:
+        ny, nx = self.grid.shape
+        covered = int(np.count_nonzero(self.grid != OUTSIDE))
+        boundary_codes = np.array([bool(b) for _, b in self._combos] or [False])
+        boundary_cells = int(np.count_nonzero(boundary_codes[self.grid[self.grid != OUTSIDE]])) if covered else 0
+        return {
+            "zones": len(self.polygons),
+            "cell_deg": self.cell_deg,
+            "cells": nx * ny,
+            "covered_cells": covered,
+            "boundary_cells": boundary_cells,
+            "lookups": self.lookups,
+            "exact_checks": self.exact_checks,
+        }
@@ -0,0 +1,238 @@
+"""Incident density layer: a kernel density estimate of past alerts.
+
+The density is kept on a fixed grid with one layer per hour of day
+(``float32[24, rows, cols]``). Each incident adds a Gaussian kernel in
+space and in (circular) hour, scaled by severity, so a single incident has
+density equal to its weight at its own cell and hour. Reading a point is a
+single array lookup.
+
+The grid lives in an ``.npy`` file that every worker memory-maps, so
+increments made by one process are visible to the others through the
+page cache. It is seeded from the labelled historical observations and
+grows as alerts are recorded. It is opened (or built) on first use;
+delete the file (or change the grid settings) to rebuild it. Workers starting together put their grid in
+place under a lock file, so all of them map the same one. Concurrent
+increments from different processes are not locked against each other;
+an occasional lost update only slightly underestimates the density.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import get_settings
+from .file_lock import file_lock
+from .road_graph import EARTH_RADIUS_M
+from .schemas import AlertPayload
+
+SEVERITY_WEIGHTS = {"high": 3.0, "medium": 2.0, "low": 1.0}
+HISTORICAL_LABELS = ("label_route_deviation", "label_inactivity", "label_danger")
+_METERS_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+
+
+class IncidentHeatmap:
+    """Memory-mapped hourly incident density grid."""
+
+    def __init__(
+        self,
+        path: Path,
+        bounds: tuple[float, float, float, float],
+        cell_deg: float = 0.005,
+        bandwidth_m: float = 500.0,
+        hour_bandwidth: float = 1.5,
+        saturation: float = 3.0,
+        seed_csv: Optional[Path] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.min_lat, self.min_lng, max_lat, max_lng = bounds
+        self.cell_deg = cell_deg
+        self.saturation = saturation
+        self.rows = max(1, math.ceil((max_lat - self.min_lat) / cell_deg))
+        self.cols = max(1, math.ceil((max_lng - self.min_lng) / cell_deg))
+        self._lock = threading.Lock()
+
+        # Separable kernel: hour offsets x row offsets x col offsets, peak 1.0
+        mid_lat = math.radians((self.min_lat + max_lat) / 2)
+        sigma_rows = bandwidth_m / (cell_deg * _METERS_PER_DEGREE)
+        sigma_cols = sigma_rows / max(math.cos(mid_lat), 1e-6)
+        kernels = [self._gaussian(sigma) for sigma in (hour_bandwidth, sigma_rows, sigma_cols)]
+        self._hour_offsets = np.arange(len(kernels[0])) - len(kernels[0]) // 2
+        self._kernel = (
+            kernels[0][:, None, None] * kernels[1][None, :, None] * kernels[2][None, None, :]
+        ).astype(np.float32)
+
+        self._meta = {
+            "bounds": [self.min_lat, self.min_lng, max_lat, max_lng],
+            "cell_deg": cell_deg,
+            "bandwidth_m": bandwidth_m,
+            "hour_bandwidth": hour_bandwidth,
+        }
+        self._grid = self._open(seed_csv)
+
+    @classmethod
+    def from_settings(cls) -> "IncidentHeatmap":
+        settings = get_settings()
+        return cls(
+            path=settings.heatmap_path,
+            bounds=(
+                settings.heatmap_min_lat,
+                settings.heatmap_min_lng,
+                settings.heatmap_max_lat,
+                settings.heatmap_max_lng,
+            ),
+            cell_deg=settings.heatmap_cell_deg,
+            bandwidth_m=settings.heatmap_bandwidth_m,
+            hour_bandwidth=settings.heatmap_hour_bandwidth,
+            saturation=settings.heatmap_saturation,
+            seed_csv=settings.historical_dataset,
+        )
+
+    @staticmethod
+    def _gaussian(sigma: float) -> np.ndarray:
+        radius = max(0, math.ceil(3 * sigma))
+        offsets = np.arange(-radius, radius + 1)
+        return np.exp(-0.5 * (offsets / max(sigma, 1e-6)) ** 2)
+
+    # ============ Storage ============
+
+    def _open(self, seed_csv: Optional[Path]) -> np.ndarray:
+        grid = self._open_existing()
+        if grid is not None:
+            return grid
+
+        # Build into a temporary file and link it into place; if another
+        # worker got there first, use its grid instead
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        self._grid = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float32, shape=(24, self.rows, self.cols)
+        )
+        if seed_csv is not None and Path(seed_csv).exists():
+            self._seed(Path(seed_csv))
+        self._grid.flush()
+        del self._grid
+        try:
+            with file_lock(self.path.with_name(f"{self.path.name}.lock")):
+                grid = self._open_existing()
+                if grid is not None:
+                    return grid
+                # Missing, or built for other settings: only replaced under the
+                # lock, so a grid other workers have mapped is never unlinked
+                # while they are still starting up
+                if self.path.exists():
+                    self.path.unlink()
+                os.link(tmp_path, self.path)
+                self._meta_path.write_text(json.dumps(self._meta))
+        finally:
+            tmp_path.unlink()
+        return np.load(self.path, mmap_mode="r+")
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.path.with_suffix(".json")
+
+    def _open_existing(self) -> Optional[np.ndarray]:
+        """The grid at `path` if it was built for these settings."""
+        if not (self.path.exists() and self._meta_path.exists()):
+            return None
+        try:
+            if json.loads(self._meta_path.read_text()) != self._meta:
+                return None
+            grid = np.load(self.path, mmap_mode="r+")
+        except (OSError, ValueError):
+            return None  # being replaced
+        return grid if grid.shape == (24, self.rows, self.cols) else None
+
+    def _seed(self, csv_path: Path) -> None:
+        """Add the labelled incidents of the historical observations."""
+        df = pd.read_csv(csv_path, parse_dates=["timestamp"])
+        labels = [column for column in HISTORICAL_LABELS if column in df.columns]
+        incidents = df[df[labels].any(axis=1)] if labels else df.iloc[0:0]
+        for row in incidents.itertuples():
+            self.add(row.lat, row.lng, row.timestamp.hour, float(sum(getattr(row, label) for label in labels)))
+
+    # ============ Updates ============
+
+    def add(self, lat: float, lng: float, hour: int, weight: float = 1.0) -> None:
+        """Add one incident's kernel, centred on its cell and hour."""
+        row = math.floor((lat - self.min_lat) / self.cell_deg)
+        col = math.floor((lng - self.min_lng) / self.cell_deg)
+        _, ky, kx = self._kernel.shape
+        ry, rx = ky // 2, kx // 2
+        r0, r1 = max(row - ry, 0), min(row + ry + 1, self.rows)
+        c0, c1 = max(col - rx, 0), min(col + rx + 1, self.cols)
+        if r0 >= r1 or c0 >= c1:
+            return  # kernel entirely outside the grid
+        hours = (hour + self._hour_offsets) % 24
+        patch = self._kernel[:, r0 - row + ry:r1 - row + ry, c0 - col + rx:c1 - col + rx] * np.float32(weight)
+        with self._lock:
+            self._grid[hours, r0:r1, c0:c1] += patch
+
+    def add_alert(self, alert: AlertPayload) -> None:
+        if alert.lat is None or alert.lng is None:
+            return
+        self.add(alert.lat, alert.lng, alert.timestamp.hour, SEVERITY_WEIGHTS.get(alert.severity, 1.0))
+
+    # ============ Reads ============
+
+    def density_at(self, lat, lng, hour: Optional[int] = None) -> np.ndarray:
+        """Density at each (lat, lng); averaged over the day if `hour` is None."""
+        rows = np.floor((np.asarray(lat, dtype=np.float64) - self.min_lat) / self.cell_deg).astype(np.int64)
+        cols = np.floor((np.asarray(lng, dtype=np.float64) - self.min_lng) / self.cell_deg).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        rows, cols = np.where(inside, rows, 0), np.where(inside, cols, 0)
+        if hour is None:
+            values = self._grid[:, rows, cols].mean(axis=0)
+        else:
+            values = self._grid[hour % 24, rows, cols]
+        return np.where(inside, values, 0.0)
+
+    def density(self, lat: float, lng: float, hour: Optional[int] = None) -> float:
+        return float(self.density_at(lat, lng, hour))
+
+    def segment_max_density(self, a: np.ndarray, b: np.ndarray, hour: Optional[int] = None) -> np.ndarray:
+        """Highest density along each segment a[i]-b[i] ((lng, lat) arrays), sampled once per cell."""
+        if not len(a):
+            return np.zeros(0)
+        span = np.abs(b - a).max(axis=1) / self.cell_deg
+        steps = np.minimum(np.ceil(span), self.rows + self.cols).astype(np.int64) + 1
+        offsets = np.zeros(len(a) + 1, dtype=np.int64)
+        np.cumsum(steps, out=offsets[1:])
+        seg = np.repeat(np.arange(len(a)), steps)
+        t = (np.arange(offsets[-1]) - offsets[seg]) / np.maximum(steps[seg] - 1, 1)
+        samples = a[seg] + (b[seg] - a[seg]) * t[:, None]
+        return np.maximum.reduceat(self.density_at(samples[:, 1], samples[:, 0], hour), offsets[:-1])
+
+    def risk(self, lat: float, lng: float, hour: Optional[int] = None) -> float:
+        """Density mapped to 0..1 (about 0.63 at `saturation` weighted incidents)."""
+        return 1.0 - math.exp(-self.density(lat, lng, hour) / self.saturation)
+
+    def risk_level(self, lat: float, lng: float, hour: Optional[int] = None) -> str:
+        risk = self.risk(lat, lng, hour)
+        if risk >= 0.6:
+            return "high"
+        if risk >= 0.3:
+            return "medium"
+        return "low"
+
+
+# Singleton instance, opened (or built) on first use
+_incident_heatmap: Optional[IncidentHeatmap] = None
+_incident_heatmap_lock = threading.Lock()
+
+
+def get_incident_heatmap() -> IncidentHeatmap:
+    """Get or create the incident heatmap singleton."""
+    global _incident_heatmap
+    if _incident_heatmap is None:
+        with _incident_heatmap_lock:
+            if _incident_heatmap is None:
+                _incident_heatmap = IncidentHeatmap.from_settings()
+    return _incident_heatmap
@@ -24,6 +24,7 @@ except ImportError:
 
 from .config import get_settings
 from .schemas import RiskLevel
+from .state_backend import state
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -38,7 +39,6 @@ class LLMService:
         self.host = settings.ollama_host
         self.timeout = settings.llm_timeout
         self.max_tokens = settings.llm_max_tokens
-        self._cache: Dict[str, str] = {}
         
         if self.enabled:
             try:
@@ -79,9 +79,10 @@ class LLMService:
         
         # Check cache
         cache_key = f"{system_prompt}::{prompt}"
-        if cache_key in self._cache:
+        cached = state.get("llm_cache", cache_key)
+        if cached is not None:
             logger.debug("Returning cached response")
-            return self._cache[cache_key]
+            return cached
         
         try:
             messages = []
@@ -100,13 +101,8 @@ class LLMService:
             
             result = response['message']['content'].strip()
             
-            # Cache the response
-            self._cache[cache_key] = result
-            
-            # Limit cache size
-            if len(self._cache) > 100:
-                # Remove oldest entry
-                self._cache.pop(next(iter(self._cache)))
+            # Cache the response (oldest entries beyond 100 are evicted)
+            state.set("llm_cache", cache_key, result, max_entries=100)
             
             return result
             
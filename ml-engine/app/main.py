@@ -1,19 +1,40 @@
 from __future__ import annotations
 
 import numpy as np
-from fastapi import FastAPI, HTTPException
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
+from .alert_aggregation import aggregator
+from .alert_store import alert_store
+from .destination_safety import destination_safety
+from .incident_heatmap import get_incident_heatmap
 from .alerts import dispatcher
+from .config import get_settings
 from .detection import engine
 from .schemas import (
     AlertHistoryResponse,
+    AlertType,
     GeofenceStatus,
+    RiskLevel,
     Observation,
     RoutePlan,
+    RoutePoint,
+    RoutePreferences,
     SafeRouteRequest,
     SafeRouteResponse,
     RouteSegment,
+    RiskExposure,
+    RouteScore,
+    RouteScoreBatchRequest,
+    RouteScoreBatchResponse,
+    SegmentScore,
     DangerZoneCrossing,
     TrainRequest,
     TrainResponse,
@@ -31,16 +52,28 @@ from .schemas import (
     DistressAssessmentRequest,
     DistressAssessmentResponse,
     InvestigationRequest,
+    LiveTourist,
+    NearbyTouristsResponse,
+    PolygonQueryRequest,
+    ZoneOccupancyResponse,
     InvestigationReportResponse,
     BehavioralPatternResponse,
 )
+from .state_backend import acquire_worker_lock
 from .storage import store
+from .reorder import reorder_buffer
+from .stream import StreamBusy, stream
 from .training import handle_training_request
 from .blockchain_routes import router as blockchain_router
 from . import route_scoring
 from .llm_service import get_llm_service
+from .realtime import EventFilter, hub
+from .routing import get_router, start_router_build
+from .spatial_index import LivePosition, position_index
 from .behavioral_analyzer import get_behavioral_analyzer
 
+settings = get_settings()
+
 app = FastAPI(title="TourGuard ML Engine", version="1.1.0")
 
 # Add CORS middleware for Flutter app
@@ -56,6 +89,41 @@ app.add_middleware(
 app.include_router(blockchain_router)
 
 
+@app.on_event("startup")
+def check_single_worker() -> None:
+    """Refuse to run next to another worker unless explicitly allowed."""
+    if settings.allow_multiple_workers:
+        return
+    if not acquire_worker_lock(settings.data_dir / "worker.lock"):
+        raise RuntimeError(
+            f"Another ML engine worker is already using {settings.data_dir}. Live positions, "
+            "event streams and alert storm windows are per process, so extra workers give "
+            "partial results. Run one worker per instance, or set "
+            "ML_ENGINE_ALLOW_MULTIPLE_WORKERS=true (with ML_ENGINE_STATE_BACKEND=sqlite)."
+        )
+
+
+@app.on_event("startup")
+def build_router() -> None:
+    """Load the road graph in the background; safe routes use the direct line until it is ready."""
+    start_router_build()
+
+
+@app.middleware("http")
+async def sync_danger_zones(request: Request, call_next):
+    """Pick up danger zones reloaded by another worker before serving the request."""
+    if engine.danger_zones_stale():
+        await run_in_threadpool(engine.sync_danger_zones)
+    return await call_next(request)
+
+
+@app.on_event("shutdown")
+def shutdown_dispatcher() -> None:
+    stream.stop()
+    aggregator.stop()
+    dispatcher.stop()
+
+
 @app.get("/health")
 def health() -> dict[str, str]:
     return {"status": "ok"}
@@ -70,98 +138,331 @@ def register_route(plan: RoutePlan) -> dict[str, str]:
 
 
 @app.post("/observations")
-def ingest_observation(obs: Observation) -> dict[str, str]:
-    store.add_observation(obs)
-    alerts = engine.process_observation(obs)
-    for alert in alerts:
-        dispatcher.dispatch(alert)
+def ingest_observation(obs: Observation, response: Response) -> dict[str, str]:
+    """Process an observation on its trip's ingest shard (in order per trip)."""
+    try:
+        future = stream.submit(obs)
+    except StreamBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    try:
+        alerts = future.result(settings.stream_result_timeout_seconds)
+    except FutureTimeoutError:
+        # Still queued behind the trip's earlier observations; it will be processed
+        response.status_code = 202
+        return {"message": "Observation queued", "alerts_triggered": "pending"}
     return {"message": "Observation ingested", "alerts_triggered": str(len(alerts))}
 
 
+@app.get("/stream/stats")
+def stream_stats() -> list[dict[str, int]]:
+    """Queue depth and counters per ingest shard."""
+    return stream.stats()
+
+
+@app.get("/stream/ordering")
+def stream_ordering() -> dict[str, int]:
+    """Observations that arrived in order, late, or behind the watermark (unchecked)."""
+    return reorder_buffer.stats()
+
+
 @app.post("/train", response_model=TrainResponse)
 def retrain_model(payload: TrainRequest) -> TrainResponse:
     return handle_training_request(payload.retrain_with_new_data, payload.persist_model)
 
 
+@app.post("/danger-zones/reload")
+def reload_danger_zones() -> dict[str, int]:
+    """Re-read the danger zones file in every worker; zone-derived caches invalidate themselves."""
+    version = engine.publish_danger_zones()
+    return {"zones": len(engine._danger_polygons), "version": version}
+
+
 @app.get("/alerts/{trip_id}", response_model=AlertHistoryResponse)
-def fetch_alerts(trip_id: str) -> AlertHistoryResponse:
-    alerts = dispatcher.history(trip_id)
-    return AlertHistoryResponse(trip_id=trip_id, alerts=alerts)
+def fetch_alerts(
+    trip_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    severity: Optional[RiskLevel] = None,
+    alert_type: Optional[AlertType] = None,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=500),
+) -> AlertHistoryResponse:
+    alerts, total = alert_store.query(
+        trip_id,
+        since=since,
+        until=until,
+        severity=severity,
+        alert_type=alert_type,
+        limit=limit,
+        offset=offset,
+    )
+    return AlertHistoryResponse(
+        trip_id=trip_id, alerts=alerts, total=total, offset=offset, limit=limit
+    )
+
+
+@app.get("/dispatcher/metrics")
+def dispatcher_metrics() -> dict:
+    """Per-channel queue depth, delivery counters and latency."""
+    return {
+        "channels": dispatcher.metrics(),
+        "dead_letters": dispatcher.dead_letters(limit=20),
+    }
+
+
+@app.get("/alert-digests")
+def alert_digests(limit: int = Query(default=50, ge=1, le=200)) -> dict:
+    """Recent digest alerts and per zone/type counts over the sliding window."""
+    return {
+        "window_counts": aggregator.window_counts(),
+        "digests": aggregator.recent_digests(limit),
+    }
 
 
 @app.get("/geofence-status", response_model=list[GeofenceStatus])
-def geofence_status() -> list[GeofenceStatus]:
-    return store.list_geofence_status()
+def geofence_status(
+    response: Response,
+    since: Optional[int] = Query(default=None, ge=0, description="Only statuses changed after this version"),
+    zone: Optional[str] = None,
+    inside: Optional[bool] = None,
+) -> list[GeofenceStatus]:
+    """Zone status per trip; poll with `since` = last X-Geofence-Version to get changes only."""
+    statuses, version, full = store.geofence_changes(since=since, zone=zone, inside=inside)
+    response.headers["X-Geofence-Version"] = str(version)
+    response.headers["X-Geofence-Full"] = "true" if full else "false"
+    return statuses
+
+
+def _event_filter(
+    types: Optional[str],
+    zone: Optional[str],
+    trip_id: Optional[str],
+    severity: Optional[str],
+) -> EventFilter:
+    return EventFilter(
+        types={t.strip() for t in types.split(",") if t.strip()} if types else None,
+        zone=zone,
+        trip_id=trip_id,
+        min_severity=severity,
+    )
+
+
+@app.get("/stream/events")
+async def stream_events(
+    request: Request,
+    types: Optional[str] = Query(default=None, description="Comma-separated: alert,geofence"),
+    zone: Optional[str] = None,
+    trip_id: Optional[str] = None,
+    severity: Optional[RiskLevel] = Query(default=None, description="Minimum severity"),
+) -> StreamingResponse:
+    """Server-Sent Events stream of new alerts and geofence changes."""
+    subscription = hub.subscribe(_event_filter(types, zone, trip_id, severity))
+
+    async def events():
+        with subscription:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=15)
+                yield event.sse() if event else ": keepalive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/ws/events")
+async def websocket_events(
+    websocket: WebSocket,
+    types: Optional[str] = None,
+    zone: Optional[str] = None,
+    trip_id: Optional[str] = None,
+    severity: Optional[RiskLevel] = None,
+) -> None:
+    """WebSocket stream of new alerts and geofence changes (same filters as SSE)."""
+    await websocket.accept()
+    with hub.subscribe(_event_filter(types, zone, trip_id, severity)) as subscription:
+        try:
+            while True:
+                event = await subscription.get(timeout=15)
+                await websocket.send_text(event.message() if event else '{"type": "keepalive"}')
+        except WebSocketDisconnect:
+            pass
+
+
+def _live_tourist(position: LivePosition, distance_m: Optional[float] = None) -> LiveTourist:
+    return LiveTourist(
+        tourist_id=position.tourist_id,
+        trip_id=position.trip_id,
+        lat=position.lat,
+        lng=position.lng,
+        last_seen=position.timestamp,
+        zone_name=position.zone,
+        distance_m=round(distance_m, 1) if distance_m is not None else None,
+    )
+
+
+@app.get("/responders/nearby", response_model=NearbyTouristsResponse)
+def responders_nearby(
+    lat: float = Query(ge=-90, le=90),
+    lng: float = Query(ge=-180, le=180),
+    radius_m: float = Query(default=2000, gt=0, le=50000),
+    limit: int = Query(default=500, ge=1, le=5000),
+) -> NearbyTouristsResponse:
+    """Tourists last seen within `radius_m` of an incident, nearest first."""
+    hits = position_index.within_radius(lat, lng, radius_m)
+    return NearbyTouristsResponse(
+        count=len(hits),
+        tourists=[_live_tourist(position, distance) for position, distance in hits[:limit]],
+    )
+
+
+@app.post("/responders/within-polygon", response_model=NearbyTouristsResponse)
+def responders_within_polygon(request: PolygonQueryRequest) -> NearbyTouristsResponse:
+    """Tourists last seen inside an arbitrary polygon."""
+    positions = position_index.within_polygon([(p[0], p[1]) for p in request.polygon])
+    return NearbyTouristsResponse(
+        count=len(positions),
+        tourists=[_live_tourist(position) for position in positions],
+    )
+
+
+@app.get("/responders/zone-occupancy", response_model=ZoneOccupancyResponse)
+def responders_zone_occupancy() -> ZoneOccupancyResponse:
+    """Live trip count per danger zone."""
+    return ZoneOccupancyResponse(
+        live_trips=len(position_index),
+        zones=position_index.zone_occupancy(),
+    )
 
 
 @app.post("/routes/safe-route", response_model=SafeRouteResponse)
 def calculate_safe_route(request: SafeRouteRequest) -> SafeRouteResponse:
     """Calculate safe route options with safety scores.
     
-    This endpoint accepts origin and destination coordinates and returns
-    multiple route alternatives scored for safety based on danger zones,
-time of day, and historical incidents.
-    
-    For now, this is a simplified implementation that returns a single
-    direct route with safety scoring. Future versions will integrate with
-    external routing APIs (ORS/OSRM) for multiple route alternatives.
+    Routes are searched on the local road graph (`ML_ENGINE_ROAD_GRAPH_PATH`)
+    with danger-zone penalties in the edge costs, returning up to
+    `ML_ENGINE_ROUTING_ALTERNATIVES` alternatives scored for safety based on
+    danger zones and time of day. Without a road graph, or if the endpoints
+    can't be snapped to it, the direct line is scored instead.
     """
-    from datetime import datetime
-    
-    # Build simple direct route (single segment)
-    # In production, this would call ORS/OSRM API for multiple alternatives
-    direct_route_points = [request.origin, request.destination]
-    
-    # Calculate safety score for the direct route
-    timestamp = request.preferences.time_of_travel if request.preferences else datetime.now()
-    safety_score, metadata = route_scoring.calculate_overall_route_score(
-        direct_route_points,
-        timestamp
-    )
-    
-    # Get danger zone crossings
-    impact = route_scoring.get_route_safety_impact(direct_route_points)
-    
-    # Convert to DangerZoneCrossing objects
-    crossings = [
-        DangerZoneCrossing(
-            name=zone["name"],
-            risk_level=zone["risk_level"],  # type: ignore[arg-type]
-            advisory=zone.get("advisory"),
-        )
-        for zone in impact["zones_crossed"]
-    ]
-    
-    # Build route segment
-    # Calculate approximate distance (simple haversine)
     from haversine import haversine, Unit
-    distance_km = haversine(
-        (request.origin.lat, request.origin.lng),
-        (request.destination.lat, request.destination.lng),
-        unit=Unit.KILOMETERS
-    )
     
-    # Estimate duration (assume 40 km/h average speed)
-    duration_min = (distance_km / 40.0) * 60
-    
-    route_segment = RouteSegment(
-        coordinates=direct_route_points,
-        safety_score=safety_score,
-        danger_zones_crossed=crossings,
-        estimated_duration_min=duration_min,
-        distance_km=distance_km,
-        high_risk_zones=impact["high_risk_count"],
-        medium_risk_zones=impact["medium_risk_count"],
-        low_risk_zones=impact["low_risk_count"],
+    preferences = request.preferences or RoutePreferences()
+    timestamp = preferences.time_of_travel or datetime.now()
+    origin = (request.origin.lat, request.origin.lng)
+    destination = (request.destination.lat, request.destination.lng)
+    
+    # (points, distance_km, duration_min) per candidate route
+    candidates = []
+    router = get_router()
+    if router is not None:
+        for path in router.route(
+            origin,
+            destination,
+            k=settings.routing_alternatives,
+            avoid_danger=preferences.avoid_danger_zones,
+            max_detour_pct=preferences.max_detour_pct,
+            max_snap_m=settings.routing_max_snap_m,
+        ):
+            # Legs to and from the snapped nodes estimated at 40 km/h
+            snap_km = (
+                haversine(origin, path.points[0], unit=Unit.KILOMETERS)
+                + haversine(path.points[-1], destination, unit=Unit.KILOMETERS)
+            )
+            points = [request.origin, *(RoutePoint(lat=lat, lng=lng) for lat, lng in path.points), request.destination]
+            candidates.append((
+                points,
+                path.distance_m / 1000 + snap_km,
+                path.duration_s / 60 + (snap_km / 40.0) * 60,
+            ))
+    
+    if not candidates:
+        # Direct route; duration assumes 40 km/h average speed
+        distance_km = haversine(origin, destination, unit=Unit.KILOMETERS)
+        candidates.append(([request.origin, request.destination], distance_km, (distance_km / 40.0) * 60))
+    
+    routes = []
+    for points, distance_km, duration_min in candidates:
+        analysis = route_scoring.analyze_route(points, timestamp)
+        safety_score = analysis.safety_score
+        impact = analysis.impact()
+        crossings = [
+            DangerZoneCrossing(
+                name=zone["name"],
+                risk_level=zone["risk_level"],  # type: ignore[arg-type]
+                advisory=zone.get("advisory"),
+            )
+            for zone in impact["zones_crossed"]
+        ]
+        routes.append(RouteSegment(
+            coordinates=points,
+            safety_score=safety_score,
+            danger_zones_crossed=crossings,
+            estimated_duration_min=duration_min,
+            distance_km=distance_km,
+            high_risk_zones=impact["high_risk_count"],
+            medium_risk_zones=impact["medium_risk_count"],
+            low_risk_zones=impact["low_risk_count"],
+            exposure=RiskExposure(**analysis.exposure(
+                distance_km * 1000 / (duration_min * 60) if duration_min > 0 else None
+            )),
+        ))
+    
+    # Safest route wins; faster route breaks ties
+    recommended = max(
+        range(len(routes)),
+        key=lambda i: (routes[i].safety_score, -routes[i].estimated_duration_min),
     )
     
     return SafeRouteResponse(
-        routes=[route_segment],
-        recommended_route_index=0,
+        routes=routes,
+        recommended_route_index=recommended,
         calculation_timestamp=datetime.now(),
     )
 
 
+@app.post("/routes/score-batch", response_model=RouteScoreBatchResponse)
+def score_routes_batch(request: RouteScoreBatchRequest) -> RouteScoreBatchResponse:
+    """Score many candidate routes (fleets, itinerary planning) in one call."""
+    if len(request.routes) > settings.route_batch_max_routes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.route_batch_max_routes} routes per batch.",
+        )
+    
+    started = time.perf_counter()
+    scored = route_scoring.score_routes_batch([route.points for route in request.routes], request.time_of_travel)
+    zones = engine._danger_polygons
+    
+    results = []
+    for route, score in zip(request.routes, scored):
+        impact = score.impact()
+        results.append(RouteScore(
+            id=route.id,
+            safety_score=score.safety_score,
+            danger_zones_crossed=[
+                DangerZoneCrossing(
+                    name=zone["name"],
+                    risk_level=zone["risk_level"],  # type: ignore[arg-type]
+                    advisory=zone.get("advisory"),
+                )
+                for zone in impact["zones_crossed"]
+            ],
+            high_risk_zones=impact["high_risk_count"],
+            medium_risk_zones=impact["medium_risk_count"],
+            low_risk_zones=impact["low_risk_count"],
+            exposure=RiskExposure(**score.exposure()),
+            segments=[
+                SegmentScore(index=i, safety_score=seg_score, danger_zones=[zones[z][1] for z in seg_zones])
+                for i, (seg_score, seg_zones) in enumerate(zip(score.segment_scores, score.segment_zones))
+            ] if request.include_segments else None,
+        ))
+    
+    return RouteScoreBatchResponse(results=results, elapsed_ms=(time.perf_counter() - started) * 1000)
+
+
 # ============================================================================
 # LLM-Powered AI Features
 # ============================================================================
@@ -248,10 +549,13 @@ def generate_safety_advisory(request: SafetyAdvisoryRequest) -> SafetyAdvisoryRe
     """
     llm = get_llm_service()
     
+    # Past incidents around this point at the current hour (one heatmap lookup)
+    incident_risk = get_incident_heatmap().risk_level(request.location.lat, request.location.lng, datetime.now().hour)
+    
     if not llm.is_available():
         return SafetyAdvisoryResponse(
             advisory_text="Safety advisory service is currently unavailable. Please check back later.",
-            risk_assessment=request.current_risk_level or "medium",
+            risk_assessment=request.current_risk_level or incident_risk,  # type: ignore[arg-type]
             recommendations=["Stay aware of your surroundings", "Keep emergency contacts handy"],
             danger_zones_nearby=[]
         )
@@ -259,20 +563,15 @@ def generate_safety_advisory(request: SafetyAdvisoryRequest) -> SafetyAdvisoryRe
     # Generate advisory
     advisory_text, risk_assessment, recommendations = llm.generate_safety_advisory(
         location_name=request.location.name or f"Location ({request.location.lat}, {request.location.lng})",
-        risk_level=request.current_risk_level,
+        risk_level=request.current_risk_level or incident_risk,
         time_of_day=request.time_of_day,
         user_profile=request.user_profile
     )
     
     # Check for nearby danger zones
     from .detection import engine
-    nearby_zones = []
-    for polygon, name, risk, advisory in engine._danger_polygons:
-        from shapely.geometry import Point
-        point = Point(request.location.lng, request.location.lat)
-        # Check if within 1km buffer (approximate)
-        if polygon.buffer(0.01).contains(point):
-            nearby_zones.append(name)
+    # Within ~1km of a zone (buffer precomputed on the hazard raster)
+    nearby_zones = engine.zones_nearby(request.location.lat, request.location.lng)
     
     return SafetyAdvisoryResponse(
         advisory_text=advisory_text,
@@ -295,18 +594,24 @@ def suggest_safe_itinerary(request: ItineraryRequest) -> ItineraryResponse:
     """
     llm = get_llm_service()
     
+    # Scored from danger zones, recent alerts and time of day (cached per hour)
+    safety_scores = destination_safety.scores(request.destinations)
+    unknown_notes = [
+        f"No safety data for {dest}: not found in the gazetteer."
+        for dest in request.destinations
+        if dest not in safety_scores
+    ]
+    
     if not llm.is_available():
         return ItineraryResponse(
             itinerary_text="Itinerary service is currently unavailable. Please try again later.",
             daily_plan=[],
-            overall_safety_score=70.0,
-            safety_notes=["Service temporarily unavailable"]
+            overall_safety_score=(
+                sum(safety_scores.values()) / len(safety_scores) if safety_scores else 70.0
+            ),
+            safety_notes=["Service temporarily unavailable", *unknown_notes]
         )
     
-    # TODO: In the future, calculate actual safety scores for each destination
-    # For now, use a default moderate-high score
-    safety_scores = {dest: 75.0 for dest in request.destinations}
-    
     # Generate itinerary
     itinerary_text, daily_plan, overall_safety, safety_notes = llm.suggest_itinerary(
         destinations=request.destinations,
@@ -319,7 +624,7 @@ def suggest_safe_itinerary(request: ItineraryRequest) -> ItineraryResponse:
         itinerary_text=itinerary_text,
         daily_plan=daily_plan,
         overall_safety_score=overall_safety,
-        safety_notes=safety_notes
+        safety_notes=[*unknown_notes, *safety_notes]
     )
 
 
@@ -482,7 +787,7 @@ def generate_investigation_report(request: InvestigationRequest) -> Investigatio
         obs_dicts.append(obs_dict)
     
     # Get alerts from history with full context
-    alerts_response = dispatcher.history(request.trip_id)
+    alerts_response = alert_store.history(request.trip_id)
     alert_dicts = []
     for alert in alerts_response:
         alert_dict = {
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+
+from .schemas import AlertPayload, GeofenceStatus
+
+EVENT_ALERT = "alert"
+EVENT_GEOFENCE = "geofence"
+
+_SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2}
+
+
+@dataclass(frozen=True)
+class Event:
+    """A published change, serialized once and shared by all subscribers."""
+    id: int
+    type: str
+    zone: Optional[str]
+    trip_id: Optional[str]
+    severity: Optional[str]
+    data: str  # JSON
+
+    def sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+    def message(self) -> str:
+        return f'{{"id": {self.id}, "type": "{self.type}", "data": {self.data}}}'
+
+
+@dataclass(frozen=True)
+class EventFilter:
+    """Subscription filter; unset fields match everything."""
+    types: Optional[Set[str]] = None
+    zone: Optional[str] = None
+    trip_id: Optional[str] = None
+    min_severity: Optional[str] = None
+
+    def matches(self, event: Event) -> bool:
+        if self.types and event.type not in self.types:
+            return False
+        if self.zone and event.zone != self.zone:
+            return False
+        if self.trip_id and event.trip_id != self.trip_id:
+            return False
+        if self.min_severity:
+            if event.severity is None:
+                return False
+            return _SEVERITY_RANK[event.severity] >= _SEVERITY_RANK[self.min_severity]
+        return True
+
+
+class Subscription:
+    """A client's bounded event queue on its own event loop.
+
+    If the client falls behind, the oldest events are dropped and counted
+    rather than letting publishers block or memory grow.
+    """
+
+    def __init__(self, hub: "EventHub", event_filter: EventFilter, max_queue: int) -> None:
+        self._hub = hub
+        self.filter = event_filter
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def _put(self, event: Event) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Next event, or None if `timeout` elapses first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self._hub.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class EventHub:
+    """In-process pub/sub for alerts and geofence changes.
+
+    `publish_*` may be called from any thread (ingest runs in FastAPI's
+    threadpool, delivery in the dispatcher thread); events are handed to
+    each subscriber's loop with `call_soon_threadsafe`.
+    """
+
+    def __init__(self, max_queue: int = 1000) -> None:
+        self.max_queue = max_queue
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+
+    def subscribe(self, event_filter: Optional[EventFilter] = None) -> Subscription:
+        """Register a subscriber; must be called from the consumer's event loop."""
+        sub = Subscription(self, event_filter or EventFilter(), self.max_queue)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish_alert(self, alert: AlertPayload) -> None:
+        if not self._subscribers:
+            return
+        self._publish(
+            EVENT_ALERT,
+            zone=alert.metadata.get("zone"),
+            trip_id=alert.trip_id,
+            severity=alert.severity,
+            data=alert.model_dump(mode="json"),
+        )
+
+    def publish_geofence(self, status: GeofenceStatus, previous: Optional[GeofenceStatus]) -> None:
+        """Publish a zone entry/exit/change (callers skip unchanged statuses)."""
+        if not self._subscribers:
+            return
+        zone = status.zone_name or (previous.zone_name if previous else None)
+        severity = status.risk_level or (previous.risk_level if previous else None)
+        data = status.model_dump(mode="json")
+        data["previous_zone"] = previous.zone_name if previous else None
+        self._publish(EVENT_GEOFENCE, zone=zone, trip_id=status.trip_id, severity=severity, data=data)
+
+    def _publish(
+        self,
+        event_type: str,
+        zone: Optional[str],
+        trip_id: Optional[str],
+        severity: Optional[str],
+        data: Dict[str, Any],
+    ) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+            event_id = next(self._ids)
+            self.published += 1
+
+        data.setdefault("published_at", datetime.now(timezone.utc).isoformat())
+        event = Event(
+            id=event_id,
+            type=event_type,
+            zone=zone,
+            trip_id=trip_id,
+            severity=severity,
+            data=json.dumps(data),
+        )
+        for sub in subscribers:
+            if sub.filter.matches(event):
+                try:
+                    sub.loop.call_soon_threadsafe(sub._put, event)
+                except RuntimeError:
+                    # Subscriber's loop has closed
+                    self.unsubscribe(sub)
+
+
+hub = EventHub()
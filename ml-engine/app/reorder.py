@@ -0,0 +1,68 @@
+"""Event-time ordering of each trip's observations.
+
+Phones that were offline upload stale points, possibly interleaved with
+live ones. Each trip's newest observation time is kept in the state
+backend; the trip's watermark trails it by the allowed lateness.
+
+- Points at or after the newest time are in order and get every check.
+- Points behind it but at or after the watermark are late. They are
+  inserted into the time-ordered history and only the checks whose
+  windows include them are re-run.
+- Points before the watermark are expired. They are stored but not
+  checked, so a replayed backlog can't raise a burst of stale alerts.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from .config import get_settings
+from .schemas import Observation
+from .state_backend import StateBackend, state
+
+
+@dataclass(frozen=True)
+class Arrival:
+    late: bool  # older than a point the trip already processed
+    expired: bool  # older than the trip's watermark
+    lateness_seconds: float  # behind the trip's newest point (0 if in order)
+
+
+class ReorderBuffer:
+    """Per-trip newest event time and watermark."""
+
+    NAMESPACE = "trip_event_time"
+
+    def __init__(self, backend: StateBackend, max_lateness_seconds: float = 1800.0) -> None:
+        self.backend = backend
+        self.max_lateness_seconds = max_lateness_seconds
+
+    @classmethod
+    def from_settings(cls) -> "ReorderBuffer":
+        return cls(state, max_lateness_seconds=get_settings().observation_max_lateness_seconds)
+
+    def admit(self, obs: Observation) -> Arrival:
+        """Classify an observation against its trip's watermark and advance it."""
+        key = f"{obs.tourist_id}::{obs.trip_id}"
+        ts = obs.timestamp.timestamp()
+        with self.backend.atomic():
+            newest = self.backend.get(self.NAMESPACE, key)
+            if newest is None or ts >= newest:
+                self.backend.set(self.NAMESPACE, key, ts)
+                arrival = Arrival(late=False, expired=False, lateness_seconds=0.0)
+            else:
+                lateness = newest - ts
+                arrival = Arrival(late=True, expired=lateness > self.max_lateness_seconds, lateness_seconds=lateness)
+            self.backend.incr("reorder_stats", "expired" if arrival.expired else "late" if arrival.late else "in_order")
+        return arrival
+
+    def watermark(self, tourist_id: str, trip_id: str) -> Optional[float]:
+        """Epoch seconds before which the trip's points are no longer checked."""
+        newest = self.backend.get(self.NAMESPACE, f"{tourist_id}::{trip_id}")
+        return None if newest is None else newest - self.max_lateness_seconds
+
+    def stats(self) -> Dict[str, int]:
+        return {name: self.backend.get("reorder_stats", name) or 0 for name in ("in_order", "late", "expired")}
+
+
+reorder_buffer = ReorderBuffer.from_settings()
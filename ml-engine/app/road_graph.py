@@ -0,0 +1,174 @@
+"""Compact road graph loaded from an OpenStreetMap XML extract.
+
+Nodes are the OSM nodes used by routable ways; edges are stored in CSR
+form (``indptr``/``indices``) with length and speed per edge. Parsing an
+extract is slow, so the arrays are cached in an ``.npz`` file next to it
+and reused while the extract is unchanged.
+"""
+from __future__ import annotations
+
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_008.8
+
+# Default speeds (km/h) for routable highway classes
+HIGHWAY_SPEEDS_KMH: Dict[str, float] = {
+    "motorway": 90, "motorway_link": 50,
+    "trunk": 70, "trunk_link": 40,
+    "primary": 55, "primary_link": 35,
+    "secondary": 45, "secondary_link": 30,
+    "tertiary": 35, "tertiary_link": 25,
+    "unclassified": 30, "residential": 25,
+    "living_street": 10, "service": 15,
+    "track": 15, "road": 25,
+}
+
+_ONEWAY_FORWARD = {"yes", "true", "1"}
+_MAXSPEED = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(mph)?")
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters; accepts scalars or numpy arrays."""
+    lat1, lng1, lat2, lng2 = (np.radians(v) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _speed_kmh(tags: Dict[str, str]) -> float:
+    match = _MAXSPEED.match(tags.get("maxspeed", ""))
+    if match:
+        speed = float(match.group(1))
+        return speed * 1.609 if match.group(2) else speed
+    return HIGHWAY_SPEEDS_KMH[tags["highway"]]
+
+
+class RoadGraph:
+    """Directed road graph in CSR form.
+
+    Edges leaving node ``u`` are ``indices[indptr[u]:indptr[u + 1]]`` with
+    matching ``length_m`` and ``speed_mps`` entries.
+    """
+
+    def __init__(
+        self,
+        node_ids: np.ndarray,
+        lat: np.ndarray,
+        lng: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        length_m: np.ndarray,
+        speed_mps: np.ndarray,
+    ) -> None:
+        self.node_ids = node_ids
+        self.lat = lat
+        self.lng = lng
+        self.indptr = indptr
+        self.indices = indices
+        self.length_m = length_m
+        self.speed_mps = speed_mps
+        self._tree = None
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    @property
+    def travel_time_s(self) -> np.ndarray:
+        return self.length_m / self.speed_mps
+
+    def edge_sources(self) -> np.ndarray:
+        """Source node of every edge (the CSR row expanded)."""
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.indptr))
+
+    def nearest_node(self, lat: float, lng: float) -> Tuple[int, float]:
+        """Closest node to a point and its distance in meters."""
+        if self._tree is None:
+            from sklearn.neighbors import BallTree
+
+            self._tree = BallTree(np.radians(np.column_stack([self.lat, self.lng])), metric="haversine")
+        dist, idx = self._tree.query(np.radians([[lat, lng]]), k=1)
+        return int(idx[0][0]), float(dist[0][0] * EARTH_RADIUS_M)
+
+    # ============ Loading ============
+
+    @classmethod
+    def load(cls, osm_path: Path, cache_path: Optional[Path] = None) -> "RoadGraph":
+        """Load a graph, parsing the extract only if the cache is missing or stale."""
+        osm_path = Path(osm_path)
+        cache_path = Path(cache_path) if cache_path else osm_path.with_suffix(".graph.npz")
+        stat = osm_path.stat()
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+
+        if cache_path.exists():
+            with np.load(cache_path) as data:
+                if str(data["source"]) == signature:
+                    return cls(*(data[name] for name in _ARRAYS))
+
+        graph = cls.from_osm_xml(osm_path)
+        tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.savez(f, source=np.array(signature), **{name: getattr(graph, name) for name in _ARRAYS})
+        tmp_path.replace(cache_path)
+        return graph
+
+    @classmethod
+    def from_osm_xml(cls, path: Path) -> "RoadGraph":
+        coords: Dict[int, Tuple[float, float]] = {}
+        edges_u: List[int] = []
+        edges_v: List[int] = []
+        edge_speed: List[float] = []
+
+        for _, elem in ET.iterparse(str(path), events=("end",)):
+            if elem.tag == "node":
+                coords[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+                elem.clear()
+            elif elem.tag == "way":
+                tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+                refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                if tags.get("highway") in HIGHWAY_SPEEDS_KMH and len(refs) > 1:
+                    oneway = tags.get("oneway", "no")
+                    if oneway == "-1":
+                        refs.reverse()
+                    forward_only = oneway in _ONEWAY_FORWARD or oneway == "-1" or tags.get("junction") == "roundabout"
+                    speed = _speed_kmh(tags) / 3.6
+                    for u, v in zip(refs, refs[1:]):
+                        edges_u.append(u)
+                        edges_v.append(v)
+                        edge_speed.append(speed)
+                        if not forward_only:
+                            edges_u.append(v)
+                            edges_v.append(u)
+                            edge_speed.append(speed)
+                elem.clear()
+
+        u_ids = np.array(edges_u, dtype=np.int64)
+        v_ids = np.array(edges_v, dtype=np.int64)
+        known = np.fromiter((u in coords and v in coords for u, v in zip(edges_u, edges_v)), dtype=bool, count=len(edges_u))
+        u_ids, v_ids = u_ids[known], v_ids[known]
+        speeds = np.array(edge_speed, dtype=np.float32)[known]
+
+        node_ids, inverse = np.unique(np.concatenate([u_ids, v_ids]), return_inverse=True)
+        u = inverse[: len(u_ids)].astype(np.int32)
+        v = inverse[len(u_ids):].astype(np.int32)
+        node_coords = np.array([coords[i] for i in node_ids.tolist()], dtype=np.float64).reshape(-1, 2)
+        lat, lng = node_coords[:, 0], node_coords[:, 1]
+
+        order = np.argsort(u, kind="stable")
+        u, v, speeds = u[order], v[order], speeds[order]
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(u, minlength=len(node_ids)), out=indptr[1:])
+        length = haversine_m(lat[u], lng[u], lat[v], lng[v]).astype(np.float32)
+
+        return cls(node_ids, lat, lng, indptr, v, length, speeds)
+
+
+_ARRAYS = ("node_ids", "lat", "lng", "indptr", "indices", "length_m", "speed_mps")
@@ -1,20 +1,314 @@
 """Route safety scoring module for TourGuard ML Engine.
 
 Calculates safety scores for route segments based on:
-- Danger zone intersections
-- Historical incident data
-- Time-of-day factors
+- Exposure to danger zones (metres inside each zone)
+- Historical incident data (the hourly incident heatmap along the route)
+- Time-of-day factors (each zone's hourly risk profile)
+
+A zone's penalty grows with the distance travelled inside it and saturates
+at the full risk-level penalty, so a 5 m clip barely counts while a long
+traverse counts fully, and the score doesn't depend on how densely the
+route is sampled. Intersection lengths are measured in a local metric
+projection centred on the zones, with all segments intersected in one
+vectorized pass. Per-segment exposure is memoized on quantized endpoints;
+the time of day is applied afterwards, so cached entries serve any hour.
 """
 from __future__ import annotations
 
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from shapely.geometry import LineString, Point
+import numpy as np
+import shapely
+from shapely.geometry import LineString
 from shapely import geometry
 
+from .config import get_settings
 from .schemas import RoutePoint, DangerZone
 from .detection import engine
+from .incident_heatmap import get_incident_heatmap
+
+settings = get_settings()
+
+# Score penalty for a long stretch inside a danger zone, by risk level
+RISK_PENALTIES = {"high": 45.0, "medium": 30.0, "low": 15.0}
+RISK_CLASSES = ("high", "medium", "low")
+# Penalty for the highest incident density along a route, at full saturation
+INCIDENT_PENALTY = 20.0
+
+# Endpoint quantization for cache keys (1e-5 degrees, about 1 m)
+_QUANTUM = 1e5
+_METERS_PER_DEGREE = 6_371_008.8 * np.pi / 180
+
+SegmentKey = Tuple[int, int, int, int]
+# (zone ids, metres inside each of them, metres inside each risk class)
+SegmentResult = Tuple[Tuple[int, ...], Tuple[float, ...], Tuple[float, float, float]]
+
+
+class SegmentScoreCache:
+    """LRU of per-segment zone exposure, dropped whenever the zones reload."""
+
+    def __init__(self, max_entries: int = 100_000) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[SegmentKey, SegmentResult]" = OrderedDict()
+        self._zones_version = engine.zones_version
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: SegmentKey) -> Optional[SegmentResult]:
+        with self._lock:
+            if self._zones_version != engine.zones_version:
+                self._entries.clear()
+                self._zones_version = engine.zones_version
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: SegmentKey, result: SegmentResult, zones_version: int) -> None:
+        with self._lock:
+            if zones_version != self._zones_version:
+                return  # computed against zones that have since been replaced
+            self._entries[key] = result
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+segment_cache = SegmentScoreCache(settings.route_segment_cache_size)
+
+
+# ============ Zone index ============
+
+@dataclass
+class _ZoneIndex:
+    """Zones projected to metres around their centre, with an STRtree over them."""
+    version: int
+    tree: Optional[shapely.STRtree]
+    polygons: np.ndarray  # projected zone polygons
+    class_polygons: np.ndarray  # projected union of the zones of each risk class
+    zone_class: np.ndarray  # index into RISK_CLASSES per zone
+    penalties: np.ndarray
+    profiles: np.ndarray  # (zones, 24) hourly risk multipliers
+    bounds: np.ndarray  # total bounds in degrees
+    origin: np.ndarray  # (lng, lat) of the projection centre
+    scale: np.ndarray  # metres per degree of (lng, lat)
+
+    def project(self, coords: np.ndarray) -> np.ndarray:
+        """(lng, lat) degrees to local (x, y) metres; equirectangular, so lines stay lines."""
+        return (coords - self.origin) * self.scale
+
+    def hour_weights(self, timestamp: datetime | None) -> np.ndarray:
+        if timestamp is None:
+            return np.ones(len(self.penalties))
+        return self.profiles[:, timestamp.hour]
+
+    def exposure(self, a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Intersect segments a[i]-b[i] ((lng, lat) arrays) with the zones.
+
+        Returns:
+            (segment, zone, metres) arrays of the intersecting pairs, sorted by
+            segment then zone, and the metres of each segment inside each
+            risk class (overlapping zones of one class are counted once)
+        """
+        class_m = np.zeros((len(a), len(RISK_CLASSES)))
+        empty = np.zeros(0, dtype=np.int64)
+        if self.tree is None or not len(a):
+            return empty, empty, np.zeros(0), class_m
+
+        # Only segments whose bounding box meets the zones' bounds need geometry
+        min_x, min_y, max_x, max_y = self.bounds
+        near = np.flatnonzero(
+            (np.maximum(a[:, 0], b[:, 0]) >= min_x) & (np.minimum(a[:, 0], b[:, 0]) <= max_x)
+            & (np.maximum(a[:, 1], b[:, 1]) >= min_y) & (np.minimum(a[:, 1], b[:, 1]) <= max_y)
+        )
+        if not len(near):
+            return empty, empty, np.zeros(0), class_m
+
+        lines = shapely.linestrings(np.stack([self.project(a[near]), self.project(b[near])], axis=1))
+        hit, zone_idx = self.tree.query(lines, predicate="intersects")
+        order = np.lexsort((zone_idx, hit))
+        hit, zone_idx = hit[order], zone_idx[order]
+        meters = shapely.length(shapely.intersection(lines[hit], self.polygons[zone_idx]))
+
+        classes = self.zone_class[zone_idx]
+        np.add.at(class_m, (near[hit], classes), meters)
+        # Segments inside several overlapping zones of one class: measure the union instead
+        pair_key = hit * len(RISK_CLASSES) + classes
+        keys, counts = np.unique(pair_key, return_counts=True)
+        overlapping = keys[counts > 1]
+        if len(overlapping):
+            seg, cls = np.divmod(overlapping, len(RISK_CLASSES))
+            class_m[near[seg], cls] = shapely.length(shapely.intersection(lines[seg], self.class_polygons[cls]))
+        return near[hit], zone_idx, meters, class_m
+
+
+_zone_index: Optional[_ZoneIndex] = None
+_zone_index_lock = threading.Lock()
+
+
+def _get_zone_index() -> _ZoneIndex:
+    """Projected zones, penalties and risk profiles, rebuilt after a reload."""
+    global _zone_index
+    index = _zone_index
+    if index is not None and index.version == engine.zones_version:
+        return index
+    with _zone_index_lock:
+        version = engine.zones_version
+        if _zone_index is not None and _zone_index.version == version:
+            return _zone_index
+        zones, profiles = engine._danger_polygons, engine.zone_risk_profiles
+        polygons = np.array([polygon for polygon, _, _, _ in zones], dtype=object)
+        bounds = shapely.total_bounds(polygons) if zones else np.zeros(4)
+        origin = np.array([(bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2])
+        scale = np.array([_METERS_PER_DEGREE * np.cos(np.radians(origin[1])), _METERS_PER_DEGREE])
+        projected = shapely.transform(polygons, lambda coords: (coords - origin) * scale) if zones else polygons
+        zone_class = np.array(
+            [RISK_CLASSES.index(risk) if risk in RISK_CLASSES else RISK_CLASSES.index("low") for _, _, risk, _ in zones],
+            dtype=np.int64,
+        )
+        _zone_index = _ZoneIndex(
+            version=version,
+            tree=shapely.STRtree(projected) if zones else None,
+            polygons=projected,
+            class_polygons=np.array(
+                [shapely.union_all(projected[zone_class == c]) for c in range(len(RISK_CLASSES))], dtype=object
+            ),
+            zone_class=zone_class,
+            penalties=np.array([RISK_PENALTIES[RISK_CLASSES[c]] for c in zone_class], dtype=np.float64),
+            profiles=profiles,
+            bounds=bounds,
+            origin=origin,
+            scale=scale,
+        )
+        return _zone_index
+
+
+def _zone_penalty(index: _ZoneIndex, zone_idx: np.ndarray, meters: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Penalty for `meters` travelled inside each zone, saturating at its full penalty."""
+    saturation = 1.0 - np.exp(-meters / settings.route_exposure_scale_m)
+    return index.penalties[zone_idx] * weights[zone_idx] * saturation
+
+
+def _incident_penalty(max_density: np.ndarray) -> np.ndarray:
+    return INCIDENT_PENALTY * (1.0 - np.exp(-max_density / get_incident_heatmap().saturation))
+
+
+def _exposure_summary(class_meters, speed_mps: float | None = None) -> dict[str, dict[str, float]]:
+    speed = speed_mps or settings.route_exposure_speed_kmh / 3.6
+    meters = {risk: float(m) for risk, m in zip(RISK_CLASSES, class_meters)}
+    return {
+        "meters": meters,
+        "minutes": {risk: m / speed / 60 for risk, m in meters.items()},
+    }
+
+
+# ============ Per-route scoring ============
+
+def _segment_exposure(points: List[RoutePoint]) -> List[SegmentResult]:
+    """Zone exposure of each segment, from the cache or one vectorized pass over the misses."""
+    keys = [
+        (round(p1.lat * _QUANTUM), round(p1.lng * _QUANTUM), round(p2.lat * _QUANTUM), round(p2.lng * _QUANTUM))
+        for p1, p2 in zip(points, points[1:])
+    ]
+    results: List[Optional[SegmentResult]] = [segment_cache.get(key) for key in keys]
+    missing: Dict[SegmentKey, int] = {}
+    for i, result in enumerate(results):
+        if result is None:
+            missing.setdefault(keys[i], i)
+    if not missing:
+        return results
+
+    zones_version = engine.zones_version
+    index = _get_zone_index()
+    first = np.fromiter(missing.values(), dtype=np.int64, count=len(missing))
+    coords = np.array([(p.lng, p.lat) for p in points], dtype=np.float64)
+    seg_idx, zone_idx, meters, class_m = index.exposure(coords[first], coords[first + 1])
+
+    computed: Dict[SegmentKey, SegmentResult] = {}
+    bounds = np.searchsorted(seg_idx, np.arange(len(first) + 1))
+    for j, key in enumerate(missing):
+        lo, hi = bounds[j], bounds[j + 1]
+        computed[key] = (
+            tuple(zone_idx[lo:hi].tolist()),
+            tuple(meters[lo:hi].tolist()),
+            tuple(class_m[j].tolist()),
+        )
+        segment_cache.put(key, computed[key], zones_version)
+    return [result if result is not None else computed[key] for key, result in zip(keys, results)]
+
+
+@dataclass
+class RouteAnalysis:
+    """Scores and zone exposure of a route, computed once."""
+    safety_score: float
+    segment_scores: List[float]
+    zone_ids: List[int]  # zones crossed, in zone order
+    zone_meters: Dict[int, float]  # metres travelled inside each crossed zone
+    class_meters: Tuple[float, float, float]  # metres inside each of RISK_CLASSES
+    incident_penalty: float = 0.0  # from the incident heatmap along the route
+
+    def impact(self) -> dict[str, any]:
+        return _impact(engine._danger_polygons[z] for z in self.zone_ids)
+
+    def exposure(self, speed_mps: float | None = None) -> dict[str, dict[str, float]]:
+        """Metres and expected minutes inside each risk class.
+
+        Minutes assume `speed_mps`, or `ML_ENGINE_ROUTE_EXPOSURE_SPEED_KMH`.
+        """
+        return _exposure_summary(self.class_meters, speed_mps)
+
+
+def analyze_route(route_points: List[RoutePoint], timestamp: datetime | None = None) -> RouteAnalysis:
+    """Score every segment of a route and measure its exposure to each zone.
+
+    Pass the result to `calculate_overall_route_score` and use its
+    `impact()` instead of `get_route_safety_impact` to avoid repeating
+    the intersection work.
+    """
+    segments = _segment_exposure(route_points) if len(route_points) > 1 else []
+    index = _get_zone_index()
+    weights = index.hour_weights(timestamp)
+
+    seg_idx = np.repeat(np.arange(len(segments)), [len(zones) for zones, _, _ in segments])
+    zone_idx = np.array([z for zones, _, _ in segments for z in zones], dtype=np.int64)
+    meters = np.array([m for _, seg_meters, _ in segments for m in seg_meters], dtype=np.float64)
+    segment_penalty = np.bincount(
+        seg_idx, weights=_zone_penalty(index, zone_idx, meters, weights), minlength=len(segments)
+    )
+
+    zone_meters: Dict[int, float] = {}
+    for zone, m in zip(zone_idx.tolist(), meters.tolist()):
+        zone_meters[zone] = zone_meters.get(zone, 0.0) + m
+    zone_ids = sorted(zone_meters)
+    totals = np.array([zone_meters[z] for z in zone_ids])
+    route_penalty = _zone_penalty(index, np.array(zone_ids, dtype=np.int64), totals, weights).sum()
+    class_meters = np.array([seg_class for _, _, seg_class in segments]).reshape(-1, len(RISK_CLASSES)).sum(axis=0)
+
+    # Incident density read fresh each time (the heatmap keeps growing)
+    coords = np.array([(p.lng, p.lat) for p in route_points], dtype=np.float64).reshape(-1, 2)
+    segment_incidents = _incident_penalty(
+        get_incident_heatmap().segment_max_density(coords[:-1], coords[1:], timestamp.hour if timestamp else None)
+    )
+    incident_penalty = float(segment_incidents.max()) if len(segment_incidents) else 0.0
+
+    return RouteAnalysis(
+        safety_score=float(np.clip(100.0 - route_penalty - incident_penalty, 0.0, 100.0)),
+        segment_scores=np.clip(100.0 - segment_penalty - segment_incidents, 0.0, 100.0).tolist(),
+        zone_ids=zone_ids,
+        zone_meters=zone_meters,
+        class_meters=tuple(class_meters.tolist()),
+        incident_penalty=incident_penalty,
+    )
 
 
 def score_route_segment(
@@ -29,136 +323,73 @@ def score_route_segment(
     Args:
         lat1, lng1: Start point coordinates
         lat2, lng2: End point coordinates
-        timestamp: Time of travel (for time-of-day adjustment)
+        timestamp: Time of travel (for the zones' time-of-day risk profiles)
         
     Returns:
         Safety score from 0 (very unsafe) to 100 (very safe)
     """
-    base_score = 100.0
-    
-    # Create line segment
-    segment = LineString([(lng1, lat1), (lng2, lat2)])
-    
-    # Check intersection with danger zones
-    for polygon, name, risk_level, advisory in engine._danger_polygons:
-        if segment.intersects(polygon):
-            # Calculate penalty based on risk level
-            if risk_level == "high":
-                base_score -= 45
-            elif risk_level == "medium":
-                base_score -= 30
-            else:  # low
-                base_score -= 15
-    
-    # Apply time-of-day adjustment
-    if timestamp:
-        hour = timestamp.hour
-        # Nighttime penalty (8 PM to 6 AM)
-        if hour >= 20 or hour < 6:
-            base_score *= 0.85  # 15% penalty for nighttime
-    
-    return max(0.0, min(100.0, base_score))
+    points = [RoutePoint(lat=lat1, lng=lng1), RoutePoint(lat=lat2, lng=lng2)]
+    return analyze_route(points, timestamp).safety_score
 
 
-def get_route_safety_impact(
-    route_points: List[RoutePoint],
-    danger_zones: List[Tuple[geometry.Polygon, str, str, str]] | None = None,
-) -> dict[str, any]:
-    """Calculate overall safety impact of a route.
-    
-    Args:
-        route_points: List of coordinates forming the route
-        danger_zones: Optional list of danger zone polygons
-        
-    Returns:
-        Dictionary with safety metrics including zones crossed
-    """
-    if danger_zones is None:
-        danger_zones = engine._danger_polygons
-    
+def _impact(crossed) -> dict[str, any]:
     zones_crossed = []
-    total_high_risk = 0
-    total_medium_risk = 0
-    total_low_risk = 0
-    
-    # Create route line
-    if len(route_points) < 2:
-        return {
-            "zones_crossed": [],
-            "high_risk_count": 0,
-            "medium_risk_count": 0,
-            "low_risk_count": 0,
-            "total_zones": 0,
-        }
-    
-    coords = [(p.lng, p.lat) for p in route_points]
-    route_line = LineString(coords)
-    
-    # Check each danger zone
+    counts = {"high": 0, "medium": 0, "low": 0}
     seen_zones = set()
-    for polygon, name, risk_level, advisory in danger_zones:
-        if route_line.intersects(polygon) and name not in seen_zones:
+    for polygon, name, risk_level, advisory in crossed:
+        if name not in seen_zones:
             zones_crossed.append({
                 "name": name,
                 "risk_level": risk_level,
                 "advisory": advisory,
             })
             seen_zones.add(name)
-            
-            if risk_level == "high":
-                total_high_risk += 1
-            elif risk_level == "medium":
-                total_medium_risk += 1
-            else:
-                total_low_risk += 1
+            counts[risk_level if risk_level in counts else "low"] += 1
     
     return {
         "zones_crossed": zones_crossed,
-        "high_risk_count": total_high_risk,
-        "medium_risk_count": total_medium_risk,
-        "low_risk_count": total_low_risk,
+        "high_risk_count": counts["high"],
+        "medium_risk_count": counts["medium"],
+        "low_risk_count": counts["low"],
         "total_zones": len(zones_crossed),
     }
 
 
-def calculate_time_adjusted_safety(
-    base_score: float,
-    hour_of_day: int,
-) -> float:
-    """Adjust safety score based on time of day.
+def get_route_safety_impact(
+    route_points: List[RoutePoint],
+    danger_zones: List[Tuple[geometry.Polygon, str, str, str]] | None = None,
+) -> dict[str, any]:
+    """Calculate overall safety impact of a route.
     
     Args:
-        base_score: Base safety score (0-100)
-        hour_of_day: Hour in 24-hour format (0-23)
+        route_points: List of coordinates forming the route
+        danger_zones: Optional list of danger zone polygons
         
     Returns:
-        Adjusted safety score
+        Dictionary with safety metrics including zones crossed
     """
-    # Nighttime hours (8 PM to 6 AM) get penalty
-    if hour_of_day >= 20 or hour_of_day < 6:
-        return base_score * 0.85
-    
-    # Early morning (6 AM to 8 AM) slight penalty
-    if 6 <= hour_of_day < 8:
-        return base_score * 0.95
+    if len(route_points) < 2:
+        return _impact([])
     
-    # Late evening (6 PM to 8 PM) slight penalty
-    if 18 <= hour_of_day < 20:
-        return base_score * 0.95
+    if danger_zones is None:
+        return analyze_route(route_points).impact()
     
-    # Daytime hours - no adjustment
-    return base_score
+    route_line = LineString([(p.lng, p.lat) for p in route_points])
+    return _impact(zone for zone in danger_zones if route_line.intersects(zone[0]))
 
 
 def calculate_overall_route_score(
     route_points: List[RoutePoint],
     timestamp: datetime | None = None,
+    analysis: RouteAnalysis | None = None,
 ) -> Tuple[float, dict[str, any]]:
     """Calculate comprehensive safety score for entire route.
     
     Args:
         route_points: List of coordinates forming the route
         timestamp: Time of travel
+        analysis: Result of `analyze_route` for the same points and time, if
+            already computed
         
     Returns:
         Tuple of (overall_score, safety_metadata)
@@ -166,29 +397,12 @@ def calculate_overall_route_score(
     if len(route_points) < 2:
         return 100.0, {"zones_crossed": [], "segments_analyzed": 0}
     
-    # Score each segment
-    segment_scores = []
-    for i in range(len(route_points) - 1):
-        p1 = route_points[i]
-        p2 = route_points[i + 1]
-        score = score_route_segment(p1.lat, p1.lng, p2.lat, p2.lng, timestamp)
-        segment_scores.append(score)
-    
-    # Calculate weighted average (favor worst segments)
-    if segment_scores:
-        # Use minimum score with 60% weight, average with 40% weight
-        min_score = min(segment_scores)
-        avg_score = sum(segment_scores) / len(segment_scores)
-        overall_score = (min_score * 0.6) + (avg_score * 0.4)
-    else:
-        overall_score = 100.0
+    if analysis is None:
+        analysis = analyze_route(route_points, timestamp)
+    segment_scores = analysis.segment_scores
     
     # Get danger zone impact
-    impact = get_route_safety_impact(route_points)
-    
-    # Apply time adjustment if provided
-    if timestamp:
-        overall_score = calculate_time_adjusted_safety(overall_score, timestamp.hour)
+    impact = analysis.impact()
     
     metadata = {
         "zones_crossed": impact["zones_crossed"],
@@ -198,6 +412,103 @@ def calculate_overall_route_score(
         "high_risk_zones": impact["high_risk_count"],
         "medium_risk_zones": impact["medium_risk_count"],
         "low_risk_zones": impact["low_risk_count"],
+        "exposure": analysis.exposure(),
+        "incident_penalty": analysis.incident_penalty,
     }
     
-    return overall_score, metadata
+    return analysis.safety_score, metadata
+
+
+# ============ Batch scoring ============
+
+@dataclass
+class BatchRouteScore:
+    """Score of one route from `score_routes_batch`."""
+    safety_score: float
+    segment_scores: List[float]
+    segment_zones: List[Tuple[int, ...]]
+    zone_ids: List[int]  # zones crossed, in zone order
+    class_meters: Tuple[float, float, float]  # metres inside each of RISK_CLASSES
+    incident_penalty: float = 0.0
+
+    def impact(self) -> dict[str, any]:
+        return _impact(engine._danger_polygons[z] for z in self.zone_ids)
+
+    def exposure(self, speed_mps: float | None = None) -> dict[str, dict[str, float]]:
+        return _exposure_summary(self.class_meters, speed_mps)
+
+
+def score_routes_batch(
+    routes: List[List[RoutePoint]],
+    timestamp: datetime | None = None,
+) -> List[BatchRouteScore]:
+    """Score many routes with one vectorized intersection pass.
+
+    All segments of all routes go into a single shapely geometry array that
+    is queried against an STRtree of the zones, so the per-route Python
+    work is only the aggregation. Scores match `calculate_overall_route_score`.
+    """
+    lengths = np.array([len(points) for points in routes], dtype=np.int64)
+    seg_counts = np.maximum(lengths - 1, 0)
+    seg_offsets = np.zeros(len(routes) + 1, dtype=np.int64)
+    np.cumsum(seg_counts, out=seg_offsets[1:])
+    point_offsets = np.zeros(len(routes) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=point_offsets[1:])
+    total = int(seg_offsets[-1])
+
+    coords = np.array([(p.lng, p.lat) for points in routes for p in points], dtype=np.float64).reshape(-1, 2)
+    # Segment i of route r starts at point point_offsets[r] + i
+    starts = np.repeat(point_offsets[:-1] - seg_offsets[:-1], seg_counts) + np.arange(total)
+
+    index = _get_zone_index()
+    weights = index.hour_weights(timestamp)
+    seg_idx, zone_idx, meters, class_m = index.exposure(coords[starts], coords[starts + 1])
+
+    segment_penalty = np.bincount(
+        seg_idx, weights=_zone_penalty(index, zone_idx, meters, weights), minlength=total
+    )
+    segment_incidents = _incident_penalty(
+        get_incident_heatmap().segment_max_density(coords[starts], coords[starts + 1], timestamp.hour if timestamp else None)
+    )
+    scores = np.clip(100.0 - segment_penalty - segment_incidents, 0.0, 100.0)
+
+    # Metres per (route, zone), then each zone's saturating penalty per route
+    route_of_seg = np.repeat(np.arange(len(routes)), seg_counts)
+    num_zones = max(len(index.penalties), 1)
+    route_zone, inverse = np.unique(route_of_seg[seg_idx] * num_zones + zone_idx, return_inverse=True)
+    zone_totals = np.bincount(inverse, weights=meters, minlength=len(route_zone))
+    hit_route, hit_zone = np.divmod(route_zone, num_zones)
+    route_penalty = np.bincount(
+        hit_route, weights=_zone_penalty(index, hit_zone, zone_totals, weights), minlength=len(routes)
+    )
+    incident_penalty = np.zeros(len(routes))
+    scored = seg_counts > 0
+    if total:
+        incident_penalty[scored] = np.maximum.reduceat(segment_incidents, seg_offsets[:-1][scored])
+    overall = np.clip(100.0 - route_penalty - incident_penalty, 0.0, 100.0)
+
+    route_class_m = np.zeros((len(routes), len(RISK_CLASSES)))
+    np.add.at(route_class_m, route_of_seg, class_m)
+
+    # Zones per segment from the sorted (segment, zone) pairs
+    hit_zones: Dict[int, List[int]] = {}
+    for seg, zone in zip(seg_idx.tolist(), zone_idx.tolist()):
+        hit_zones.setdefault(seg, []).append(zone)
+    route_zones: Dict[int, List[int]] = {}
+    for route, zone in zip(hit_route.tolist(), hit_zone.tolist()):
+        route_zones.setdefault(route, []).append(zone)
+
+    results = []
+    score_list = scores.tolist()
+    incident_list = incident_penalty.tolist()
+    for r, score in enumerate(overall.tolist()):
+        lo, hi = int(seg_offsets[r]), int(seg_offsets[r + 1])
+        results.append(BatchRouteScore(
+            safety_score=score,
+            segment_scores=score_list[lo:hi],
+            segment_zones=[tuple(hit_zones.get(seg, ())) for seg in range(lo, hi)],
+            zone_ids=route_zones.get(r, []),
+            class_meters=tuple(route_class_m[r].tolist()),
+            incident_penalty=incident_list[r],
+        ))
+    return results
@@ -0,0 +1,340 @@
+"""Offline safe routing on the local road graph.
+
+Edge costs are travel time inflated by the danger-zone penalties the
+edge crosses (the same per-risk penalties `route_scoring` uses), so the
+cheapest path trades a little time for a lot less exposure. Alternatives
+come from the penalty method: each found route's edges are made more
+expensive and the search is repeated, keeping routes that differ enough
+from the ones already found.
+
+With a contraction hierarchy attached (see `app/contraction.py`), queries
+skip A* entirely: the shortest path and via-node alternatives come from
+the hierarchy's upward searches. Run ``python -m app.routing`` to
+preprocess the graph and both metrics ahead of deployment.
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import logging
+import math
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+
+from .config import get_settings
+from .contraction import ContractionHierarchy, Metric
+from .detection import engine
+from .road_graph import EARTH_RADIUS_M, RoadGraph
+from .route_scoring import RISK_PENALTIES
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ALTERNATIVE_PENALTY = 1.4   # cost factor applied to edges of routes already found
+MAX_SHARED_FRACTION = 0.8   # alternatives sharing more of their length are rejected
+
+
+@dataclass
+class Route:
+    nodes: List[int]
+    edges: List[int]
+    points: List[Tuple[float, float]]  # (lat, lng)
+    distance_m: float
+    duration_s: float
+    danger_exposure: float  # summed zone penalties over edges crossed
+
+
+class Router:
+    """A* search with danger-weighted costs over a `RoadGraph`."""
+
+    def __init__(self, graph: RoadGraph, danger_weight: float = 4.0) -> None:
+        self.graph = graph
+        self.danger_weight = danger_weight
+        self.zones_version = engine.zones_version
+        self.edge_risk = self._edge_risk()
+
+        # Python lists index much faster than numpy scalars in the search loop
+        self._indptr = graph.indptr.tolist()
+        self._indices = graph.indices.tolist()
+        self._lat = graph.lat.tolist()
+        self._lng = graph.lng.tolist()
+        self._length = graph.length_m.tolist()
+        self._time = graph.travel_time_s.tolist()
+        self._risk = self.edge_risk.tolist()
+        self._weight_arrays: Dict[bool, np.ndarray] = {}
+        self._weights: Dict[bool, List[float]] = {}
+        self.cch: Optional[ContractionHierarchy] = None
+        max_speed = float(graph.speed_mps.max()) if graph.num_edges else 1.0
+        # Seconds per radian at top speed; keeps the heuristic admissible
+        self._h_scale = 0.999 * EARTH_RADIUS_M / max_speed
+
+    def _edge_risk(self) -> np.ndarray:
+        """Summed zone penalty per edge, via one vectorized STRtree query."""
+        risk = np.zeros(self.graph.num_edges, dtype=np.float32)
+        zones = engine._danger_polygons
+        if not zones or not self.graph.num_edges:
+            return risk
+
+        src = self.graph.edge_sources()
+        dst = self.graph.indices
+        coords = np.stack(
+            [
+                np.column_stack([self.graph.lng[src], self.graph.lat[src]]),
+                np.column_stack([self.graph.lng[dst], self.graph.lat[dst]]),
+            ],
+            axis=1,
+        )
+        lines = shapely.linestrings(coords)
+        tree = shapely.STRtree([polygon for polygon, _, _, _ in zones])
+        edge_idx, zone_idx = tree.query(lines, predicate="intersects")
+        penalties = np.array(
+            [RISK_PENALTIES.get(risk_level, RISK_PENALTIES["low"]) for _, _, risk_level, _ in zones],
+            dtype=np.float32,
+        )
+        np.add.at(risk, edge_idx, penalties[zone_idx])
+        return risk
+
+    def refresh_danger(self) -> None:
+        """Recompute edge risk after the danger zones were reloaded."""
+        zones_version = engine.zones_version
+        self.edge_risk = self._edge_risk()
+        self._risk = self.edge_risk.tolist()
+        self._weight_arrays = {}
+        self._weights = {}
+        self.zones_version = zones_version
+
+    def weight_array(self, avoid_danger: bool = True) -> np.ndarray:
+        if avoid_danger not in self._weight_arrays:
+            weight = self.graph.travel_time_s.astype(np.float64)
+            if avoid_danger:
+                weight = weight * (1.0 + self.danger_weight * self.edge_risk / 100.0)
+            self._weight_arrays[avoid_danger] = weight
+        return self._weight_arrays[avoid_danger]
+
+    def weights(self, avoid_danger: bool = True) -> List[float]:
+        if avoid_danger not in self._weights:
+            self._weights[avoid_danger] = self.weight_array(avoid_danger).tolist()
+        return self._weights[avoid_danger]
+
+    def metric(self, avoid_danger: bool = True) -> Metric:
+        """Hierarchy metric for the given weighting (customized once, then reused)."""
+        return self.cch.metric(self.weight_array(avoid_danger))
+
+    # ============ Queries ============
+
+    def route(
+        self,
+        origin: Tuple[float, float],
+        destination: Tuple[float, float],
+        k: int = 3,
+        avoid_danger: bool = True,
+        max_detour_pct: Optional[float] = None,
+        max_snap_m: float = 1000.0,
+    ) -> List[Route]:
+        """Up to `k` distinct routes between two (lat, lng) points, best first.
+
+        Returns an empty list if either point is farther than `max_snap_m`
+        from the road network or no path exists.
+        """
+        source, source_snap = self.graph.nearest_node(*origin)
+        target, target_snap = self.graph.nearest_node(*destination)
+        if source_snap > max_snap_m or target_snap > max_snap_m:
+            return []
+
+        if self.cch is not None:
+            return self._hierarchy_routes(source, target, k, avoid_danger, max_detour_pct)
+
+        weights = self.weights(avoid_danger)
+        overlay: Dict[int, float] = {}
+        routes: List[Route] = []
+        for _ in range(max(1, k) * 3):
+            found = self._astar(source, target, weights, overlay)
+            if found is None:
+                break
+            route = self._build(*found)
+            if not routes:
+                routes.append(route)
+            elif self._acceptable(route, routes, max_detour_pct):
+                routes.append(route)
+            if len(routes) >= k:
+                break
+            for edge in route.edges:
+                overlay[edge] = overlay.get(edge, 1.0) * ALTERNATIVE_PENALTY
+        return routes
+
+    def _hierarchy_routes(
+        self,
+        source: int,
+        target: int,
+        k: int,
+        avoid_danger: bool,
+        max_detour_pct: Optional[float],
+        max_candidates: int = 10,
+    ) -> List[Route]:
+        routes: List[Route] = []
+        metric = self.metric(avoid_danger)
+        for checked, (_, edges) in enumerate(self.cch.routes(source, target, metric)):
+            if checked >= max(1, k) * max_candidates:
+                break
+            nodes = [source] + [self._indices[e] for e in edges]
+            if len(set(nodes)) != len(nodes):
+                continue  # via-node detour that doubles back
+            route = self._build(nodes, edges)
+            if not routes or self._acceptable(route, routes, max_detour_pct):
+                routes.append(route)
+            if len(routes) >= k:
+                break
+        return routes
+
+    def _acceptable(self, route: Route, accepted: Sequence[Route], max_detour_pct: Optional[float]) -> bool:
+        if max_detour_pct is not None and route.duration_s > accepted[0].duration_s * (1 + max_detour_pct / 100):
+            return False
+        edges = set(route.edges)
+        for other in accepted:
+            shared = sum(self._length[e] for e in other.edges if e in edges)
+            if route.distance_m <= 0 or shared / route.distance_m > MAX_SHARED_FRACTION:
+                return False
+        return True
+
+    def _astar(
+        self,
+        source: int,
+        target: int,
+        weights: List[float],
+        overlay: Dict[int, float],
+    ) -> Optional[Tuple[List[int], List[int]]]:
+        indptr, indices, lat, lng = self._indptr, self._indices, self._lat, self._lng
+        t_lat, t_lng = math.radians(lat[target]), math.radians(lng[target])
+        cos_t = math.cos(t_lat)
+        h_scale = self._h_scale
+
+        def heuristic(node: int) -> float:
+            n_lat, n_lng = math.radians(lat[node]), math.radians(lng[node])
+            a = math.sin((t_lat - n_lat) / 2) ** 2 + math.cos(n_lat) * cos_t * math.sin((t_lng - n_lng) / 2) ** 2
+            return 2 * h_scale * math.asin(min(1.0, math.sqrt(a)))
+
+        best = {source: 0.0}
+        via: Dict[int, Tuple[int, int]] = {}
+        heap = [(heuristic(source), 0.0, source)]
+        closed = set()
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                break
+            if node in closed:
+                continue
+            closed.add(node)
+            for edge in range(indptr[node], indptr[node + 1]):
+                nxt = indices[edge]
+                if nxt in closed:
+                    continue
+                new_cost = cost + weights[edge] * overlay.get(edge, 1.0)
+                if new_cost < best.get(nxt, math.inf):
+                    best[nxt] = new_cost
+                    via[nxt] = (node, edge)
+                    heapq.heappush(heap, (new_cost + heuristic(nxt), new_cost, nxt))
+        if target not in best:
+            return None
+
+        nodes, edges = [target], []
+        while nodes[-1] != source:
+            prev, edge = via[nodes[-1]]
+            nodes.append(prev)
+            edges.append(edge)
+        nodes.reverse()
+        edges.reverse()
+        return nodes, edges
+
+    def _build(self, nodes: List[int], edges: List[int]) -> Route:
+        return Route(
+            nodes=nodes,
+            edges=edges,
+            points=[(self._lat[n], self._lng[n]) for n in nodes],
+            distance_m=sum(self._length[e] for e in edges),
+            duration_s=sum(self._time[e] for e in edges),
+            danger_exposure=sum(self._risk[e] for e in edges),
+        )
+
+
+_router: Optional[Router] = None
+_router_lock = threading.Lock()
+_build_thread: Optional[threading.Thread] = None
+_build_lock = threading.Lock()
+
+
+def build_router() -> Optional[Router]:
+    """Load the road graph (and hierarchy) into the router singleton; None if no road network is configured."""
+    global _router
+    path = settings.road_graph_path
+    if not path.exists():
+        return None
+    with _router_lock:
+        if _router is None:
+            graph = RoadGraph.load(path)
+            router = Router(graph, danger_weight=settings.routing_danger_weight)
+            logger.info(f"Loaded road graph: {graph.num_nodes} nodes, {graph.num_edges} edges")
+            if settings.routing_use_cch:
+                router.cch = ContractionHierarchy.load_or_build(graph, settings.routing_cch_dir)
+                logger.info(f"Contraction hierarchy ready: {router.cch.num_arcs} arcs")
+            _router = router
+    return _router
+
+
+def start_router_build() -> None:
+    """Build the router in a background thread, once."""
+    global _build_thread
+    if _router is not None or not settings.road_graph_path.exists():
+        return
+    with _build_lock:
+        if _build_thread is None:
+            _build_thread = threading.Thread(target=_build_in_background, name="router-build", daemon=True)
+            _build_thread.start()
+
+
+def _build_in_background() -> None:
+    try:
+        build_router()
+    except Exception as e:
+        logger.error(f"Failed to build the router: {e}")
+
+
+def get_router() -> Optional[Router]:
+    """The router singleton; None until its background build finishes, or if no road network is configured."""
+    if _router is None:
+        start_router_build()
+        return None
+    if _router.zones_version != engine.zones_version:
+        with _router_lock:
+            if _router.zones_version != engine.zones_version:
+                _router.refresh_danger()
+    return _router
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Preprocess the road graph for routing")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the saved hierarchy and rebuild it")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not settings.road_graph_path.exists():
+        parser.error(f"No road network at {settings.road_graph_path}")
+    if args.rebuild:
+        import shutil
+
+        shutil.rmtree(settings.routing_cch_dir, ignore_errors=True)
+
+    router = build_router()
+    if router.cch is None:
+        logger.info("ML_ENGINE_ROUTING_USE_CCH is off; nothing to preprocess")
+        return
+    for avoid_danger in (True, False):
+        router.metric(avoid_danger)
+    logger.info(f"Metrics customized in {settings.routing_cch_dir}")
+
+
+if __name__ == "__main__":
+    main()
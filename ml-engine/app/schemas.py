@@ -5,6 +5,20 @@ from pydantic import BaseModel, ConfigDict, Field, computed_field
 
 
 RiskLevel = Literal["low", "medium", "high"]
+AlertType = Literal[
+    "route_deviation",
+    "long_inactivity",
+    "danger_zone",
+    "anomaly",
+    # Behavioral analyzer
+    "accuracy_degradation",
+    "location_jump",
+    "erratic_movement",
+    "high_speed",
+    "backtracking",
+    # Aggregated storm of one alert type in one zone (admin panel only)
+    "digest",
+]
 
 
 class RoutePoint(BaseModel):
@@ -50,13 +64,21 @@ class AlertPayload(BaseModel):
     tourist_id: str
     trip_id: str
     timestamp: datetime
-    alert_type: Literal["route_deviation", "long_inactivity", "danger_zone", "anomaly"]
+    alert_type: AlertType
     severity: RiskLevel
     message: str
     metadata: Dict[str, str] = Field(default_factory=dict)
+    lat: Optional[float] = None  # where the triggering observation was made
+    lng: Optional[float] = None
+    # Part of an alert storm: the admin panel gets it in a digest instead
+    folded: bool = False
 
     @computed_field
     def recipients(self) -> List[str]:
+        if self.alert_type == "digest":
+            return ["admin_panel"]
+        if self.folded:
+            return ["tourist", "family"]
         return ["tourist", "admin_panel", "family"]
 
 
@@ -75,6 +97,9 @@ class TrainResponse(BaseModel):
 class AlertHistoryResponse(BaseModel):
     trip_id: str
     alerts: List[AlertPayload]
+    total: int = 0
+    offset: int = 0
+    limit: Optional[int] = None
 
 
 class GeofenceStatus(BaseModel):
@@ -87,6 +112,31 @@ class GeofenceStatus(BaseModel):
     lat: float
     lng: float
     last_updated: datetime
+    version: int = 0
+
+
+class LiveTourist(BaseModel):
+    tourist_id: str
+    trip_id: str
+    lat: float
+    lng: float
+    last_seen: datetime
+    zone_name: Optional[str] = None
+    distance_m: Optional[float] = None
+
+
+class NearbyTouristsResponse(BaseModel):
+    count: int
+    tourists: List[LiveTourist]
+
+
+class PolygonQueryRequest(BaseModel):
+    polygon: List[List[float]] = Field(min_length=3, description="[[lat, lng], ...] vertices")
+
+
+class ZoneOccupancyResponse(BaseModel):
+    live_trips: int
+    zones: Dict[str, int]
 
 
 # Safe Route Planning Models
@@ -105,6 +155,12 @@ class DangerZoneCrossing(BaseModel):
     advisory: Optional[str] = None
 
 
+class RiskExposure(BaseModel):
+    """Distance and expected time spent inside danger zones, per risk level."""
+    meters: Dict[RiskLevel, float]
+    minutes: Dict[RiskLevel, float]
+
+
 class RouteSegment(BaseModel):
     """A calculated route with safety metadata."""
     coordinates: List[RoutePoint]
@@ -115,6 +171,7 @@ class RouteSegment(BaseModel):
     high_risk_zones: int = Field(default=0, ge=0)
     medium_risk_zones: int = Field(default=0, ge=0)
     low_risk_zones: int = Field(default=0, ge=0)
+    exposure: Optional[RiskExposure] = None
 
 
 class SafeRouteRequest(BaseModel):
@@ -133,6 +190,44 @@ class SafeRouteResponse(BaseModel):
     calculation_timestamp: datetime = Field(default_factory=datetime.now)
 
 
+class BatchRoute(BaseModel):
+    """One candidate route in a batch scoring request."""
+    id: Optional[str] = None
+    points: List[RoutePoint] = Field(min_length=2)
+
+
+class RouteScoreBatchRequest(BaseModel):
+    """Many candidate routes scored together."""
+    routes: List[BatchRoute] = Field(min_length=1)
+    time_of_travel: Optional[datetime] = None
+    include_segments: bool = False
+
+
+class SegmentScore(BaseModel):
+    """Safety score of one segment (points[index] to points[index + 1])."""
+    index: int
+    safety_score: float = Field(ge=0, le=100)
+    danger_zones: List[str] = Field(default_factory=list)
+
+
+class RouteScore(BaseModel):
+    """Safety score and zone crossings of one batch route."""
+    id: Optional[str] = None
+    safety_score: float = Field(ge=0, le=100)
+    danger_zones_crossed: List[DangerZoneCrossing]
+    high_risk_zones: int = Field(default=0, ge=0)
+    medium_risk_zones: int = Field(default=0, ge=0)
+    low_risk_zones: int = Field(default=0, ge=0)
+    exposure: Optional[RiskExposure] = None
+    segments: Optional[List[SegmentScore]] = None
+
+
+class RouteScoreBatchResponse(BaseModel):
+    """Scores in the same order as the requested routes."""
+    results: List[RouteScore]
+    elapsed_ms: float
+
+
 # LLM-Related Models
 
 class LocationInfo(BaseModel):
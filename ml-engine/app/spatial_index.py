@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import shapely
+from haversine import Unit, haversine
+from shapely.geometry import Polygon
+
+from .config import get_settings
+
+Cell = Tuple[int, int]
+
+METERS_PER_DEG_LAT = 111_320.0
+
+
+@dataclass
+class LivePosition:
+    tourist_id: str
+    trip_id: str
+    lat: float
+    lng: float
+    timestamp: datetime
+    zone: Optional[str] = None
+
+
+class PositionIndex:
+    """Latest position per trip, bucketed into a fixed lat/lng grid.
+
+    Radius and polygon queries only visit the grid cells overlapping the
+    query's bounding box, and per-zone occupancy is maintained as
+    positions move, so neither depends on the total number of live trips.
+    Positions older than the TTL are ignored by queries and swept out.
+    """
+
+    def __init__(self, cell_deg: float = 0.01, ttl_minutes: float = 60) -> None:
+        self.cell_deg = cell_deg
+        self.ttl = timedelta(minutes=ttl_minutes)
+        self._positions: Dict[str, LivePosition] = {}
+        self._cell_of: Dict[str, Cell] = {}
+        self._cells: Dict[Cell, Set[str]] = defaultdict(set)
+        self._occupancy: Counter = Counter()
+        self._latest: Optional[datetime] = None
+        self._updates = 0
+        self._swept_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "PositionIndex":
+        settings = get_settings()
+        return cls(cell_deg=settings.spatial_cell_deg, ttl_minutes=settings.live_position_ttl_minutes)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def update(
+        self,
+        tourist_id: str,
+        trip_id: str,
+        lat: float,
+        lng: float,
+        timestamp: datetime,
+        zone: Optional[str] = None,
+    ) -> bool:
+        """Record a trip's position; older-than-current observations are ignored."""
+        key = f"{tourist_id}::{trip_id}"
+        cell = self._cell(lat, lng)
+        with self._lock:
+            current = self._positions.get(key)
+            if current is not None:
+                if timestamp < current.timestamp:
+                    return False
+                self._detach(key, current)
+
+            position = LivePosition(tourist_id, trip_id, lat, lng, timestamp, zone)
+            self._positions[key] = position
+            self._cell_of[key] = cell
+            self._cells[cell].add(key)
+            if zone is not None:
+                self._occupancy[zone] += 1
+            if self._latest is None or timestamp > self._latest:
+                self._latest = timestamp
+
+            self._updates += 1
+            if self._updates % 10000 == 0:
+                self._sweep(min_interval=0)
+            return True
+
+    def remove(self, tourist_id: str, trip_id: str) -> None:
+        key = f"{tourist_id}::{trip_id}"
+        with self._lock:
+            current = self._positions.pop(key, None)
+            if current is not None:
+                self._detach(key, current)
+                del self._cell_of[key]
+
+    def within_radius(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[LivePosition, float]]:
+        """Live positions within `radius_m` of a point, nearest first."""
+        dlat = radius_m / METERS_PER_DEG_LAT
+        dlng = radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+        origin = (lat, lng)
+
+        with self._lock:
+            candidates = self._candidates(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+
+        hits = []
+        for position in candidates:
+            distance = haversine(origin, (position.lat, position.lng), unit=Unit.METERS)
+            if distance <= radius_m:
+                hits.append((position, distance))
+        hits.sort(key=lambda hit: hit[1])
+        return hits[:limit] if limit is not None else hits
+
+    def within_polygon(self, coords: Sequence[Tuple[float, float]]) -> List[LivePosition]:
+        """Live positions inside a polygon given as (lat, lng) vertices."""
+        polygon = Polygon([(lng, lat) for lat, lng in coords])
+        min_lng, min_lat, max_lng, max_lat = polygon.bounds
+
+        with self._lock:
+            candidates = self._candidates(min_lat, min_lng, max_lat, max_lng)
+        if not candidates:
+            return []
+
+        shapely.prepare(polygon)
+        xs = np.fromiter((p.lng for p in candidates), dtype=float, count=len(candidates))
+        ys = np.fromiter((p.lat for p in candidates), dtype=float, count=len(candidates))
+        inside = shapely.contains_xy(polygon, xs, ys)
+        return [p for p, hit in zip(candidates, inside) if hit]
+
+    def zone_occupancy(self) -> Dict[str, int]:
+        """Number of live trips currently inside each danger zone."""
+        with self._lock:
+            self._sweep()
+            return {zone: count for zone, count in self._occupancy.items() if count > 0}
+
+    def _candidates(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[LivePosition]:
+        lo_row, lo_col = self._cell(min_lat, min_lng)
+        hi_row, hi_col = self._cell(max_lat, max_lng)
+        cutoff = self._cutoff()
+        candidates = []
+        for row in range(lo_row, hi_row + 1):
+            for col in range(lo_col, hi_col + 1):
+                for key in self._cells.get((row, col), ()):
+                    position = self._positions[key]
+                    if cutoff is None or position.timestamp >= cutoff:
+                        candidates.append(position)
+        return candidates
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def _cutoff(self) -> Optional[datetime]:
+        return self._latest - self.ttl if self._latest is not None else None
+
+    def _detach(self, key: str, position: LivePosition) -> None:
+        cell = self._cell_of[key]
+        members = self._cells[cell]
+        members.discard(key)
+        if not members:
+            del self._cells[cell]
+        if position.zone is not None:
+            self._occupancy[position.zone] -= 1
+
+    def _sweep(self, min_interval: float = 30.0) -> None:
+        cutoff = self._cutoff()
+        if cutoff is None or time.monotonic() - self._swept_at < min_interval:
+            return
+        self._swept_at = time.monotonic()
+        stale = [key for key, p in self._positions.items() if p.timestamp < cutoff]
+        for key in stale:
+            self._detach(key, self._positions.pop(key))
+            del self._cell_of[key]
+
+
+position_index = PositionIndex.from_settings()
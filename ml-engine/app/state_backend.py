@@ -0,0 +1,480 @@
+"""Backends for the service's mutable state.
+
+Routes, geofence status, observation history, alert history, throttles
+and caches go through a `StateBackend` instead of module-level dicts, so
+every uvicorn worker can see the same state. State is grouped into
+namespaces of key/value entries and of per-key time series.
+
+- ``memory`` (default): in-process dicts. Fastest; correct with a single
+  worker process.
+- ``sqlite``: one SQLite database in WAL mode, shared by every worker
+  process on the host (``ML_ENGINE_STATE_DB_PATH``).
+
+Values are stored as given by the memory backend and as JSON by SQLite.
+Readers pass `model` to get pydantic models back.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from .config import get_settings
+from .file_lock import try_lock
+
+
+class StateBackend(ABC):
+    """Namespaced key/value entries, counters and time series."""
+
+    # ============ Key/value ============
+
+    @abstractmethod
+    def get(self, ns: str, key: str, model: Optional[Type[BaseModel]] = None) -> Any:
+        """Value of a key, or None."""
+
+    @abstractmethod
+    def set(self, ns: str, key: str, value: Any, max_entries: Optional[int] = None) -> None:
+        """Set a key; with `max_entries`, evict the namespace's oldest keys beyond it."""
+
+    @abstractmethod
+    def delete(self, ns: str, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def values(self, ns: str, model: Optional[Type[BaseModel]] = None) -> List[Any]:
+        ...
+
+    @abstractmethod
+    def incr(self, ns: str, key: str, delta: int = 1) -> int:
+        """Add to an integer counter (starting at 0) and return the new value."""
+
+    @abstractmethod
+    def throttle(self, ns: str, key: str, now: float, interval: float, max_entries: Optional[int] = None) -> bool:
+        """Record `now` for a key unless the last record is less than `interval` before it.
+
+        Returns:
+            True if recorded. With `max_entries`, expired records are pruned
+            once the namespace grows past it.
+        """
+
+    # ============ Time series ============
+
+    @abstractmethod
+    def append(self, ns: str, key: str, ts: float, value: Any) -> None:
+        """Insert a value in time order (after any values with the same timestamp)."""
+
+    @abstractmethod
+    def range(
+        self,
+        ns: str,
+        key: str,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        model: Optional[Type[BaseModel]] = None,
+    ) -> List[Any]:
+        """Values with since <= ts <= until, in time order."""
+
+    @abstractmethod
+    def range_all(self, ns: str, since: Optional[float] = None, model: Optional[Type[BaseModel]] = None) -> List[Any]:
+        """Values of every key in the namespace with ts >= since."""
+
+    @abstractmethod
+    def last_ts(self, ns: str, key: str, oldest: bool = False) -> Optional[float]:
+        """Newest (or oldest) timestamp of a series, None if empty."""
+
+    @abstractmethod
+    def trim(self, ns: str, key: str, before: Optional[float] = None, keep: Optional[int] = None) -> None:
+        """Drop values older than `before`, then all but the newest `keep`."""
+
+    @abstractmethod
+    def limit_series(self, ns: str, max_keys: int) -> None:
+        """Drop whole series, least recently appended first, beyond `max_keys`."""
+
+    @abstractmethod
+    def series_stats(self, ns: str) -> Tuple[int, int]:
+        """(number of series, number of values) in a namespace."""
+
+    @abstractmethod
+    @contextmanager
+    def atomic(self) -> Iterator[None]:
+        """Run the enclosed operations as one unit, isolated from other workers."""
+
+
+# ============ In-process ============
+
+class _Series:
+    __slots__ = ("times", "values", "seq")
+
+    def __init__(self) -> None:
+        # (ts, insertion seq) keeps equal timestamps in arrival order
+        self.times: List[Tuple[float, int]] = []
+        self.values: List[Any] = []
+        self.seq = 0
+
+
+class MemoryBackend(StateBackend):
+    """State in this process only."""
+
+    def __init__(self) -> None:
+        self._kv: Dict[str, Dict[str, Any]] = {}
+        self._series: Dict[str, "OrderedDict[str, _Series]"] = {}
+        self._lock = threading.RLock()
+
+    def get(self, ns, key, model=None):
+        return self._kv.get(ns, {}).get(key)
+
+    def set(self, ns, key, value, max_entries=None):
+        with self._lock:
+            entries = self._kv.setdefault(ns, {})
+            entries[key] = value
+            if max_entries is not None:
+                while len(entries) > max_entries:
+                    entries.pop(next(iter(entries)))
+
+    def delete(self, ns, key):
+        with self._lock:
+            self._kv.get(ns, {}).pop(key, None)
+
+    def values(self, ns, model=None):
+        with self._lock:
+            return list(self._kv.get(ns, {}).values())
+
+    def incr(self, ns, key, delta=1):
+        with self._lock:
+            entries = self._kv.setdefault(ns, {})
+            entries[key] = entries.get(key, 0) + delta
+            return entries[key]
+
+    def throttle(self, ns, key, now, interval, max_entries=None):
+        with self._lock:
+            entries = self._kv.setdefault(ns, {})
+            last = entries.get(key)
+            if last is not None and now - last < interval:
+                return False
+            entries[key] = now
+            if max_entries is not None and len(entries) > max_entries:
+                self._kv[ns] = {k: t for k, t in entries.items() if now - t < interval}
+            return True
+
+    def append(self, ns, key, ts, value):
+        with self._lock:
+            series_by_key = self._series.setdefault(ns, OrderedDict())
+            series = series_by_key.get(key)
+            if series is None:
+                series = series_by_key[key] = _Series()
+            series_by_key.move_to_end(key)
+            entry = (ts, series.seq)
+            series.seq += 1
+            if not series.times or entry > series.times[-1]:
+                series.times.append(entry)
+                series.values.append(value)
+            else:
+                index = bisect_right(series.times, entry)
+                series.times.insert(index, entry)
+                series.values.insert(index, value)
+
+    def range(self, ns, key, since=None, until=None, model=None):
+        with self._lock:
+            series = self._series.get(ns, {}).get(key)
+            if series is None:
+                return []
+            lo = bisect_left(series.times, (since, -1)) if since is not None else 0
+            hi = bisect_right(series.times, (until, series.seq)) if until is not None else len(series.times)
+            return series.values[lo:hi]
+
+    def range_all(self, ns, since=None, model=None):
+        with self._lock:
+            return [
+                value
+                for key in list(self._series.get(ns, {}))
+                for value in self.range(ns, key, since)
+            ]
+
+    def last_ts(self, ns, key, oldest=False):
+        series = self._series.get(ns, {}).get(key)
+        if series is None or not series.times:
+            return None
+        return series.times[0 if oldest else -1][0]
+
+    def trim(self, ns, key, before=None, keep=None):
+        with self._lock:
+            series = self._series.get(ns, {}).get(key)
+            if series is None:
+                return
+            drop = bisect_left(series.times, (before, -1)) if before is not None else 0
+            if keep is not None:
+                drop = max(drop, len(series.times) - keep)
+            if drop:
+                del series.times[:drop]
+                del series.values[:drop]
+            if not series.times:
+                del self._series[ns][key]
+
+    def limit_series(self, ns, max_keys):
+        with self._lock:
+            series_by_key = self._series.get(ns, {})
+            while len(series_by_key) > max_keys:
+                series_by_key.popitem(last=False)
+
+    def series_stats(self, ns):
+        with self._lock:
+            series_by_key = self._series.get(ns, {})
+            return len(series_by_key), sum(len(s.values) for s in series_by_key.values())
+
+    @contextmanager
+    def atomic(self):
+        with self._lock:
+            yield
+
+
+# ============ SQLite ============
+
+def _encode(value: Any) -> str:
+    def default(obj: Any) -> Any:
+        if isinstance(obj, BaseModel):
+            return obj.model_dump(mode="json")
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        if hasattr(obj, "item"):  # numpy scalars
+            return obj.item()
+        raise TypeError(f"Cannot store {type(obj).__name__}")
+
+    return json.dumps(value, default=default)
+
+
+def _decode(text: Optional[str], model: Optional[Type[BaseModel]]) -> Any:
+    if text is None:
+        return None
+    if model is not None:
+        return model.model_validate_json(text)
+    return json.loads(text)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE TABLE IF NOT EXISTS series (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    ts REAL NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS series_by_key ON series (ns, key, ts, seq);
+CREATE INDEX IF NOT EXISTS series_by_ts ON series (ns, ts);
+-- One row per non-empty series, so limits and stats don't scan every value
+CREATE TABLE IF NOT EXISTS series_keys (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    last_seq INTEGER NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE INDEX IF NOT EXISTS series_keys_by_seq ON series_keys (ns, last_seq);
+"""
+
+
+class SQLiteBackend(StateBackend):
+    """State in a SQLite database (WAL) shared by the worker processes on a host."""
+
+    def __init__(self, path: Path, busy_timeout_ms: int = 5000) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        with self.atomic():
+            if conn.execute("SELECT 1 FROM series_keys LIMIT 1").fetchone() is None:
+                # Database from before series_keys existed
+                conn.execute(
+                    "INSERT INTO series_keys (ns, key, last_seq) "
+                    "SELECT ns, key, MAX(seq) FROM series GROUP BY ns, key"
+                )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; `atomic` opens explicit transactions
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def atomic(self):
+        conn = self._conn()
+        if conn.in_transaction:
+            yield  # nested: the outer block commits
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, ns, key, model=None):
+        row = self._conn().execute("SELECT value FROM kv WHERE ns = ? AND key = ?", (ns, key)).fetchone()
+        return _decode(row[0], model) if row else None
+
+    def set(self, ns, key, value, max_entries=None):
+        with self.atomic():
+            conn = self._conn()
+            conn.execute(
+                "INSERT INTO kv (ns, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value",
+                (ns, key, _encode(value)),
+            )
+            if max_entries is not None:
+                conn.execute(
+                    "DELETE FROM kv WHERE ns = ? AND rowid NOT IN "
+                    "(SELECT rowid FROM kv WHERE ns = ? ORDER BY rowid DESC LIMIT ?)",
+                    (ns, ns, max_entries),
+                )
+
+    def delete(self, ns, key):
+        self._conn().execute("DELETE FROM kv WHERE ns = ? AND key = ?", (ns, key))
+
+    def values(self, ns, model=None):
+        rows = self._conn().execute("SELECT value FROM kv WHERE ns = ? ORDER BY rowid", (ns,)).fetchall()
+        return [_decode(row[0], model) for row in rows]
+
+    def incr(self, ns, key, delta=1):
+        row = self._conn().execute(
+            "INSERT INTO kv (ns, key, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (ns, key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value "
+            "RETURNING value",
+            (ns, key, delta),
+        ).fetchone()
+        return int(row[0])
+
+    def throttle(self, ns, key, now, interval, max_entries=None):
+        with self.atomic():
+            conn = self._conn()
+            cursor = conn.execute(
+                "INSERT INTO kv (ns, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value "
+                "WHERE excluded.value - CAST(value AS REAL) >= ?",
+                (ns, key, now, interval),
+            )
+            recorded = cursor.rowcount == 1
+            if recorded and max_entries is not None:
+                count = conn.execute("SELECT COUNT(*) FROM kv WHERE ns = ?", (ns,)).fetchone()[0]
+                if count > max_entries:
+                    conn.execute("DELETE FROM kv WHERE ns = ? AND ? - CAST(value AS REAL) >= ?", (ns, now, interval))
+        return recorded
+
+    def append(self, ns, key, ts, value):
+        with self.atomic():
+            conn = self._conn()
+            seq = conn.execute(
+                "INSERT INTO series (ns, key, ts, value) VALUES (?, ?, ?, ?)", (ns, key, ts, _encode(value))
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO series_keys (ns, key, last_seq) VALUES (?, ?, ?) "
+                "ON CONFLICT (ns, key) DO UPDATE SET last_seq = excluded.last_seq",
+                (ns, key, seq),
+            )
+
+    def range(self, ns, key, since=None, until=None, model=None):
+        rows = self._conn().execute(
+            "SELECT value FROM series WHERE ns = ? AND key = ? AND ts >= ? AND ts <= ? ORDER BY ts, seq",
+            (ns, key, since if since is not None else float("-inf"), until if until is not None else float("inf")),
+        ).fetchall()
+        return [_decode(row[0], model) for row in rows]
+
+    def range_all(self, ns, since=None, model=None):
+        rows = self._conn().execute(
+            "SELECT value FROM series WHERE ns = ? AND ts >= ? ORDER BY key, ts, seq",
+            (ns, since if since is not None else float("-inf")),
+        ).fetchall()
+        return [_decode(row[0], model) for row in rows]
+
+    def last_ts(self, ns, key, oldest=False):
+        row = self._conn().execute(
+            f"SELECT {'MIN' if oldest else 'MAX'}(ts) FROM series WHERE ns = ? AND key = ?", (ns, key)
+        ).fetchone()
+        return row[0]
+
+    def trim(self, ns, key, before=None, keep=None):
+        with self.atomic():
+            conn = self._conn()
+            if before is not None:
+                conn.execute("DELETE FROM series WHERE ns = ? AND key = ? AND ts < ?", (ns, key, before))
+            if keep is not None:
+                row = conn.execute(
+                    "SELECT ts, seq FROM series WHERE ns = ? AND key = ? ORDER BY ts DESC, seq DESC LIMIT 1 OFFSET ?",
+                    (ns, key, keep),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "DELETE FROM series WHERE ns = ? AND key = ? AND (ts < ? OR (ts = ? AND seq <= ?))",
+                        (ns, key, row[0], row[0], row[1]),
+                    )
+            conn.execute(
+                "DELETE FROM series_keys WHERE ns = ? AND key = ? AND NOT EXISTS "
+                "(SELECT 1 FROM series WHERE ns = ? AND key = ?)",
+                (ns, key, ns, key),
+            )
+
+    def limit_series(self, ns, max_keys):
+        conn = self._conn()
+        with self.atomic():
+            count = conn.execute("SELECT COUNT(*) FROM series_keys WHERE ns = ?", (ns,)).fetchone()[0]
+            if count > max_keys:
+                evicted = conn.execute(
+                    "SELECT key FROM series_keys WHERE ns = ? ORDER BY last_seq LIMIT ?", (ns, count - max_keys)
+                ).fetchall()
+                conn.executemany("DELETE FROM series WHERE ns = ? AND key = ?", [(ns, key) for key, in evicted])
+                conn.executemany("DELETE FROM series_keys WHERE ns = ? AND key = ?", [(ns, key) for key, in evicted])
+
+    def series_stats(self, ns):
+        conn = self._conn()
+        keys = conn.execute("SELECT COUNT(*) FROM series_keys WHERE ns = ?", (ns,)).fetchone()[0]
+        values = conn.execute("SELECT COUNT(*) FROM series WHERE ns = ?", (ns,)).fetchone()[0]
+        return int(keys), int(values)
+
+
+_worker_lock = None
+
+
+def acquire_worker_lock(path: Path) -> bool:
+    """Hold an exclusive lock on `path` for the life of this process.
+
+    Returns:
+        False if another process already holds it
+    """
+    global _worker_lock
+    lock = try_lock(path)
+    if lock is None:
+        return False
+    _worker_lock = lock
+    return True
+
+
+def create_backend() -> StateBackend:
+    settings = get_settings()
+    if settings.state_backend == "sqlite":
+        return SQLiteBackend(settings.state_db_path)
+    if settings.state_backend != "memory":
+        raise ValueError(f"Unknown state backend: {settings.state_backend}")
+    return MemoryBackend()
+
+
+state = create_backend()
@@ -1,61 +1,122 @@
 from __future__ import annotations
 
-from collections import defaultdict, deque
-from datetime import datetime, timedelta
-from pathlib import Path
-from typing import Deque, Dict, List, Optional, Tuple
+import threading
+from typing import List, Optional, Tuple
 
 import pandas as pd
 
+from .alert_store import alert_store
 from .config import get_settings
+from .incident_heatmap import get_incident_heatmap
 from .schemas import AlertPayload, GeofenceStatus, Observation, RoutePlan
+from .state_backend import state
+
+MAX_OBSERVATIONS_PER_TRIP = 5000
 
 
 class ObservationStore:
-    """Persists observations and route plans in-memory plus CSV snapshots."""
+    """Persists observations and route plans in the state backend plus CSV snapshots."""
 
     def __init__(self) -> None:
-        self._obs: Dict[str, Deque[Observation]] = defaultdict(lambda: deque(maxlen=5000))
-        self._routes: Dict[str, RoutePlan] = {}
-        self._alerts: Dict[str, List[AlertPayload]] = defaultdict(list)
-        self._last_alert_at: Dict[Tuple[str, str], datetime] = {}
-        self._geofence_status: Dict[str, GeofenceStatus] = {}
+        # Ingest shards share the CSV snapshot
+        self._csv_lock = threading.Lock()
         self.settings = get_settings()
         self.settings.data_dir.mkdir(parents=True, exist_ok=True)
 
     def add_observation(self, obs: Observation) -> None:
         key = self._trip_key(obs.tourist_id, obs.trip_id)
-        self._obs[key].append(obs)
+        with state.atomic():
+            state.append("observations", key, obs.timestamp.timestamp(), obs)
+            state.trim("observations", key, keep=MAX_OBSERVATIONS_PER_TRIP)
         self._append_to_csv(obs)
 
     def add_route(self, plan: RoutePlan) -> None:
         key = self._trip_key(plan.tourist_id, plan.trip_id)
-        self._routes[key] = plan
+        state.set("routes", key, plan)
 
     def get_route(self, tourist_id: str, trip_id: str) -> Optional[RoutePlan]:
-        return self._routes.get(self._trip_key(tourist_id, trip_id))
+        return state.get("routes", self._trip_key(tourist_id, trip_id), model=RoutePlan)
 
     def get_observations(self, tourist_id: str, trip_id: str) -> List[Observation]:
-        return list(self._obs.get(self._trip_key(tourist_id, trip_id), []))
+        return state.range("observations", self._trip_key(tourist_id, trip_id), model=Observation)
 
     def record_alert(self, alert: AlertPayload) -> bool:
-        key = self._trip_key(alert.tourist_id, alert.trip_id)
-        now = alert.timestamp
-        if not self._can_alert(key, now):
+        key = f"{self._trip_key(alert.tourist_id, alert.trip_id)}::{alert.alert_type}"
+        if not state.throttle(
+            "alert_throttle",
+            key,
+            alert.timestamp.timestamp(),
+            self.settings.alert_buffer_minutes * 60,
+            max_entries=self.settings.alert_max_trips * 4,
+        ):
             return False
-        self._alerts[key].append(alert)
-        self._last_alert_at[key] = now
+        alert_store.add(alert)
+        get_incident_heatmap().add_alert(alert)
         return True
 
     def get_alerts(self, trip_id: str) -> List[AlertPayload]:
-        return self._alerts.get(trip_id, [])
+        return alert_store.history(trip_id)
+
+    def update_geofence_status(self, status: GeofenceStatus) -> bool:
+        """Store a trip's zone status if its zone membership changed.
 
-    def update_geofence_status(self, status: GeofenceStatus) -> None:
+        Returns:
+            True if the status changed and a new version was recorded
+        """
         key = self._trip_key(status.tourist_id, status.trip_id)
-        self._geofence_status[key] = status
+        with state.atomic():
+            current = state.get("geofence", key, model=GeofenceStatus)
+            if current is not None and (current.inside_zone, current.zone_name) == (
+                status.inside_zone,
+                status.zone_name,
+            ):
+                return False
+
+            version = state.incr("geofence_version", "current")
+            state.set("geofence", key, status.model_copy(update={"version": version}))
+            state.append("geofence_changes", "log", version, key)
+            state.trim("geofence_changes", "log", keep=self.settings.geofence_changelog_size)
+            return True
+
+    @property
+    def geofence_version(self) -> int:
+        return state.get("geofence_version", "current") or 0
+
+    def geofence_changes(
+        self,
+        since: Optional[int] = None,
+        zone: Optional[str] = None,
+        inside: Optional[bool] = None,
+    ) -> Tuple[List[GeofenceStatus], int, bool]:
+        """Statuses changed after version `since` (all statuses if None).
+
+        Returns:
+            (statuses, current version, whether this is a full snapshot
+            because `since` is older than the change log)
+        """
+        with state.atomic():
+            version = self.geofence_version
+            oldest = state.last_ts("geofence_changes", "log", oldest=True)
+            oldest = int(oldest) if oldest is not None else version + 1
+            full = since is None or since < oldest - 1
+            if full:
+                statuses = state.values("geofence", model=GeofenceStatus)
+            else:
+                keys = dict.fromkeys(state.range("geofence_changes", "log", since=since + 1))
+                statuses = [state.get("geofence", key, model=GeofenceStatus) for key in keys]
+
+        if zone is not None:
+            statuses = [s for s in statuses if s.zone_name == zone]
+        if inside is not None:
+            statuses = [s for s in statuses if s.inside_zone == inside]
+        statuses.sort(key=lambda s: s.version)
+        return statuses, version, full
+
+    def get_geofence_status(self, tourist_id: str, trip_id: str) -> Optional[GeofenceStatus]:
+        return state.get("geofence", self._trip_key(tourist_id, trip_id), model=GeofenceStatus)
 
     def list_geofence_status(self) -> List[GeofenceStatus]:
-        return list(self._geofence_status.values())
+        return state.values("geofence", model=GeofenceStatus)
 
     def load_dataframe(self) -> pd.DataFrame:
         dataset = self.settings.historical_dataset
@@ -75,16 +136,10 @@ class ObservationStore:
             "accuracy_m": obs.accuracy_m,
             "battery_pct": obs.battery_pct,
         }
-        header = not dataset.exists()
         df = pd.DataFrame([row])
-        df.to_csv(dataset, mode="a", header=header, index=False)
-
-    def _can_alert(self, key: Tuple[str, str], now: datetime) -> bool:
-        last = self._last_alert_at.get(key)
-        if last is None:
-            return True
-        buffer_minutes = self.settings.alert_buffer_minutes
-        return now - last >= timedelta(minutes=buffer_minutes)
+        with self._csv_lock:
+            header = not dataset.exists()
+            df.to_csv(dataset, mode="a", header=header, index=False)
 
     @staticmethod
     def _trip_key(tourist_id: str, trip_id: str) -> str:
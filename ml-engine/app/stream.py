@@ -0,0 +1,165 @@
+"""Partitioned stream processing for observation ingest.
+
+Observations are hashed by trip onto `N` shards. Each shard is a worker
+thread with a bounded queue that stores, checks and dispatches its
+observations one at a time. A trip's observations are therefore handled
+in arrival order by a single writer, and the per-trip detector state
+(motion timestamps, behavioral history, throttles) is never touched by two
+threads at once. Trips on different shards run in parallel; the detectors
+spend most of their time in numpy, shapely and scikit-learn, which release
+the GIL.
+
+When a shard's queue is full, `submit` waits up to the enqueue timeout
+and then raises `StreamBusy`, so callers push back on clients instead of
+queueing without bound.
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from .alert_aggregation import aggregator
+from .config import get_settings
+from .detection import engine
+from .schemas import AlertPayload, Observation
+from .storage import store
+
+Handler = Callable[[Observation], List[AlertPayload]]
+_STOP = object()
+
+
+class StreamBusy(Exception):
+    """The observation's shard queue stayed full for the enqueue timeout."""
+
+
+@dataclass
+class ShardStats:
+    processed: int = 0
+    failed: int = 0
+    rejected: int = 0
+
+    def snapshot(self, shard: int, depth: int) -> Dict[str, int]:
+        return {
+            "shard": shard,
+            "queue_depth": depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+class StreamProcessor:
+    """Per-trip ordered processing over `num_shards` single-writer workers."""
+
+    def __init__(
+        self,
+        handler: Handler,
+        num_shards: int = 4,
+        queue_size: int = 1000,
+        enqueue_timeout: float = 0.5,
+    ) -> None:
+        self._handler = handler
+        self.num_shards = max(1, num_shards)
+        self.enqueue_timeout = enqueue_timeout
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in range(self.num_shards)]
+        self._stats = [ShardStats() for _ in range(self.num_shards)]
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, handler: Handler) -> "StreamProcessor":
+        settings = get_settings()
+        return cls(
+            handler,
+            num_shards=settings.stream_shards,
+            queue_size=settings.stream_queue_size,
+            enqueue_timeout=settings.stream_enqueue_timeout_seconds,
+        )
+
+    def shard_of(self, obs: Observation) -> int:
+        # crc32 rather than hash(): stable across processes and restarts
+        return zlib.crc32(f"{obs.tourist_id}::{obs.trip_id}".encode()) % self.num_shards
+
+    def submit(self, obs: Observation) -> "Future[List[AlertPayload]]":
+        """Queue an observation on its trip's shard.
+
+        Returns:
+            A future resolving to the alerts it triggered
+
+        Raises:
+            StreamBusy: if the shard stayed full for the enqueue timeout
+        """
+        self.start()
+        shard = self.shard_of(obs)
+        future: "Future[List[AlertPayload]]" = Future()
+        try:
+            self._queues[shard].put((obs, future), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._stats[shard].rejected += 1
+            raise StreamBusy(f"Ingest shard {shard} is full") from None
+        return future
+
+    def process(self, obs: Observation, timeout: Optional[float] = None) -> List[AlertPayload]:
+        """Submit an observation and wait for its alerts."""
+        return self.submit(obs).result(timeout)
+
+    def stats(self) -> List[Dict[str, int]]:
+        return [stats.snapshot(i, q.qsize()) for i, (stats, q) in enumerate(zip(self._stats, self._queues))]
+
+    # ============ Lifecycle ============
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            if not self._threads:
+                self._threads = [
+                    threading.Thread(target=self._run, args=(shard,), name=f"ingest-shard-{shard}", daemon=True)
+                    for shard in range(self.num_shards)
+                ]
+                for thread in self._threads:
+                    thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Process what is queued (up to `timeout` seconds per shard) and stop the workers."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        for q in self._queues:
+            q.put(_STOP)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _run(self, shard: int) -> None:
+        q, stats = self._queues[shard], self._stats[shard]
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            obs, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._handler(obs))
+                stats.processed += 1
+            except Exception as e:
+                stats.failed += 1
+                print(f"[STREAM] Shard {shard} failed on {obs.trip_id}: {e}")
+                future.set_exception(e)
+
+
+def ingest(obs: Observation) -> List[AlertPayload]:
+    """Store an observation, run the detectors and dispatch its alerts."""
+    store.add_observation(obs)
+    alerts = engine.process_observation(obs)
+    for alert in alerts:
+        aggregator.submit(alert)
+    return alerts
+
+
+stream = StreamProcessor.from_settings(ingest)
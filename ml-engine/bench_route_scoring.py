@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+TourGuard Route Scoring Benchmark
+Measures route scoring throughput (routes/second) one route at a time
+versus the vectorized batch scorer, on random routes around the danger zones.
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path for the app package
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import route_scoring
+from app.detection import engine
+from app.schemas import RoutePoint
+
+
+def random_routes(count, points, spread, seed):
+    """Random walks starting near the danger zones."""
+    rng = random.Random(seed)
+    centers = [polygon.centroid for polygon, _, _, _ in engine._danger_polygons] or [None]
+    routes = []
+    for _ in range(count):
+        center = rng.choice(centers)
+        lat = (center.y if center else 25.57) + rng.uniform(-spread, spread)
+        lng = (center.x if center else 91.88) + rng.uniform(-spread, spread)
+        route = []
+        for _ in range(points):
+            route.append(RoutePoint(lat=lat, lng=lng))
+            lat += rng.uniform(-spread, spread) / points * 4
+            lng += rng.uniform(-spread, spread) / points * 4
+        routes.append(route)
+    return routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark route scoring throughput")
+    parser.add_argument("--routes", type=int, default=1000, help="Routes per run (default: 1000)")
+    parser.add_argument("--points", type=int, default=20, help="Points per route (default: 20)")
+    parser.add_argument("--spread", type=float, default=0.02, help="Route spread in degrees (default: 0.02)")
+    parser.add_argument("--night", action="store_true", help="Score as nighttime travel")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    timestamp = datetime.now().replace(hour=22 if args.night else 12)
+    routes = random_routes(args.routes, args.points, args.spread, args.seed)
+    print(f"{args.routes} routes x {args.points} points, {len(engine._danger_polygons)} danger zones")
+
+    route_scoring.segment_cache.max_entries = 0  # measure uncached per-route scoring
+    started = time.perf_counter()
+    single = [route_scoring.calculate_overall_route_score(route, timestamp)[0] for route in routes]
+    single_s = time.perf_counter() - started
+
+    route_scoring.score_routes_batch(routes[:1], timestamp)  # build the zone tree
+    started = time.perf_counter()
+    batch = route_scoring.score_routes_batch(routes, timestamp)
+    batch_s = time.perf_counter() - started
+
+    mismatches = sum(abs(a - b.safety_score) > 1e-9 for a, b in zip(single, batch))
+    crossing = sum(1 for b in batch if b.zone_ids)
+    print(f"Per route: {args.routes / single_s:10.0f} routes/s ({single_s * 1000:.1f} ms)")
+    print(f"Batch:     {args.routes / batch_s:10.0f} routes/s ({batch_s * 1000:.1f} ms)")
+    print(f"Routes crossing a zone: {crossing}, score mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
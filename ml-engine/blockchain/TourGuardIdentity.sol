@@ -48,6 +48,10 @@ contract TourGuardIdentity {
     uint256 public totalLogins;
     uint256 public totalUsers;
     
+    // Batch anchoring: Merkle root => block timestamp it was anchored at
+    mapping(bytes32 => uint256) public batchRoots;
+    uint256 public totalBatches;
+    
     // ============ Events ============
     
     event RegistrationRecorded(
@@ -64,6 +68,12 @@ contract TourGuardIdentity {
         string userId
     );
     
+    event BatchAnchored(
+        bytes32 indexed root,
+        uint256 leafCount,
+        uint256 timestamp
+    );
+    
     event NodeAuthorized(address indexed node, bool authorized);
     event AdminTransferred(address indexed previousAdmin, address indexed newAdmin);
     
@@ -207,6 +217,28 @@ contract TourGuardIdentity {
         return true;
     }
     
+    /**
+     * @dev Anchor the Merkle root of a batch of registration/login hashes
+     * @param root Merkle root over keccak256(0x00 || abi.encode(userId, hashId, eventType))
+     *        leaves, with internal nodes keccak256(0x01 || sorted pair)
+     * @param leafCount Number of records in the batch
+     * @return success Whether the operation was successful
+     */
+    function anchorBatchRoot(
+        bytes32 root,
+        uint256 leafCount
+    ) external onlyAuthorized returns (bool success) {
+        require(root != bytes32(0), "TourGuard: Invalid root");
+        require(batchRoots[root] == 0, "TourGuard: Root already anchored");
+        
+        batchRoots[root] = block.timestamp;
+        totalBatches++;
+        
+        emit BatchAnchored(root, leafCount, block.timestamp);
+        
+        return true;
+    }
+    
     // ============ View Functions ============
     
     /**
@@ -218,6 +250,38 @@ contract TourGuardIdentity {
         return hashExists[hashId];
     }
     
+    /**
+     * @dev Check whether a batch root has been anchored
+     * @param root The Merkle root
+     * @return anchored Whether the root exists
+     * @return timestamp When the root was anchored
+     */
+    function isRootAnchored(bytes32 root) external view returns (bool anchored, uint256 timestamp) {
+        return (batchRoots[root] != 0, batchRoots[root]);
+    }
+    
+    /**
+     * @dev Verify a record's inclusion proof against an anchored batch root
+     * @param root The anchored Merkle root
+     * @param leaf keccak256(abi.encodePacked(bytes1(0x00), abi.encode(userId, hashId, eventType)))
+     * @param proof Sibling hashes from leaf to root (sorted pairs, hashed with a 0x01 prefix)
+     * @return valid Whether the proof is valid and the root is anchored
+     */
+    function verifyBatchProof(
+        bytes32 root,
+        bytes32 leaf,
+        bytes32[] calldata proof
+    ) external view returns (bool valid) {
+        bytes32 computed = leaf;
+        for (uint256 i = 0; i < proof.length; i++) {
+            bytes32 sibling = proof[i];
+            computed = computed < sibling
+                ? keccak256(abi.encodePacked(bytes1(0x01), computed, sibling))
+                : keccak256(abi.encodePacked(bytes1(0x01), sibling, computed));
+        }
+        return computed == root && batchRoots[root] != 0;
+    }
+    
     /**
      * @dev Get the number of records for a user
      * @param userId The user's unique identifier
@@ -251,6 +315,50 @@ contract TourGuardIdentity {
         return (record.hashId, record.timestamp, record.eventType);
     }
     
+    /**
+     * @dev Get a page of records for a user in one call
+     * @param userId The user's unique identifier
+     * @param offset Index of the first record to return
+     * @param limit Maximum number of records to return
+     * @return hashIds Hash IDs of the returned records
+     * @return timestamps When each record was created
+     * @return eventTypes Type of each event (REGISTER or LOGIN)
+     * @return total Total number of records for the user
+     */
+    function getUserRecords(
+        string calldata userId,
+        uint256 offset,
+        uint256 limit
+    ) external view returns (
+        bytes32[] memory hashIds,
+        uint256[] memory timestamps,
+        string[] memory eventTypes,
+        uint256 total
+    ) {
+        bytes32 userIdHash = keccak256(abi.encodePacked(userId));
+        IdentityRecord[] storage records = userRecords[userIdHash];
+        total = records.length;
+        
+        uint256 count = 0;
+        if (offset < total) {
+            count = total - offset;
+            if (count > limit) {
+                count = limit;
+            }
+        }
+        
+        hashIds = new bytes32[](count);
+        timestamps = new uint256[](count);
+        eventTypes = new string[](count);
+        
+        for (uint256 i = 0; i < count; i++) {
+            IdentityRecord storage record = records[offset + i];
+            hashIds[i] = record.hashId;
+            timestamps[i] = record.timestamp;
+            eventTypes[i] = record.eventType;
+        }
+    }
+    
     /**
      * @dev Get user summary statistics
      * @param userId The user's unique identifier
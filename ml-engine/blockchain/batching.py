@@ -0,0 +1,286 @@
+"""
+Batch anchoring of registration/login hashes.
+
+In batch mode, hashes are collected for a short interval (or until a size
+limit is hit), combined into a Merkle tree and only the root is written on
+chain via `anchorBatchRoot`. Every record is written to a local SQLite
+store when it is added, and its root and inclusion proof when its batch is
+sealed, so proofs survive restarts and can always be verified against the
+anchored root. On startup, records a previous process left unsealed are
+sealed and roots it never saw anchored are queued again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .merkle import MerkleTree, leaf_hash, to_hex
+
+if TYPE_CHECKING:
+    from .ethereum_service import EthereumService
+
+
+BATCH_USER_ID = "__batch__"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    hash_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    root TEXT,
+    leaf_index INTEGER,
+    batch_size INTEGER NOT NULL DEFAULT 0,
+    proof TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_records_root ON records (root);
+
+CREATE TABLE IF NOT EXISTS batches (
+    root TEXT PRIMARY KEY,
+    leaf_count INTEGER NOT NULL,
+    anchored INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+@dataclass
+class BatchProof:
+    """A record's place in a batch; root and proof are set once sealed."""
+    hash_id: str
+    user_id: str
+    event_type: str
+    root: Optional[str] = None
+    proof: List[str] = field(default_factory=list)
+    leaf_index: Optional[int] = None
+    batch_size: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hash_id": self.hash_id,
+            "user_id": self.user_id,
+            "event_type": self.event_type,
+            "root": self.root,
+            "proof": self.proof,
+            "leaf_index": self.leaf_index,
+            "batch_size": self.batch_size,
+        }
+
+
+class BatchStore:
+    """SQLite record of batched hashes, their batches and inclusion proofs."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def add(self, record: BatchProof) -> None:
+        """Store a record that is not sealed yet (a repeated hash is ignored)."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO records (hash_id, user_id, event_type) VALUES (?, ?, ?)",
+                (record.hash_id, record.user_id, record.event_type),
+            )
+
+    def seal(self, root: str, records: List[BatchProof]) -> None:
+        """Store a sealed batch with every record's root and proof."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO batches (root, leaf_count) VALUES (?, ?)",
+                (root, len(records)),
+            )
+            self._db.executemany(
+                "UPDATE records SET root = ?, leaf_index = ?, batch_size = ?, proof = ? WHERE hash_id = ?",
+                [
+                    (root, r.leaf_index, r.batch_size, json.dumps(r.proof), r.hash_id)
+                    for r in records
+                ],
+            )
+
+    def mark_anchored(self, root: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("UPDATE batches SET anchored = 1 WHERE root = ?", (root,))
+
+    def is_anchored(self, root: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT anchored FROM batches WHERE root = ?", (root,)).fetchone()
+        return bool(row and row[0])
+
+    def get(self, hash_id: str) -> Optional[BatchProof]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT hash_id, user_id, event_type, root, leaf_index, batch_size, proof "
+                "FROM records WHERE hash_id = ?",
+                (hash_id,),
+            ).fetchone()
+        return self._to_proof(row) if row else None
+
+    def unsealed(self) -> List[BatchProof]:
+        """Records added but never sealed, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT hash_id, user_id, event_type, root, leaf_index, batch_size, proof "
+                "FROM records WHERE root IS NULL ORDER BY rowid"
+            ).fetchall()
+        return [self._to_proof(row) for row in rows]
+
+    def unanchored(self) -> List[Tuple[str, int]]:
+        """(root, leaf count) of sealed batches not yet seen anchored."""
+        with self._lock:
+            return self._db.execute("SELECT root, leaf_count FROM batches WHERE anchored = 0").fetchall()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            unsealed = self._db.execute("SELECT COUNT(*) FROM records WHERE root IS NULL").fetchone()[0]
+            unanchored = self._db.execute("SELECT COUNT(*) FROM batches WHERE anchored = 0").fetchone()[0]
+        return {"unsealed_records": unsealed, "unanchored_batches": unanchored}
+
+    @staticmethod
+    def _to_proof(row: Tuple[Any, ...]) -> BatchProof:
+        hash_id, user_id, event_type, root, leaf_index, batch_size, proof = row
+        return BatchProof(
+            hash_id=hash_id,
+            user_id=user_id,
+            event_type=event_type,
+            root=root,
+            proof=json.loads(proof),
+            leaf_index=leaf_index,
+            batch_size=batch_size,
+        )
+
+
+class HashBatcher:
+    """Collects hashes and anchors their Merkle root through the pipeline."""
+
+    def __init__(
+        self,
+        service: "EthereumService",
+        store: BatchStore,
+        max_items: int,
+        interval_seconds: float,
+    ):
+        self._service = service
+        self._store = store
+        self._max_items = max(1, max_items)
+        self._interval_seconds = interval_seconds
+        self._pending: List[BatchProof] = []
+        self._timer: Optional[asyncio.Task] = None
+
+    @property
+    def store(self) -> BatchStore:
+        return self._store
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def add(self, user_id: str, hash_id: str, event_type: str) -> BatchProof:
+        """
+        Add a record to the current batch.
+
+        Args:
+            user_id: Unique user identifier
+            hash_id: Record hash (with 0x prefix)
+            event_type: "REGISTER" or "LOGIN"
+
+        Returns:
+            BatchProof, sealed only if this record filled the batch
+        """
+        record = BatchProof(hash_id=hash_id, user_id=user_id, event_type=event_type)
+        self._store.add(record)
+        self._pending.append(record)
+
+        if len(self._pending) >= self._max_items:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+        return record
+
+    async def flush(self) -> Optional[str]:
+        """
+        Seal the current batch and queue its root for anchoring.
+
+        Returns:
+            The batch root (hex), or None if there was nothing to flush
+        """
+        # A size-triggered flush makes the pending timer pointless
+        timer, self._timer = self._timer, None
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return None
+
+        tree = MerkleTree([
+            leaf_hash(record.user_id, record.hash_id, record.event_type)
+            for record in batch
+        ])
+        root = to_hex(tree.root)
+
+        for index, record in enumerate(batch):
+            record.root = root
+            record.leaf_index = index
+            record.proof = [to_hex(node) for node in tree.proof(index)]
+            record.batch_size = len(batch)
+        self._store.seal(root, batch)
+
+        await self._anchor(root, len(batch))
+        return root
+
+    async def recover(self) -> int:
+        """
+        Finish the work a previous process left behind.
+
+        Roots sealed but not seen anchored are queued again (a root that
+        was in fact anchored meanwhile is only marked), and records that
+        were never sealed are sealed into a new batch.
+
+        Returns:
+            Number of roots queued
+        """
+        queued = 0
+        for root, leaf_count in self._store.unanchored():
+            if await asyncio.to_thread(self._service.is_root_anchored, root):
+                self._store.mark_anchored(root)
+                continue
+            await self._anchor(root, leaf_count)
+            queued += 1
+
+        pending = {record.hash_id for record in self._pending}
+        self._pending[:0] = [r for r in self._store.unsealed() if r.hash_id not in pending]
+        if self._pending and await self.flush() is not None:
+            queued += 1
+        return queued
+
+    async def stop(self) -> None:
+        """Cancel the timer and flush whatever is pending."""
+        await self.flush()
+
+    def get(self, hash_id: str) -> Optional[BatchProof]:
+        """Look up a batched record by hash ID."""
+        return self._store.get(hash_id)
+
+    async def _anchor(self, root: str, leaf_count: int) -> None:
+        await self._service.enqueue_transaction(
+            "anchorBatchRoot",
+            BATCH_USER_ID,
+            root,
+            (bytes.fromhex(root[2:]), leaf_count),
+        )
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._interval_seconds)
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"[Blockchain] Batch flush error: {e}")
@@ -0,0 +1,125 @@
+"""
+Connection management for the Ethereum node.
+
+Wraps a Web3 HTTP provider backed by a pooled keep-alive session, caches
+node health so request handlers don't pay an RPC round-trip just to check
+the connection, and reconnects with exponential backoff when the node
+goes away (e.g. Ganache/Anvil restarts).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+
+
+class ConnectionManager:
+    """Pooled Web3 connection with a background heartbeat."""
+
+    def __init__(
+        self,
+        rpc_url: str,
+        poa_middleware=None,
+        pool_size: int = 20,
+        request_timeout: float = 10.0,
+        heartbeat_seconds: float = 5.0,
+        max_backoff_seconds: float = 60.0,
+        on_reconnect: Optional[Callable[[], bool]] = None,
+    ):
+        self.rpc_url = rpc_url
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._on_reconnect = on_reconnect
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self.web3 = Web3(Web3.HTTPProvider(
+            rpc_url,
+            request_kwargs={"timeout": request_timeout},
+            session=self._session,
+        ))
+        if poa_middleware is not None:
+            self.web3.middleware_onion.inject(poa_middleware, layer=0)
+
+        self._lock = threading.Lock()
+        self._healthy = False
+        self._checked_at = 0.0
+        self._failures = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def healthy(self) -> bool:
+        """Cached node health, kept current by the heartbeat; never calls the node."""
+        return self._healthy
+
+    def check(self) -> bool:
+        """Run a live health check and update the cache."""
+        try:
+            healthy = self.web3.is_connected()
+        except Exception:
+            healthy = False
+        with self._lock:
+            self._healthy = healthy
+            self._checked_at = time.monotonic()
+        return healthy
+
+    def mark_unhealthy(self) -> None:
+        """Invalidate the cached health after a failed RPC."""
+        with self._lock:
+            self._healthy = False
+            self._checked_at = time.monotonic()
+
+    def start_heartbeat(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat, name="eth-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.heartbeat_seconds)
+        self._session.close()
+
+    def status(self) -> dict:
+        return {
+            "healthy": self._healthy,
+            "checked_seconds_ago": round(time.monotonic() - self._checked_at, 1),
+            "consecutive_failures": self._failures,
+        }
+
+    def _heartbeat(self) -> None:
+        was_healthy = self._healthy
+        while not self._stop.is_set():
+            healthy = self.check()
+
+            if healthy:
+                if not was_healthy and self._on_reconnect is not None:
+                    print(f"[Blockchain] Node reachable again at {self.rpc_url}, reinitializing")
+                    try:
+                        healthy = self._on_reconnect()
+                    except Exception as e:
+                        print(f"[Blockchain] Reinitialization failed: {e}")
+                        healthy = False
+
+            if healthy:
+                self._failures = 0
+                delay = self.heartbeat_seconds
+            else:
+                self._failures += 1
+                delay = min(self.heartbeat_seconds * (2 ** (self._failures - 1)), self.max_backoff_seconds)
+                if was_healthy:
+                    print(f"[Blockchain] Lost connection to {self.rpc_url}, retrying with backoff")
+
+            was_healthy = healthy
+            self._stop.wait(delay)
@@ -2,21 +2,24 @@
 Deploy TourGuard Identity Contract to Ethereum Network
 
 Usage:
-    python -m blockchain.deploy
+    python -m blockchain.deploy [--compile-only] [--no-cache]
 
 Environment Variables:
     ETH_RPC_URL: RPC endpoint (default: http://127.0.0.1:8545)
     ETH_PRIVATE_KEY: Private key for deployment
     ETH_CHAIN_ID: Chain ID (default: 1337 for Ganache)
+    SOLC_BUILD_CACHE: Compile output cache directory (default: blockchain/.build)
 """
 
+import argparse
+import hashlib
 import json
 import os
 import sys
 from pathlib import Path
 
 try:
-    from solcx import compile_standard, install_solc
+    from solcx import compile_standard, get_installed_solc_versions, install_solc
     from web3 import Web3
     from eth_account import Account
 except ImportError:
@@ -25,7 +28,145 @@ except ImportError:
     sys.exit(1)
 
 
-def deploy_contract():
+CONTRACT_DIR = Path(__file__).parent
+CONTRACT_PATH = CONTRACT_DIR / "TourGuardIdentity.sol"
+ABI_PATH = CONTRACT_DIR / "TourGuardIdentity.abi.json"
+BYTECODE_PATH = CONTRACT_DIR / "TourGuardIdentity.bin"
+BUILD_CACHE_DIR = Path(os.getenv("SOLC_BUILD_CACHE", str(CONTRACT_DIR / ".build")))
+
+SOLC_VERSION = "0.8.19"
+COMPILER_SETTINGS = {
+    "outputSelection": {
+        "*": {
+            "*": ["abi", "metadata", "evm.bytecode"]
+        }
+    },
+    "optimizer": {
+        "enabled": True,
+        "runs": 200
+    }
+}
+
+
+def ensure_solc(version=SOLC_VERSION):
+    """Install the solc binary only if this version isn't installed yet."""
+    if any(str(installed) == version for installed in get_installed_solc_versions()):
+        return
+    print(f"Installing solc {version}...")
+    install_solc(version)
+
+
+def compile_cache_key(source, version=SOLC_VERSION, settings=COMPILER_SETTINGS):
+    """Content address of a compile: source, compiler version and settings."""
+    payload = json.dumps(
+        {"source": source, "solc_version": version, "settings": settings},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def compile_contract(source, use_cache=True):
+    """
+    Compile TourGuardIdentity, reusing a cached build of identical input.
+    
+    Returns:
+        Tuple of (abi, bytecode)
+    """
+    key = compile_cache_key(source)
+    cache_path = BUILD_CACHE_DIR / f"{key}.json"
+    
+    if use_cache and cache_path.exists():
+        with open(cache_path) as f:
+            cached = json.load(f)
+        print(f"✅ Using cached build {key[:12]}")
+        return cached["abi"], cached["bytecode"]
+    
+    ensure_solc()
+    
+    compiled = compile_standard(
+        {
+            "language": "Solidity",
+            "sources": {
+                "TourGuardIdentity.sol": {"content": source}
+            },
+            "settings": COMPILER_SETTINGS
+        },
+        solc_version=SOLC_VERSION
+    )
+    
+    contract_data = compiled["contracts"]["TourGuardIdentity.sol"]["TourGuardIdentity"]
+    abi = contract_data["abi"]
+    bytecode = contract_data["evm"]["bytecode"]["object"]
+    
+    BUILD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"solc_version": SOLC_VERSION, "abi": abi, "bytecode": bytecode}, f)
+    tmp_path.replace(cache_path)
+    
+    print("✅ Contract compiled successfully")
+    return abi, bytecode
+
+
+def write_artifacts(abi, bytecode):
+    """Write the ABI and bytecode artifacts, leaving unchanged files untouched."""
+    current_abi = None
+    if ABI_PATH.exists():
+        try:
+            with open(ABI_PATH) as f:
+                current_abi = json.load(f)
+        except ValueError:
+            pass
+    if current_abi != abi:
+        with open(ABI_PATH, "w") as f:
+            json.dump(abi, f, indent=2)
+        print(f"ABI saved to: {ABI_PATH}")
+    
+    if not BYTECODE_PATH.exists() or BYTECODE_PATH.read_text().strip() != bytecode:
+        BYTECODE_PATH.write_text(bytecode + "\n")
+        print(f"Bytecode saved to: {BYTECODE_PATH}")
+
+
+def build_contract(use_cache=True):
+    """Compile (or load from cache), check against the service ABI and write artifacts."""
+    if not CONTRACT_PATH.exists():
+        print(f"\n❌ Contract file not found: {CONTRACT_PATH}")
+        sys.exit(1)
+    
+    source = CONTRACT_PATH.read_text()
+    
+    print("\n📝 Compiling contract...")
+    abi, bytecode = compile_contract(source, use_cache=use_cache)
+    
+    missing = check_service_abi(abi)
+    if missing:
+        print(f"\n❌ Compiled contract is missing entries used by the service: {', '.join(missing)}")
+        sys.exit(1)
+    
+    write_artifacts(abi, bytecode)
+    return abi, bytecode
+
+
+def check_service_abi(abi):
+    """
+    Ensure the compiled contract exposes every function and event that
+    EthereumService calls (its ABI is maintained by hand).
+    
+    Returns:
+        List of missing entry names (empty when compatible)
+    """
+    from .ethereum_service import CONTRACT_ABI
+    
+    compiled = {(entry["type"], entry.get("name")) for entry in abi}
+    return [
+        entry["name"]
+        for entry in CONTRACT_ABI
+        if entry["type"] in ("function", "event")
+        and (entry["type"], entry["name"]) not in compiled
+    ]
+
+
+def deploy_contract(use_cache=True):
     """Deploy the TourGuardIdentity contract."""
     
     # Configuration
@@ -84,52 +225,7 @@ def deploy_contract():
             print("\n❌ Account has no ETH for gas")
             sys.exit(1)
     
-    # Read contract source
-    contract_path = Path(__file__).parent / "TourGuardIdentity.sol"
-    
-    if not contract_path.exists():
-        print(f"\n❌ Contract file not found: {contract_path}")
-        sys.exit(1)
-    
-    with open(contract_path, "r") as f:
-        contract_source = f.read()
-    
-    print("\n📝 Compiling contract...")
-    
-    # Install solc if needed
-    try:
-        install_solc("0.8.19")
-    except Exception:
-        pass  # Already installed
-    
-    # Compile contract
-    compiled = compile_standard(
-        {
-            "language": "Solidity",
-            "sources": {
-                "TourGuardIdentity.sol": {"content": contract_source}
-            },
-            "settings": {
-                "outputSelection": {
-                    "*": {
-                        "*": ["abi", "metadata", "evm.bytecode"]
-                    }
-                },
-                "optimizer": {
-                    "enabled": True,
-                    "runs": 200
-                }
-            }
-        },
-        solc_version="0.8.19"
-    )
-    
-    # Extract ABI and bytecode
-    contract_data = compiled["contracts"]["TourGuardIdentity.sol"]["TourGuardIdentity"]
-    abi = contract_data["abi"]
-    bytecode = contract_data["evm"]["bytecode"]["object"]
-    
-    print("✅ Contract compiled successfully")
+    abi, bytecode = build_contract(use_cache=use_cache)
     
     # Create contract instance
     Contract = w3.eth.contract(abi=abi, bytecode=bytecode)
@@ -180,7 +276,8 @@ def deploy_contract():
             "chain_id": chain_id,
             "block_number": receipt.blockNumber,
             "tx_hash": tx_hash.hex(),
-            "gas_used": receipt.gasUsed
+            "gas_used": receipt.gasUsed,
+            "features": ["batch_anchoring"]
         }
         
         info_path = Path(__file__).parent / "deployment_info.json"
@@ -193,14 +290,9 @@ def deploy_contract():
         print("\n" + "-" * 60)
         print("Add this to your environment:")
         print(f"  export ETH_CONTRACT_ADDRESS={contract_address}")
+        print("  export ETH_BATCH_MODE=true   # optional: anchor Merkle roots only")
         print("-" * 60)
         
-        # Save ABI
-        abi_path = Path(__file__).parent / "TourGuardIdentity.abi.json"
-        with open(abi_path, "w") as f:
-            json.dump(abi, f, indent=2)
-        print(f"ABI saved to: {abi_path}")
-        
         return contract_address
         
     else:
@@ -210,4 +302,12 @@ def deploy_contract():
 
 
 if __name__ == "__main__":
-    deploy_contract()
+    parser = argparse.ArgumentParser(description="Compile and deploy the TourGuardIdentity contract")
+    parser.add_argument("--compile-only", action="store_true", help="Build artifacts without deploying")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached compile output")
+    args = parser.parse_args()
+    
+    if args.compile_only:
+        build_contract(use_cache=not args.no_cache)
+    else:
+        deploy_contract(use_cache=not args.no_cache)
@@ -3,7 +3,8 @@ from __future__ import annotations
 import hashlib
 import json
 import os
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, replace
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Tuple, List, Dict, Any
@@ -14,6 +15,8 @@ env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(env_path)
 
 from web3 import Web3
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError, TransactionNotFound
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout as RequestsTimeout
 from eth_account import Account
 from eth_account.signers.local import LocalAccount
 
@@ -26,6 +29,12 @@ except ImportError:
     except ImportError:
         poa_middleware = None
 
+from .batching import BatchProof, BatchStore, HashBatcher
+from .connection import ConnectionManager
+from .indexer import EventIndexer
+from .merkle import leaf_hash, to_bytes32, verify_proof
+from .tx_pipeline import STATUS_CONFIRMED, TransactionPipeline, TransactionStatus
+
 
 # Contract ABI - Simplified for key functions
 CONTRACT_ABI = [
@@ -95,6 +104,22 @@ CONTRACT_ABI = [
         "stateMutability": "view",
         "type": "function"
     },
+    {
+        "inputs": [
+            {"internalType": "string", "name": "userId", "type": "string"},
+            {"internalType": "uint256", "name": "offset", "type": "uint256"},
+            {"internalType": "uint256", "name": "limit", "type": "uint256"}
+        ],
+        "name": "getUserRecords",
+        "outputs": [
+            {"internalType": "bytes32[]", "name": "hashIds", "type": "bytes32[]"},
+            {"internalType": "uint256[]", "name": "timestamps", "type": "uint256[]"},
+            {"internalType": "string[]", "name": "eventTypes", "type": "string[]"},
+            {"internalType": "uint256", "name": "total", "type": "uint256"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
     {
         "inputs": [],
         "name": "getGlobalStats",
@@ -106,6 +131,37 @@ CONTRACT_ABI = [
         "stateMutability": "view",
         "type": "function"
     },
+    {
+        "inputs": [
+            {"internalType": "bytes32", "name": "root", "type": "bytes32"},
+            {"internalType": "uint256", "name": "leafCount", "type": "uint256"}
+        ],
+        "name": "anchorBatchRoot",
+        "outputs": [{"internalType": "bool", "name": "success", "type": "bool"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"internalType": "bytes32", "name": "root", "type": "bytes32"}],
+        "name": "isRootAnchored",
+        "outputs": [
+            {"internalType": "bool", "name": "anchored", "type": "bool"},
+            {"internalType": "uint256", "name": "timestamp", "type": "uint256"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [
+            {"internalType": "bytes32", "name": "root", "type": "bytes32"},
+            {"internalType": "bytes32", "name": "leaf", "type": "bytes32"},
+            {"internalType": "bytes32[]", "name": "proof", "type": "bytes32[]"}
+        ],
+        "name": "verifyBatchProof",
+        "outputs": [{"internalType": "bool", "name": "valid", "type": "bool"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
     {
         "inputs": [
             {"internalType": "address", "name": "node", "type": "address"},
@@ -137,6 +193,16 @@ CONTRACT_ABI = [
         ],
         "name": "LoginRecorded",
         "type": "event"
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "internalType": "bytes32", "name": "root", "type": "bytes32"},
+            {"indexed": False, "internalType": "uint256", "name": "leafCount", "type": "uint256"},
+            {"indexed": False, "internalType": "uint256", "name": "timestamp", "type": "uint256"}
+        ],
+        "name": "BatchAnchored",
+        "type": "event"
     }
 ]
 
@@ -161,9 +227,43 @@ class BlockchainConfig:
     # Network type (for middleware)
     is_poa: bool = os.getenv("ETH_IS_POA", "false").lower() == "true"
     
+    # Connection settings (pooled HTTP session, cached health, reconnect)
+    rpc_pool_size: int = int(os.getenv("ETH_RPC_POOL_SIZE", "20"))
+    rpc_timeout_seconds: float = float(os.getenv("ETH_RPC_TIMEOUT_SECONDS", "10"))
+    heartbeat_seconds: float = float(os.getenv("ETH_HEARTBEAT_SECONDS", "5"))
+    reconnect_max_backoff_seconds: float = float(os.getenv("ETH_RECONNECT_MAX_BACKOFF_SECONDS", "60"))
+    
     # Gas settings
     gas_limit: int = int(os.getenv("ETH_GAS_LIMIT", "3000000"))
     gas_price_gwei: int = int(os.getenv("ETH_GAS_PRICE_GWEI", "20"))
+    
+    # Transaction pipeline settings
+    tx_queue_size: int = int(os.getenv("ETH_TX_QUEUE_SIZE", "10000"))
+    sender_workers: int = int(os.getenv("ETH_SENDER_WORKERS", "4"))
+    receipt_poll_seconds: float = float(os.getenv("ETH_RECEIPT_POLL_SECONDS", "1.0"))
+    receipt_timeout_seconds: int = int(os.getenv("ETH_RECEIPT_TIMEOUT_SECONDS", "120"))
+    
+    # Read settings
+    records_page_limit: int = int(os.getenv("ETH_RECORDS_PAGE_LIMIT", "100"))
+    
+    # Local event index (SQLite read model for verify/records/stats)
+    indexer_enabled: bool = os.getenv("ETH_INDEXER_ENABLED", "false").lower() == "true"
+    indexer_db_path: str = os.getenv(
+        "ETH_INDEXER_DB",
+        str(Path(__file__).parent.parent / "data" / "blockchain_index.sqlite")
+    )
+    indexer_start_block: int = int(os.getenv("ETH_INDEXER_START_BLOCK", "0"))
+    indexer_confirmations: int = int(os.getenv("ETH_INDEXER_CONFIRMATIONS", "12"))
+    indexer_poll_seconds: float = float(os.getenv("ETH_INDEXER_POLL_SECONDS", "2"))
+    
+    # Batch anchoring (only Merkle roots go on chain)
+    batch_mode: bool = os.getenv("ETH_BATCH_MODE", "false").lower() == "true"
+    batch_interval_seconds: float = float(os.getenv("ETH_BATCH_INTERVAL_SECONDS", "5"))
+    batch_max_items: int = int(os.getenv("ETH_BATCH_MAX_ITEMS", "256"))
+    batch_db_path: str = os.getenv(
+        "ETH_BATCH_DB",
+        str(Path(__file__).parent.parent / "data" / "blockchain_batches.sqlite")
+    )
 
 
 @dataclass
@@ -175,6 +275,7 @@ class TransactionResult:
     hash_id: Optional[str]
     gas_used: Optional[int]
     error: Optional[str] = None
+    status: Optional[str] = None
 
 
 @dataclass
@@ -184,6 +285,49 @@ class VerificationResult:
     hash_id: str
     user_id: Optional[str] = None
     error: Optional[str] = None
+    root: Optional[str] = None
+    method: str = "contract"
+
+
+class NonceManager:
+    """
+    Hands out transaction nonces from a local counter per sender.
+    
+    The node is only asked for the pending transaction count the first time
+    a sender is seen and after a resync, so concurrent submissions neither
+    pay an extra round-trip nor collide on the same nonce.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_nonce: Dict[str, int] = {}
+    
+    def next_nonce(self, web3: Web3, address: str) -> int:
+        """Reserve the next nonce for an address."""
+        with self._lock:
+            if address not in self._next_nonce:
+                self._next_nonce[address] = web3.eth.get_transaction_count(address, "pending")
+            nonce = self._next_nonce[address]
+            self._next_nonce[address] = nonce + 1
+            return nonce
+    
+    def resync(self, address: str) -> None:
+        """Drop the local counter so the next nonce is read from the node."""
+        with self._lock:
+            self._next_nonce.pop(address, None)
+
+
+def _is_nonce_error(error: Exception) -> bool:
+    """Whether a send failure was caused by a stale or duplicate nonce."""
+    message = str(error).lower()
+    return any(marker in message for marker in (
+        "nonce too low",
+        "nonce too high",
+        "invalid nonce",
+        "already known",
+        "replacement transaction underpriced",
+        "the tx doesn't have the correct nonce",
+    ))
 
 
 class EthereumService:
@@ -192,22 +336,61 @@ class EthereumService:
     def __init__(self, config: Optional[BlockchainConfig] = None):
         self.config = config or BlockchainConfig()
         self._web3: Optional[Web3] = None
+        self._connection: Optional[ConnectionManager] = None
         self._account: Optional[LocalAccount] = None
         self._contract = None
         self._connected = False
         self._use_unlocked = False
         self._unlocked_address: Optional[str] = None
+        self._nonces = NonceManager()
+        self._pipeline = TransactionPipeline(self)
+        self._batcher: Optional[HashBatcher] = None
+        if self.config.batch_mode:
+            self._batcher = HashBatcher(
+                self,
+                BatchStore(Path(self.config.batch_db_path)),
+                max_items=self.config.batch_max_items,
+                interval_seconds=self.config.batch_interval_seconds
+            )
+        self._anchored_roots: Dict[str, int] = {}
+        self._paged_reads_supported: Optional[bool] = None
+        self._indexer: Optional[EventIndexer] = None
     
     def connect(self) -> bool:
-        """Establish connection to Ethereum node."""
+        """
+        Establish connection to Ethereum node.
+        
+        The connection manager keeps a heartbeat running even if the node is
+        unreachable now, and re-runs account/contract setup once it comes back.
+        """
+        if self._connection is None:
+            self._connection = ConnectionManager(
+                self.config.rpc_url,
+                # Add PoA middleware if needed (for networks like Polygon)
+                poa_middleware=poa_middleware if self.config.is_poa else None,
+                pool_size=self.config.rpc_pool_size,
+                request_timeout=self.config.rpc_timeout_seconds,
+                heartbeat_seconds=self.config.heartbeat_seconds,
+                max_backoff_seconds=self.config.reconnect_max_backoff_seconds,
+                on_reconnect=self._reconnect
+            )
+            self._web3 = self._connection.web3
+        
+        connected = self._initialize()
+        self._connection.start_heartbeat()
+        return connected
+    
+    def _reconnect(self) -> bool:
+        """Called by the heartbeat when the node becomes reachable again."""
+        self._connected = False
+        # The node may have restarted (and dropped the mempool); re-read nonces
+        self._nonces = NonceManager()
+        return self._initialize()
+    
+    def _initialize(self) -> bool:
+        """Load the signing account and contract over the current connection."""
         try:
-            self._web3 = Web3(Web3.HTTPProvider(self.config.rpc_url))
-            
-            # Add PoA middleware if needed (for networks like Polygon)
-            if self.config.is_poa and poa_middleware is not None:
-                self._web3.middleware_onion.inject(poa_middleware, layer=0)
-            
-            if not self._web3.is_connected():
+            if not self._connection.check():
                 print(f"[Blockchain] Failed to connect to {self.config.rpc_url}")
                 return False
             
@@ -251,6 +434,9 @@ class EthereumService:
             self._connected = True
             print(f"[Blockchain] Connected to {self.config.rpc_url}")
             
+            if self._contract and self.config.indexer_enabled:
+                self._start_indexer()
+            
             return True
             
         except Exception as e:
@@ -260,7 +446,39 @@ class EthereumService:
     @property
     def is_connected(self) -> bool:
         """Check if connected to blockchain."""
-        return self._connected and self._web3 is not None and self._web3.is_connected()
+        return self._connected and self._connection is not None and self._connection.healthy
+    
+    @property
+    def connection(self) -> Optional[ConnectionManager]:
+        return self._connection
+    
+    @property
+    def web3(self) -> Optional[Web3]:
+        return self._web3
+    
+    @property
+    def contract(self):
+        return self._contract
+    
+    @property
+    def indexer(self) -> Optional[EventIndexer]:
+        return self._indexer
+    
+    def _start_indexer(self) -> None:
+        """Start following contract events into the local read model."""
+        if self._indexer is None:
+            self._indexer = EventIndexer(
+                self,
+                db_path=Path(self.config.indexer_db_path),
+                start_block=self.config.indexer_start_block,
+                confirmations=self.config.indexer_confirmations,
+                poll_seconds=self.config.indexer_poll_seconds
+            )
+        self._indexer.start()
+        print(f"[Blockchain] Event indexer started ({self.config.indexer_db_path})")
+    
+    def _index_ready(self) -> bool:
+        return self._indexer is not None and self._indexer.is_ready
     
     @property
     def account_address(self) -> Optional[str]:
@@ -325,7 +543,10 @@ class EthereumService:
         name: str
     ) -> TransactionResult:
         """
-        Store registration hash on blockchain.
+        Queue a registration hash for storage on blockchain.
+        
+        The transaction is signed, submitted and confirmed in the background;
+        poll `get_transaction_status(hash_id)` for the outcome.
         
         Args:
             user_id: Unique user identifier
@@ -334,79 +555,10 @@ class EthereumService:
             name: User's name
         
         Returns:
-            TransactionResult with transaction details
+            TransactionResult with the hash ID and pending status
         """
-        if not self.is_connected:
-            return TransactionResult(
-                success=False,
-                tx_hash=None,
-                block_number=None,
-                hash_id=None,
-                gas_used=None,
-                error="Not connected to blockchain"
-            )
-        
-        if not self._contract:
-            return TransactionResult(
-                success=False,
-                tx_hash=None,
-                block_number=None,
-                hash_id=None,
-                gas_used=None,
-                error="Contract not deployed"
-            )
-        
-        try:
-            # Generate hash
-            hash_id = self.generate_registration_hash(user_id, email, phone, name)
-            hash_bytes = bytes.fromhex(hash_id[2:])  # Remove 0x prefix
-            
-            # Determine sender address
-            sender_address = self._unlocked_address if self._use_unlocked else self._account.address
-            
-            # Build transaction
-            nonce = self._web3.eth.get_transaction_count(sender_address)
-            
-            tx = self._contract.functions.storeRegistrationHash(
-                user_id,
-                hash_bytes
-            ).build_transaction({
-                'chainId': self.config.chain_id,
-                'gas': self.config.gas_limit,
-                'gasPrice': self._web3.to_wei(self.config.gas_price_gwei, 'gwei'),
-                'nonce': nonce,
-                'from': sender_address,
-            })
-            
-            if self._use_unlocked:
-                # Send transaction directly with unlocked account (Ganache)
-                tx_hash = self._web3.eth.send_transaction(tx)
-            else:
-                # Sign and send transaction with private key
-                signed_tx = self._web3.eth.account.sign_transaction(tx, self.config.private_key)
-                tx_hash = self._web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            
-            # Wait for receipt
-            receipt = self._web3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
-            
-            return TransactionResult(
-                success=receipt.status == 1,
-                tx_hash=tx_hash.hex(),
-                block_number=receipt.blockNumber,
-                hash_id=hash_id,
-                gas_used=receipt.gasUsed
-            )
-            
-        except Exception as e:
-            print(f"[Blockchain] Registration error: {e}")
-            return TransactionResult(
-                success=False,
-                tx_hash=None,
-                block_number=None,
-                hash_id=None,
-                gas_used=None,
-                error=str(e)
-            )
+        hash_id = self.generate_registration_hash(user_id, email, phone, name)
+        return await self._enqueue_record("storeRegistrationHash", user_id, hash_id, "REGISTER")
     
     async def store_login(
         self,
@@ -415,7 +567,7 @@ class EthereumService:
         ip_address: str
     ) -> TransactionResult:
         """
-        Store login hash on blockchain.
+        Queue a login hash for storage on blockchain.
         
         Args:
             user_id: Unique user identifier
@@ -423,7 +575,23 @@ class EthereumService:
             ip_address: Client IP address
         
         Returns:
-            TransactionResult with transaction details
+            TransactionResult with the hash ID and pending status
+        """
+        hash_id = self.generate_login_hash(user_id, device_id, ip_address)
+        return await self._enqueue_record("storeLoginHash", user_id, hash_id, "LOGIN")
+    
+    async def _enqueue_record(
+        self,
+        function_name: str,
+        user_id: str,
+        hash_id: str,
+        event_type: str
+    ) -> TransactionResult:
+        """
+        Hand a record to the transaction pipeline without blocking on the node.
+        
+        In batch mode the record joins the current Merkle batch instead of
+        getting its own transaction.
         """
         if not self.is_connected:
             return TransactionResult(
@@ -446,48 +614,36 @@ class EthereumService:
             )
         
         try:
-            # Generate hash
-            hash_id = self.generate_login_hash(user_id, device_id, ip_address)
-            hash_bytes = bytes.fromhex(hash_id[2:])  # Remove 0x prefix
-            
-            # Determine sender address
-            sender_address = self._unlocked_address if self._use_unlocked else self._account.address
-            
-            # Build transaction
-            nonce = self._web3.eth.get_transaction_count(sender_address)
+            if self.config.batch_mode:
+                await self._batcher.add(user_id, hash_id, event_type)
+                return TransactionResult(
+                    success=True,
+                    tx_hash=None,
+                    block_number=None,
+                    hash_id=hash_id,
+                    gas_used=None,
+                    status="batched"
+                )
             
-            tx = self._contract.functions.storeLoginHash(
+            hash_bytes = bytes.fromhex(hash_id[2:])  # Remove 0x prefix
+            status = await self.enqueue_transaction(
+                function_name,
                 user_id,
-                hash_bytes
-            ).build_transaction({
-                'chainId': self.config.chain_id,
-                'gas': self.config.gas_limit,
-                'gasPrice': self._web3.to_wei(self.config.gas_price_gwei, 'gwei'),
-                'nonce': nonce,
-                'from': sender_address,
-            })
-            
-            if self._use_unlocked:
-                # Send transaction directly with unlocked account (Ganache)
-                tx_hash = self._web3.eth.send_transaction(tx)
-            else:
-                # Sign and send transaction with private key
-                signed_tx = self._web3.eth.account.sign_transaction(tx, self.config.private_key)
-                tx_hash = self._web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            
-            # Wait for receipt
-            receipt = self._web3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+                hash_id,
+                (user_id, hash_bytes)
+            )
             
             return TransactionResult(
-                success=receipt.status == 1,
-                tx_hash=tx_hash.hex(),
-                block_number=receipt.blockNumber,
+                success=True,
+                tx_hash=None,
+                block_number=None,
                 hash_id=hash_id,
-                gas_used=receipt.gasUsed
+                gas_used=None,
+                status=status.status
             )
             
         except Exception as e:
-            print(f"[Blockchain] Login error: {e}")
+            print(f"[Blockchain] Enqueue error: {e}")
             return TransactionResult(
                 success=False,
                 tx_hash=None,
@@ -497,16 +653,264 @@ class EthereumService:
                 error=str(e)
             )
     
-    def verify_hash(self, hash_id: str) -> VerificationResult:
+    @property
+    def sender_address(self) -> Optional[str]:
+        """Address that signs contract transactions."""
+        if self._use_unlocked:
+            return self._unlocked_address
+        return self._account.address if self._account else None
+    
+    async def enqueue_transaction(
+        self,
+        function_name: str,
+        user_id: str,
+        hash_id: str,
+        args: Tuple[Any, ...]
+    ) -> TransactionStatus:
+        """Queue a contract write on the transaction pipeline."""
+        return await self._pipeline.enqueue(function_name, user_id, hash_id, args)
+    
+    def send_contract_transaction(self, function_name: str, args: Tuple[Any, ...]) -> Tuple[str, int]:
+        """
+        Build, sign and submit a contract transaction.
+        
+        This makes blocking RPC calls and is run off the event loop by the
+        transaction pipeline. Nonces come from the local nonce manager; on a
+        nonce error the counter is resynced from the node and the send is
+        retried once.
+        
+        Args:
+            function_name: Contract function to call
+            args: Positional arguments for the function
+        
+        Returns:
+            (transaction hash as a hex string, nonce it was sent with)
+        """
+        sender_address = self.sender_address
+        
+        try:
+            return self._send_with_nonce(function_name, args, sender_address)
+        except Exception as e:
+            if isinstance(e, (RequestsConnectionError, RequestsTimeout)):
+                self._connection.mark_unhealthy()
+            # Any failure may leave a gap or a stale counter; let the node decide
+            self._nonces.resync(sender_address)
+            if not _is_nonce_error(e):
+                raise
+            print(f"[Blockchain] Nonce resync for {sender_address}: {e}")
+            return self._send_with_nonce(function_name, args, sender_address)
+    
+    def _send_with_nonce(
+        self,
+        function_name: str,
+        args: Tuple[Any, ...],
+        sender_address: str
+    ) -> Tuple[str, int]:
+        nonce = self._nonces.next_nonce(self._web3, sender_address)
+        
+        tx = getattr(self._contract.functions, function_name)(*args).build_transaction({
+            'chainId': self.config.chain_id,
+            'gas': self.config.gas_limit,
+            'gasPrice': self._web3.to_wei(self.config.gas_price_gwei, 'gwei'),
+            'nonce': nonce,
+            'from': sender_address,
+        })
+        
+        if self._use_unlocked:
+            # Send transaction directly with unlocked account (Ganache)
+            tx_hash = self._web3.eth.send_transaction(tx)
+        else:
+            # Sign and send transaction with private key
+            signed_tx = self._web3.eth.account.sign_transaction(tx, self.config.private_key)
+            tx_hash = self._web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        
+        return tx_hash.hex(), nonce
+    
+    def resync_nonce(self) -> None:
+        """Re-read the sender nonce from the node (e.g. after a stuck transaction)."""
+        if self.sender_address:
+            self._nonces.resync(self.sender_address)
+    
+    def get_mined_nonce(self) -> int:
+        """Number of the sender's transactions included in a block."""
+        return self._web3.eth.get_transaction_count(self.sender_address, "latest")
+    
+    def is_transaction_known(self, tx_hash: str) -> bool:
+        """Whether the node still has the transaction (mined or in its mempool)."""
+        try:
+            self._web3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            return False
+        return True
+    
+    def get_receipt(self, tx_hash: str):
+        """Fetch a transaction receipt, or None if it is not mined yet."""
+        try:
+            return self._web3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+    
+    def get_transaction_status(self, hash_id: str) -> Optional[TransactionStatus]:
+        """
+        Get the pipeline status of a queued record.
+        
+        Args:
+            hash_id: The hash returned when the record was queued
+        
+        Returns:
+            TransactionStatus or None if the hash is not tracked
+        """
+        if not hash_id.startswith("0x"):
+            hash_id = "0x" + hash_id
+        
+        status = self._pipeline.get(hash_id)
+        if status is not None:
+            return status
+        
+        # Batched records share the status of their batch root
+        record = self._batcher.get(hash_id) if self._batcher is not None else None
+        if record is None:
+            return None
+        if record.root is None:
+            return TransactionStatus(
+                hash_id=hash_id,
+                user_id=record.user_id,
+                function_name="anchorBatchRoot"
+            )
+        root_status = self._pipeline.get(record.root)
+        if root_status is None:
+            # Anchored by an earlier process
+            if not self._batcher.store.is_anchored(record.root):
+                return None
+            return TransactionStatus(
+                hash_id=hash_id,
+                user_id=record.user_id,
+                function_name="anchorBatchRoot",
+                status=STATUS_CONFIRMED
+            )
+        return replace(root_status, hash_id=hash_id, user_id=record.user_id)
+    
+    def get_batch_proof(self, hash_id: str) -> Optional[BatchProof]:
+        """
+        Get the Merkle inclusion proof for a batched record.
+        
+        Args:
+            hash_id: The record hash (with or without 0x prefix)
+        
+        Returns:
+            BatchProof (root is None until the batch is sealed) or None
+        """
+        if self._batcher is None:
+            return None
+        if not hash_id.startswith("0x"):
+            hash_id = "0x" + hash_id
+        return self._batcher.get(hash_id)
+    
+    async def recover_batches(self) -> int:
+        """
+        Seal and anchor batch records left behind by a previous process.
+        
+        Returns:
+            Number of batch roots queued for anchoring
+        """
+        if self._batcher is None:
+            return 0
+        return await self._batcher.recover()
+    
+    def is_root_anchored(self, root: str) -> bool:
+        """
+        Check whether a batch root is anchored on chain.
+        
+        Confirmed roots are cached (and marked in the batch store), so
+        repeated proof checks stay local.
+        """
+        if root in self._anchored_roots:
+            return True
+        
+        if self._batcher is not None and self._batcher.store.is_anchored(root):
+            anchored_at = 0
+        elif self._index_ready() and self._indexer.is_root_anchored(root):
+            anchored_at = 0
+        else:
+            status = self._pipeline.get(root)
+            if status is not None and status.status == STATUS_CONFIRMED:
+                anchored_at = status.block_number or 0
+            elif not self.is_connected or not self._contract:
+                return False
+            else:
+                anchored, anchored_at = self._contract.functions.isRootAnchored(to_bytes32(root)).call()
+                if not anchored:
+                    return False
+        
+        self._anchored_roots[root] = anchored_at
+        if self._batcher is not None:
+            self._batcher.store.mark_anchored(root)
+        return True
+    
+    async def shutdown(self) -> None:
+        """Flush pending batches and stop background processing."""
+        if self._indexer is not None:
+            self._indexer.stop()
+        try:
+            if self._batcher is not None:
+                await self._batcher.stop()
+            await self._pipeline.drain(timeout=self.config.receipt_poll_seconds * 5)
+        finally:
+            await self._pipeline.stop()
+            if self._connection is not None:
+                self._connection.stop()
+    
+    def verify_hash(
+        self,
+        hash_id: str,
+        proof: Optional[List[str]] = None,
+        root: Optional[str] = None,
+        user_id: Optional[str] = None,
+        event_type: Optional[str] = None
+    ) -> VerificationResult:
         """
         Verify if a hash exists on the blockchain.
         
+        Batched hashes are checked locally: the Merkle proof is folded into
+        a root and the root must be anchored on chain. A proof can be passed
+        explicitly or is looked up from this node's batch store.
+        
         Args:
             hash_id: The hash to verify (with 0x prefix)
+            proof: Optional Merkle proof (hex sibling hashes)
+            root: Batch root the proof is for
+            user_id: User the record belongs to (required with a proof)
+            event_type: "REGISTER" or "LOGIN" (required with a proof)
         
         Returns:
             VerificationResult indicating if hash exists
         """
+        if root is None and self._batcher is not None:
+            record = self._batcher.get(hash_id if hash_id.startswith("0x") else "0x" + hash_id)
+            if record is not None:
+                if record.root is None:
+                    return VerificationResult(
+                        exists=False,
+                        hash_id=hash_id,
+                        user_id=record.user_id,
+                        error="Batch not yet sealed",
+                        method="proof"
+                    )
+                proof, root = record.proof, record.root
+                user_id, event_type = record.user_id, record.event_type
+        
+        if root is not None:
+            return self._verify_batch_proof(hash_id, proof or [], root, user_id, event_type)
+        
+        if self._index_ready():
+            owner = self._indexer.verify(hash_id if hash_id.startswith("0x") else "0x" + hash_id)
+            return VerificationResult(
+                exists=owner is not None,
+                hash_id=hash_id,
+                user_id=owner,
+                method="index"
+            )
+        
         if not self.is_connected:
             return VerificationResult(
                 exists=False,
@@ -538,40 +942,161 @@ class EthereumService:
                 error=str(e)
             )
     
-    def get_user_records(self, user_id: str) -> List[Dict[str, Any]]:
+    def _verify_batch_proof(
+        self,
+        hash_id: str,
+        proof: List[str],
+        root: str,
+        user_id: Optional[str],
+        event_type: Optional[str]
+    ) -> VerificationResult:
+        """Check a Merkle inclusion proof locally against an anchored root."""
+        if not user_id or not event_type:
+            return VerificationResult(
+                exists=False,
+                hash_id=hash_id,
+                root=root,
+                error="user_id and event_type are required to verify a proof",
+                method="proof"
+            )
+        
+        try:
+            leaf = leaf_hash(user_id, hash_id, event_type)
+            included = verify_proof(leaf, [to_bytes32(p) for p in proof], to_bytes32(root))
+            if not included:
+                return VerificationResult(
+                    exists=False,
+                    hash_id=hash_id,
+                    user_id=user_id,
+                    root=root,
+                    error="Proof does not match root",
+                    method="proof"
+                )
+            
+            anchored = self.is_root_anchored(root)
+            return VerificationResult(
+                exists=anchored,
+                hash_id=hash_id,
+                user_id=user_id,
+                root=root,
+                error=None if anchored else "Batch root not anchored yet",
+                method="proof"
+            )
+            
+        except Exception as e:
+            print(f"[Blockchain] Proof verification error: {e}")
+            return VerificationResult(
+                exists=False,
+                hash_id=hash_id,
+                root=root,
+                error=str(e),
+                method="proof"
+            )
+    
+    def get_user_records(
+        self,
+        user_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Get all records for a user.
+        Get records for a user.
         
         Args:
             user_id: Unique user identifier
+            offset: Index of the first record to return
+            limit: Maximum number of records (defaults to config.records_page_limit)
         
         Returns:
             List of user records
         """
+        records, _ = self.get_user_records_page(user_id, offset, limit)
+        return records
+    
+    def get_user_records_page(
+        self,
+        user_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Get a page of records for a user with a constant number of RPCs.
+        
+        Uses the contract's paginated `getUserRecords` (one eth_call). For
+        contracts deployed before it existed, falls back to a JSON-RPC batch
+        of `getUserRecord` calls for the requested page.
+        
+        Args:
+            user_id: Unique user identifier
+            offset: Index of the first record to return
+            limit: Maximum number of records (defaults to config.records_page_limit)
+        
+        Returns:
+            Tuple of (records, total record count)
+        """
+        limit = self.config.records_page_limit if limit is None else limit
+        
+        if self._index_ready():
+            return self._indexer.user_records(user_id, offset, limit)
+        
         if not self.is_connected or not self._contract:
-            return []
+            return [], 0
         
         try:
-            count = self._contract.functions.getUserRecordCount(user_id).call()
-            records = []
+            rows, total = None, 0
+            if self._paged_reads_supported is not False:
+                try:
+                    hash_ids, timestamps, event_types, total = self._contract.functions.getUserRecords(
+                        user_id, offset, limit
+                    ).call()
+                    rows = list(zip(hash_ids, timestamps, event_types))
+                    self._paged_reads_supported = True
+                except (ContractLogicError, BadFunctionCallOutput):
+                    print("[Blockchain] getUserRecords not available, using batched reads")
+                    self._paged_reads_supported = False
+            
+            if rows is None:
+                rows, total = self._get_user_records_batched(user_id, offset, limit)
             
-            for i in range(count):
-                hash_id, timestamp, event_type = self._contract.functions.getUserRecord(
-                    user_id, i
-                ).call()
-                
-                records.append({
+            records = [
+                {
                     "hash_id": "0x" + hash_id.hex(),
                     "timestamp": timestamp,
                     "event_type": event_type,
                     "datetime": datetime.utcfromtimestamp(timestamp).isoformat()
-                })
+                }
+                for hash_id, timestamp, event_type in rows
+            ]
             
-            return records
+            return records, total
             
         except Exception as e:
             print(f"[Blockchain] Get records error: {e}")
-            return []
+            return [], 0
+    
+    def _get_user_records_batched(
+        self,
+        user_id: str,
+        offset: int,
+        limit: int
+    ) -> Tuple[List[Tuple[bytes, int, str]], int]:
+        """Read a page of records with one JSON-RPC batch (web3 v7+)."""
+        total = self._contract.functions.getUserRecordCount(user_id).call()
+        calls = [
+            self._contract.functions.getUserRecord(user_id, i)
+            for i in range(offset, min(total, offset + limit))
+        ]
+        
+        batch_requests = getattr(self._web3, "batch_requests", None)
+        if batch_requests is None:
+            # Older web3 without batching support
+            return [call.call() for call in calls], total
+        
+        with batch_requests() as batch:
+            for call in calls:
+                batch.add(call)
+            rows = batch.execute()
+        return [tuple(row) for row in rows], total
     
     def get_user_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -583,6 +1108,9 @@ class EthereumService:
         Returns:
             User summary or None
         """
+        if self._index_ready():
+            return self._indexer.user_summary(user_id)
+        
         if not self.is_connected or not self._contract:
             return None
         
@@ -610,6 +1138,9 @@ class EthereumService:
         Returns:
             Dictionary with total users, registrations, and logins
         """
+        if self._index_ready():
+            return self._indexer.global_stats()
+        
         if not self.is_connected or not self._contract:
             return None
         
@@ -638,3 +1169,8 @@ def get_ethereum_service() -> EthereumService:
         _ethereum_service = EthereumService()
         _ethereum_service.connect()
     return _ethereum_service
+
+
+def get_existing_ethereum_service() -> Optional[EthereumService]:
+    """The Ethereum service singleton if it has been created, without creating it."""
+    return _ethereum_service
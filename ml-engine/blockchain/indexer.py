@@ -0,0 +1,495 @@
+"""
+Event indexer for the TourGuardIdentity contract.
+
+Follows `RegistrationRecorded`, `LoginRecorded` and `BatchAnchored` events
+into a local SQLite read model so verification, user record and statistics
+queries are answered without an eth_call per request. The indexer backfills
+from a start block, rolls back blocks that were reorganised out within the
+confirmation depth, and periodically reconciles its totals against the
+contract, which stays the source of truth.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from web3 import Web3
+
+if TYPE_CHECKING:
+    from .ethereum_service import EthereumService
+
+
+EVENT_SIGNATURES = {
+    "RegistrationRecorded": "RegistrationRecorded(bytes32,bytes32,uint256,string)",
+    "LoginRecorded": "LoginRecorded(bytes32,bytes32,uint256,string)",
+    "BatchAnchored": "BatchAnchored(bytes32,uint256,uint256)",
+}
+
+EVENT_TYPES = {
+    "RegistrationRecorded": "REGISTER",
+    "LoginRecorded": "LOGIN",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    hash_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_user ON records (user_id, block_number, log_index);
+CREATE INDEX IF NOT EXISTS idx_records_block ON records (block_number);
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    registration_count INTEGER NOT NULL DEFAULT 0,
+    login_count INTEGER NOT NULL DEFAULT 0,
+    first_activity INTEGER NOT NULL,
+    last_activity INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS batches (
+    root TEXT PRIMARY KEY,
+    leaf_count INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_batches_block ON batches (block_number);
+
+CREATE TABLE IF NOT EXISTS blocks (
+    number INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class EventIndexer:
+    """Background indexer maintaining a SQLite read model of contract events."""
+
+    def __init__(
+        self,
+        service: "EthereumService",
+        db_path: Path,
+        start_block: int = 0,
+        confirmations: int = 12,
+        poll_seconds: float = 2.0,
+        chunk_size: int = 2000,
+        reconcile_seconds: float = 300.0,
+    ):
+        self._service = service
+        self.db_path = Path(db_path)
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.poll_seconds = poll_seconds
+        self.chunk_size = chunk_size
+        self.reconcile_seconds = reconcile_seconds
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+        self._topics = {
+            bytes(Web3.keccak(text=signature)): name
+            for name, signature in EVENT_SIGNATURES.items()
+        }
+        self._head: Optional[int] = None
+        self._synced_at: Optional[float] = None
+        self._reconciled_at = 0.0
+        self._in_sync: Optional[bool] = None
+        # 0: in sync, 1: rescanned from the checkpoint, 2: rebuilt, 3: reported
+        self._mismatch_stage = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ============ Lifecycle ============
+
+    def prepare(self) -> None:
+        """Check the index belongs to the current contract before syncing it."""
+        self._check_contract()
+
+    def start(self) -> None:
+        """Start the background sync thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.prepare()
+        self._thread = threading.Thread(target=self._run, name="eth-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds * 2)
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether the read model is caught up closely enough to serve queries."""
+        if self._synced_at is None:
+            return False
+        return time.monotonic() - self._synced_at < max(self.poll_seconds * 3, 10.0)
+
+    @property
+    def last_block(self) -> int:
+        value = self._get_meta("last_block")
+        return int(value) if value is not None else self.start_block - 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready,
+            "last_block": self.last_block,
+            "head": self._head,
+            "confirmations": self.confirmations,
+            "in_sync": self._in_sync,
+            "reconciled_block": self._reconciled_block(),
+            "db_path": str(self.db_path),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+                if time.monotonic() - self._reconciled_at > self.reconcile_seconds:
+                    self.reconcile()
+            except Exception as e:
+                print(f"[Indexer] Sync error: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    # ============ Sync ============
+
+    def sync_once(self) -> int:
+        """
+        Index new blocks up to the chain head.
+
+        Returns:
+            Number of events applied
+        """
+        web3 = self._service.web3
+        contract = self._service.contract
+        head = web3.eth.block_number
+        self._head = head
+
+        self._handle_reorg(head)
+
+        applied = 0
+        from_block = self.last_block + 1
+        while from_block <= head:
+            to_block = min(from_block + self.chunk_size - 1, head)
+            logs = web3.eth.get_logs({
+                "address": contract.address,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+            })
+            block_hash = self._block_hash(to_block)
+
+            with self._lock, self._db:
+                for log in logs:
+                    applied += self._apply_log(log)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO blocks (number, hash) VALUES (?, ?)",
+                    (to_block, block_hash),
+                )
+                self._set_meta("last_block", str(to_block))
+
+            from_block = to_block + 1
+
+        self._prune_blocks(head)
+        self._synced_at = time.monotonic()
+        return applied
+
+    def ingest_logs(self, logs: List[Any]) -> int:
+        """
+        Apply already-fetched contract logs (e.g. from the block scanner).
+
+        Records are keyed by hash ID, so logs seen twice are ignored.
+        """
+        with self._lock, self._db:
+            return sum(self._apply_log(log) for log in logs)
+
+    def _apply_log(self, log: Any) -> int:
+        topics = log["topics"]
+        if not topics:
+            return 0
+        name = self._topics.get(bytes(topics[0]))
+        if name is None:
+            return 0
+
+        event = getattr(self._service.contract.events, name)().process_log(log)
+        args = event["args"]
+        block_number = log["blockNumber"]
+        tx_hash = "0x" + bytes(log["transactionHash"]).hex()
+
+        if name == "BatchAnchored":
+            self._db.execute(
+                "INSERT OR IGNORE INTO batches (root, leaf_count, timestamp, block_number, tx_hash) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ("0x" + args["root"].hex(), args["leafCount"], args["timestamp"], block_number, tx_hash),
+            )
+            return 1
+
+        event_type = EVENT_TYPES[name]
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO records "
+            "(hash_id, user_id, event_type, timestamp, block_number, tx_hash, log_index) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                "0x" + args["hashId"].hex(),
+                args["userId"],
+                event_type,
+                args["timestamp"],
+                block_number,
+                tx_hash,
+                log["logIndex"],
+            ),
+        )
+        if cursor.rowcount != 1:
+            return 0
+
+        self._db.execute(
+            """
+            INSERT INTO users (user_id, registration_count, login_count, first_activity, last_activity)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                registration_count = registration_count + excluded.registration_count,
+                login_count = login_count + excluded.login_count,
+                first_activity = MIN(first_activity, excluded.first_activity),
+                last_activity = MAX(last_activity, excluded.last_activity)
+            """,
+            (
+                args["userId"],
+                1 if event_type == "REGISTER" else 0,
+                1 if event_type == "LOGIN" else 0,
+                args["timestamp"],
+                args["timestamp"],
+            ),
+        )
+        return 1
+
+    def _handle_reorg(self, head: int) -> None:
+        """Roll back to the newest stored block that is still canonical."""
+        with self._lock:
+            stored = self._db.execute(
+                "SELECT number, hash FROM blocks ORDER BY number DESC"
+            ).fetchall()
+        if not stored:
+            return
+
+        ancestor: Optional[int] = None
+        for number, stored_hash in stored:
+            if number <= head and self._block_hash(number) == stored_hash:
+                ancestor = number
+                break
+
+        if ancestor == stored[0][0]:
+            return
+
+        rollback_to = ancestor if ancestor is not None else self.start_block - 1
+        print(f"[Indexer] Reorg detected, rolling back to block {rollback_to}")
+        self.rollback(rollback_to)
+
+    def rollback(self, block_number: int) -> None:
+        """Drop everything indexed after `block_number` and rebuild user totals."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM records WHERE block_number > ?", (block_number,))
+            self._db.execute("DELETE FROM batches WHERE block_number > ?", (block_number,))
+            self._db.execute("DELETE FROM blocks WHERE number > ?", (block_number,))
+            self._db.execute(
+                "DELETE FROM meta WHERE key = 'reconciled_block' AND CAST(value AS INTEGER) > ?",
+                (block_number,),
+            )
+            self._rebuild_users()
+            self._set_meta("last_block", str(block_number))
+
+    def _rebuild_users(self) -> None:
+        self._db.execute("DELETE FROM users")
+        self._db.execute(
+            """
+            INSERT INTO users (user_id, registration_count, login_count, first_activity, last_activity)
+            SELECT user_id,
+                   SUM(event_type = 'REGISTER'),
+                   SUM(event_type = 'LOGIN'),
+                   MIN(timestamp),
+                   MAX(timestamp)
+            FROM records GROUP BY user_id
+            """
+        )
+
+    def _prune_blocks(self, head: int) -> None:
+        """Forget hashes of blocks deeper than the confirmation depth (keep the newest)."""
+        final = head - self.confirmations
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM blocks WHERE number < ? AND number < (SELECT MAX(number) FROM blocks)",
+                (final,),
+            )
+
+    def reconcile(self) -> Dict[str, Any]:
+        """
+        Compare indexed totals against the contract.
+
+        On a mismatch, the blocks after the last reconciled block are
+        re-read on the next sync; if there is no such block, or a mismatch
+        follows that rescan, the index is rebuilt from the start block
+        once. A mismatch that survives the full rebuild (for example with
+        a start block after the deployment) is only reported, as
+        `in_sync: false` in `status()`, until the totals match again.
+
+        Returns:
+            Dictionary with chain totals, index totals and whether they match
+        """
+        self._reconciled_at = time.monotonic()
+        last_block = self.last_block
+        if last_block < self.start_block:
+            return {"chain": None, "index": self.global_stats(), "in_sync": True}
+
+        # Compare at the block the index has reached, not at the moving head
+        chain = self._service.contract.functions.getGlobalStats().call(block_identifier=last_block)
+        chain_stats = {
+            "total_users": chain[0],
+            "total_registrations": chain[1],
+            "total_logins": chain[2],
+        }
+        index_stats = self.global_stats()
+
+        in_sync = chain_stats == index_stats
+        self._in_sync = in_sync
+        checkpoint = self._reconciled_block()
+        if in_sync:
+            # Matching again at the checkpoint itself proves nothing new
+            if checkpoint is None or last_block > checkpoint:
+                self._mismatch_stage = 0
+            with self._lock, self._db:
+                self._set_meta("reconciled_block", str(last_block))
+        elif self._mismatch_stage == 0 and checkpoint is not None:
+            print(f"[Indexer] Reconciliation mismatch chain={chain_stats} index={index_stats}; "
+                  f"rescanning from block {checkpoint + 1}")
+            self._mismatch_stage = 1
+            self.rollback(checkpoint)
+        elif self._mismatch_stage < 2:
+            print(f"[Indexer] Reconciliation mismatch chain={chain_stats} index={index_stats}; reindexing")
+            self._mismatch_stage = 2
+            self.rollback(self.start_block - 1)
+        elif self._mismatch_stage == 2:
+            print(f"[Indexer] Totals still differ after a full rebuild chain={chain_stats} "
+                  f"index={index_stats}; not reindexing again")
+            self._mismatch_stage = 3
+
+        return {"chain": chain_stats, "index": index_stats, "in_sync": in_sync}
+
+    # ============ Queries ============
+
+    def verify(self, hash_id: str) -> Optional[str]:
+        """
+        Look up a hash in the read model.
+
+        Returns:
+            The owning user ID, or None if the hash is not indexed
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT user_id FROM records WHERE hash_id = ?", (hash_id.lower(),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def is_root_anchored(self, root: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM batches WHERE root = ?", (root.lower(),)
+            ).fetchone()
+        return row is not None
+
+    def user_records(self, user_id: str, offset: int, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        with self._lock:
+            total_row = self._db.execute(
+                "SELECT registration_count + login_count FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            rows = self._db.execute(
+                "SELECT hash_id, timestamp, event_type FROM records WHERE user_id = ? "
+                "ORDER BY block_number, log_index LIMIT ? OFFSET ?",
+                (user_id, limit, offset),
+            ).fetchall()
+
+        records = [
+            {
+                "hash_id": hash_id,
+                "timestamp": timestamp,
+                "event_type": event_type,
+                "datetime": datetime.utcfromtimestamp(timestamp).isoformat()
+            }
+            for hash_id, timestamp, event_type in rows
+        ]
+        return records, total_row[0] if total_row else 0
+
+    def user_summary(self, user_id: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT registration_count, login_count, first_activity, last_activity "
+                "FROM users WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+        registrations, logins, first, last = row if row else (0, 0, 0, 0)
+        return {
+            "registration_count": registrations,
+            "login_count": logins,
+            "first_activity": first,
+            "last_activity": last,
+            "is_registered": row is not None,
+            "first_activity_datetime": datetime.utcfromtimestamp(first).isoformat() if first > 0 else None,
+            "last_activity_datetime": datetime.utcfromtimestamp(last).isoformat() if last > 0 else None
+        }
+
+    def global_stats(self) -> Dict[str, int]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(registration_count), 0), COALESCE(SUM(login_count), 0) FROM users"
+            ).fetchone()
+        return {
+            "total_users": row[0],
+            "total_registrations": row[1],
+            "total_logins": row[2]
+        }
+
+    # ============ Helpers ============
+
+    def _check_contract(self) -> None:
+        """Reset the index if it was built for a different contract."""
+        address = self._service.contract.address.lower()
+        indexed = self._get_meta("contract_address")
+        if indexed is not None and indexed != address:
+            print(f"[Indexer] Contract changed ({indexed} -> {address}), resetting index")
+            self.rollback(self.start_block - 1)
+        with self._lock, self._db:
+            self._set_meta("contract_address", address)
+
+    def _reconciled_block(self) -> Optional[int]:
+        """Newest block at which the indexed totals matched the contract."""
+        value = self._get_meta("reconciled_block")
+        return int(value) if value is not None else None
+
+    def _block_hash(self, number: int) -> str:
+        return "0x" + bytes(self._service.web3.eth.get_block(number)["hash"]).hex()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
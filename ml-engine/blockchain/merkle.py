@@ -0,0 +1,111 @@
+"""
+Merkle tree helpers for batch anchoring of identity hashes.
+
+Leaves and internal nodes use keccak256 with sorted-pair hashing, matching
+`TourGuardIdentity.verifyBatchProof`, so a proof built here can be checked
+either locally or on chain. Leaves are prefixed with 0x00 and internal
+nodes with 0x01, so an internal node can never pass as a leaf. An odd node
+at the end of a level is promoted unchanged to the next level.
+"""
+
+from __future__ import annotations
+
+from typing import List, Sequence
+
+from eth_abi import encode
+from web3 import Web3
+
+EVENT_TYPES = ("REGISTER", "LOGIN")
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(user_id: str, hash_id: str, event_type: str) -> bytes:
+    """
+    Compute the leaf for a record.
+
+    Args:
+        user_id: Unique user identifier
+        hash_id: Record hash (with or without 0x prefix)
+        event_type: "REGISTER" or "LOGIN"
+
+    Returns:
+        keccak256(abi.encodePacked(bytes1(0x00), abi.encode(userId, hashId, eventType)))
+
+    Raises:
+        ValueError: If event_type is not REGISTER or LOGIN
+    """
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"event_type must be one of {', '.join(EVENT_TYPES)}")
+    return bytes(Web3.keccak(LEAF_PREFIX + encode(
+        ["string", "bytes32", "string"],
+        [user_id, to_bytes32(hash_id), event_type],
+    )))
+
+
+def hash_pair(a: bytes, b: bytes) -> bytes:
+    """Hash two nodes in sorted order, as an internal node."""
+    return bytes(Web3.keccak(NODE_PREFIX + (a + b if a < b else b + a)))
+
+
+def to_bytes32(value: str) -> bytes:
+    """Convert a 0x-prefixed (or bare) hex string to 32 bytes."""
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+
+def to_hex(value: bytes) -> str:
+    return "0x" + value.hex()
+
+
+class MerkleTree:
+    """Merkle tree over a fixed list of leaves."""
+
+    def __init__(self, leaves: Sequence[bytes]):
+        if not leaves:
+            raise ValueError("Merkle tree requires at least one leaf")
+
+        self._levels: List[List[bytes]] = [list(leaves)]
+        while len(self._levels[-1]) > 1:
+            level = self._levels[-1]
+            parents = [
+                hash_pair(level[i], level[i + 1])
+                for i in range(0, len(level) - 1, 2)
+            ]
+            if len(level) % 2 == 1:
+                parents.append(level[-1])
+            self._levels.append(parents)
+
+    @property
+    def root(self) -> bytes:
+        return self._levels[-1][0]
+
+    def __len__(self) -> int:
+        return len(self._levels[0])
+
+    def proof(self, index: int) -> List[bytes]:
+        """
+        Build the inclusion proof for the leaf at `index`.
+
+        Returns:
+            Sibling hashes from the leaf level up to (excluding) the root
+        """
+        proof = []
+        for level in self._levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                proof.append(level[sibling])
+            index //= 2
+        return proof
+
+
+def compute_root(leaf: bytes, proof: Sequence[bytes]) -> bytes:
+    """Fold a proof into the root it implies."""
+    computed = leaf
+    for sibling in proof:
+        computed = hash_pair(computed, sibling)
+    return computed
+
+
+def verify_proof(leaf: bytes, proof: Sequence[bytes], root: bytes) -> bool:
+    """Check that `leaf` is included under `root`."""
+    return compute_root(leaf, proof) == root
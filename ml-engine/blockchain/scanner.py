@@ -0,0 +1,209 @@
+"""
+Block scanner for the explorer tools.
+
+Fetches blocks (and, for matching transactions only, their receipts)
+concurrently, yields them in block order, and records the last fully
+scanned block in a checkpoint file so later runs can pick up where the
+previous one stopped. After a scan the local event index is brought up
+to date through its own sync, which tracks block hashes and so handles
+reorgs of the newest blocks.
+"""
+
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from web3 import Web3
+
+from .indexer import EventIndexer
+
+
+CHECKPOINT_DIR = Path(__file__).parent.parent / "data"
+
+
+@dataclass
+class ScannedBlock:
+    """A block with the selected transactions and their receipts."""
+    number: int
+    block: Any
+    transactions: List[Any] = field(default_factory=list)
+    receipts: Dict[str, Any] = field(default_factory=dict)
+
+    def receipt(self, tx) -> Optional[Any]:
+        return self.receipts.get(bytes(tx["hash"]).hex())
+
+
+class BlockScanner:
+    """Concurrent, resumable block scanner."""
+
+    def __init__(
+        self,
+        web3: Web3,
+        contract_address: Optional[str] = None,
+        contract_only: bool = False,
+        workers: int = 8,
+        checkpoint_path: Optional[Path] = None,
+        indexer: Optional[EventIndexer] = None,
+        fetch_receipts: bool = True,
+    ):
+        if contract_only and not contract_address:
+            raise ValueError("contract_only requires a contract address")
+
+        self.web3 = web3
+        self.contract_address = (
+            Web3.to_checksum_address(contract_address) if contract_address else None
+        )
+        self.contract_only = contract_only
+        self.workers = max(1, workers)
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.indexer = indexer
+        self.fetch_receipts = fetch_receipts
+
+    # ============ Checkpoint ============
+
+    def load_checkpoint(self) -> Optional[int]:
+        """Last fully scanned block from the checkpoint, if it is still on chain."""
+        if self.checkpoint_path is None or not self.checkpoint_path.exists():
+            return None
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            # Written by a scan of another contract or filter mode
+            if (checkpoint.get("contract_address"), checkpoint.get("contract_only")) != (
+                self.contract_address,
+                self.contract_only,
+            ):
+                return None
+            number = int(checkpoint["last_block"])
+            # A restarted dev chain reuses block numbers; only trust a matching hash
+            block = self.web3.eth.get_block(number)
+            if bytes(block["hash"]).hex() != checkpoint.get("block_hash"):
+                return None
+            return number
+        except Exception:
+            return None
+
+    def save_checkpoint(self, scanned: ScannedBlock) -> None:
+        if self.checkpoint_path is None:
+            return
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "last_block": scanned.number,
+                "block_hash": bytes(scanned.block["hash"]).hex(),
+                "contract_address": self.contract_address,
+                "contract_only": self.contract_only,
+            }, f)
+        tmp.replace(self.checkpoint_path)
+
+    # ============ Scanning ============
+
+    def scan(self, start: int = 0, end: Optional[int] = None) -> Iterator[ScannedBlock]:
+        """
+        Scan blocks `start`..`end` (inclusive, default latest) in order.
+
+        Blocks are fetched `workers` at a time; the checkpoint is advanced
+        after each block has been yielded. Once every block has been
+        yielded, the event index (if any) syncs up to the chain head.
+        """
+        if end is None:
+            end = self.web3.eth.block_number
+        if start > end:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for window_start in range(start, end + 1, self.workers):
+                numbers = range(window_start, min(window_start + self.workers, end + 1))
+                blocks = list(pool.map(self._fetch_block, numbers))
+
+                selected = [tx for scanned in blocks for tx in scanned.transactions]
+                if self.fetch_receipts and selected:
+                    receipts = pool.map(self._fetch_receipt, selected)
+                    for tx, receipt in zip(selected, receipts):
+                        blocks[tx["blockNumber"] - window_start].receipts[bytes(tx["hash"]).hex()] = receipt
+
+                for scanned in blocks:
+                    yield scanned
+                    self.save_checkpoint(scanned)
+
+        if self.indexer is not None:
+            # Not fed from the scanned receipts: the indexer's sync records
+            # block hashes, so logs of blocks that are later reorged away
+            # are rolled back instead of staying in the index
+            self.indexer.sync_once()
+
+    def _fetch_block(self, number: int) -> ScannedBlock:
+        block = self.web3.eth.get_block(number, full_transactions=True)
+        transactions = [tx for tx in block["transactions"] if self._selected(tx)]
+        return ScannedBlock(number=number, block=block, transactions=transactions)
+
+    def _fetch_receipt(self, tx) -> Any:
+        return self.web3.eth.get_transaction_receipt(tx["hash"])
+
+    def _selected(self, tx) -> bool:
+        if not self.contract_only:
+            return True
+        return tx["to"] is not None and Web3.to_checksum_address(tx["to"]) == self.contract_address
+
+
+# ============ CLI helpers ============
+
+def add_scan_arguments(parser) -> None:
+    """Add the shared scanning flags to an argparse parser."""
+    parser.add_argument(
+        "--since", default="0",
+        help="First block to scan, or 'last' to resume after the previous run's checkpoint"
+    )
+    parser.add_argument(
+        "--all-transactions", action="store_true",
+        help="Show every transaction, not only those sent to the TourGuard contract"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8,
+        help="Number of concurrent block/receipt fetches"
+    )
+    parser.add_argument(
+        "--no-index", action="store_true",
+        help="Don't update the local event index after the scan"
+    )
+
+
+def checkpoint_for(tool: str) -> Path:
+    """Checkpoint file of one CLI tool, so tools don't resume from each other."""
+    return CHECKPOINT_DIR / f"block_scanner.{tool}.json"
+
+
+def scanner_from_args(service, args, checkpoint_path: Optional[Path] = None) -> BlockScanner:
+    """Build a scanner over a connected EthereumService from parsed CLI args."""
+    indexer = None
+    if service.contract is not None and not args.no_index:
+        indexer = service.indexer
+        if indexer is None:
+            indexer = EventIndexer(
+                service,
+                db_path=Path(service.config.indexer_db_path),
+                start_block=service.config.indexer_start_block,
+                confirmations=service.config.indexer_confirmations
+            )
+            indexer.prepare()
+    return BlockScanner(
+        service.web3,
+        checkpoint_path=checkpoint_path,
+        contract_address=service.config.contract_address,
+        contract_only=not args.all_transactions,
+        workers=args.workers,
+        indexer=indexer,
+    )
+
+
+def resolve_start(scanner: BlockScanner, since: str) -> int:
+    """Turn a --since value into the first block to scan."""
+    if since == "last":
+        last = scanner.load_checkpoint()
+        return 0 if last is None else last + 1
+    return int(since)
@@ -0,0 +1,229 @@
+"""
+Asynchronous transaction pipeline for TourGuard identity records.
+
+API handlers enqueue a hash and return immediately. A pool of sender
+workers signs and submits contract transactions (nonces come from the
+service's local nonce manager, so many can be in flight at once) and a
+receipt watcher polls for confirmation, so blocking web3 calls never run
+on the event loop. A transaction without a receipt after the timeout is
+marked timed out but still watched; it only fails once its nonce has been
+used by another transaction or the node has dropped it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .ethereum_service import EthereumService
+
+
+STATUS_PENDING = "pending"
+STATUS_SUBMITTED = "submitted"
+STATUS_CONFIRMED = "confirmed"
+STATUS_TIMED_OUT = "timed_out"
+STATUS_FAILED = "failed"
+
+# Still waiting on the chain (kept in the tracked statuses)
+_LIVE_STATUSES = (STATUS_PENDING, STATUS_SUBMITTED, STATUS_TIMED_OUT)
+
+
+@dataclass
+class TransactionStatus:
+    """Lifecycle of a single queued contract transaction."""
+    hash_id: str
+    user_id: str
+    function_name: str
+    status: str = STATUS_PENDING
+    tx_hash: Optional[str] = None
+    nonce: Optional[int] = None
+    block_number: Optional[int] = None
+    gas_used: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+    submitted_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hash_id": self.hash_id,
+            "user_id": self.user_id,
+            "function_name": self.function_name,
+            "status": self.status,
+            "tx_hash": self.tx_hash,
+            "block_number": self.block_number,
+            "gas_used": self.gas_used,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+
+class TransactionPipeline:
+    """Queue, sender and receipt watcher for contract writes."""
+
+    def __init__(self, service: "EthereumService", max_tracked: int = 10000):
+        self._service = service
+        self._max_tracked = max_tracked
+        self._statuses: "OrderedDict[str, TransactionStatus]" = OrderedDict()
+        self._in_flight: Dict[str, TransactionStatus] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def start(self) -> None:
+        """Start the sender and receipt watcher on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks and not any(t.done() for t in self._tasks):
+            return
+
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self._service.config.tx_queue_size)
+        workers = max(1, self._service.config.sender_workers)
+        self._tasks = [loop.create_task(self._sender()) for _ in range(workers)]
+        self._tasks.append(loop.create_task(self._receipt_watcher()))
+
+    async def stop(self) -> None:
+        """Cancel background tasks."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def drain(self, timeout: float) -> None:
+        """Wait (up to `timeout` seconds) for queued transactions to be sent."""
+        if self._queue is None or not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[Blockchain] {self._queue.qsize()} transaction(s) still queued at shutdown")
+
+    async def enqueue(
+        self,
+        function_name: str,
+        user_id: str,
+        hash_id: str,
+        args: Tuple[Any, ...],
+    ) -> TransactionStatus:
+        """
+        Queue a contract call and return its pending status.
+
+        Args:
+            function_name: Contract function to call
+            user_id: User the record belongs to
+            hash_id: Hash being anchored (with 0x prefix)
+            args: Positional arguments for the contract function
+
+        Returns:
+            TransactionStatus in the pending state
+        """
+        self.start()
+        status = TransactionStatus(
+            hash_id=hash_id,
+            user_id=user_id,
+            function_name=function_name,
+        )
+        self._track(status)
+        await self._queue.put((status, args))
+        return status
+
+    def get(self, hash_id: str) -> Optional[TransactionStatus]:
+        """Look up the status of a queued transaction by hash ID."""
+        return self._statuses.get(hash_id)
+
+    def _track(self, status: TransactionStatus) -> None:
+        self._statuses[status.hash_id] = status
+        self._statuses.move_to_end(status.hash_id)
+        while len(self._statuses) > self._max_tracked:
+            oldest = next(iter(self._statuses.values()))
+            if oldest.status in _LIVE_STATUSES:
+                break
+            self._statuses.popitem(last=False)
+
+    @staticmethod
+    def _mark(status: TransactionStatus, state: str, error: Optional[str] = None) -> None:
+        status.status = state
+        status.error = error
+        status.updated_at = datetime.utcnow()
+
+    async def _sender(self) -> None:
+        while True:
+            status, args = await self._queue.get()
+            try:
+                tx_hash, nonce = await asyncio.to_thread(
+                    self._service.send_contract_transaction,
+                    status.function_name,
+                    args,
+                )
+                status.tx_hash = tx_hash
+                status.nonce = nonce
+                status.submitted_at = datetime.utcnow()
+                self._mark(status, STATUS_SUBMITTED)
+                self._in_flight[status.hash_id] = status
+            except Exception as e:
+                print(f"[Blockchain] Send error for {status.hash_id}: {e}")
+                self._mark(status, STATUS_FAILED, str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _receipt_watcher(self) -> None:
+        config = self._service.config
+        while True:
+            await asyncio.sleep(config.receipt_poll_seconds)
+
+            for status in list(self._in_flight.values()):
+                try:
+                    receipt = await asyncio.to_thread(self._service.get_receipt, status.tx_hash)
+                except Exception as e:
+                    print(f"[Blockchain] Receipt error for {status.tx_hash}: {e}")
+                    continue
+
+                if receipt is None:
+                    waited = (datetime.utcnow() - status.submitted_at).total_seconds()
+                    if waited > config.receipt_timeout_seconds:
+                        if status.status != STATUS_TIMED_OUT:
+                            self._mark(status, STATUS_TIMED_OUT, "No receipt yet; still watching")
+                        try:
+                            await self._check_dropped(status)
+                        except Exception as e:
+                            print(f"[Blockchain] Nonce check error for {status.tx_hash}: {e}")
+                    continue
+
+                status.block_number = receipt.blockNumber
+                status.gas_used = receipt.gasUsed
+                if receipt.status == 1:
+                    self._mark(status, STATUS_CONFIRMED)
+                else:
+                    self._mark(status, STATUS_FAILED, "Transaction reverted")
+                self._in_flight.pop(status.hash_id, None)
+
+    async def _check_dropped(self, status: TransactionStatus) -> None:
+        """Fail a timed-out transaction once it can no longer be mined."""
+        service = self._service
+        if await asyncio.to_thread(service.get_mined_nonce) > status.nonce:
+            reason = "Nonce used by another transaction"
+        elif not await asyncio.to_thread(service.is_transaction_known, status.tx_hash):
+            reason = "Dropped by the node"
+        else:
+            return  # still in the mempool
+
+        # It may have been mined since its receipt was polled
+        if await asyncio.to_thread(service.get_receipt, status.tx_hash) is not None:
+            return
+        self._mark(status, STATUS_FAILED, reason)
+        self._in_flight.pop(status.hash_id, None)
+        # A dropped transaction leaves a nonce gap behind it
+        service.resync_nonce()
@@ -2,90 +2,86 @@
 TourGuard Blockchain Explorer
 Shows blocks and hash IDs from user registrations/logins
 """
-from web3 import Web3
-import json
+import argparse
+import sys
 from pathlib import Path
-from dotenv import load_dotenv
-import os
 
-# Load environment
-load_dotenv(Path(__file__).parent / ".env")
+sys.path.insert(0, str(Path(__file__).parent))
 
-# Connect to Ganache
-w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+from blockchain.ethereum_service import get_ethereum_service
+from blockchain.scanner import add_scan_arguments, checkpoint_for, resolve_start, scanner_from_args
 
-if not w3.is_connected():
-    print("[X] Not connected to blockchain. Make sure Ganache is running.")
-    exit(1)
 
-# Load contract ABI
-abi_path = Path(__file__).parent / "blockchain" / "TourGuardIdentity.abi.json"
-if abi_path.exists():
-    with open(abi_path) as f:
-        abi = json.load(f)
-else:
-    print("[X] Contract ABI not found. Deploy the contract first.")
+parser = argparse.ArgumentParser(description="Show TourGuard registration/login transactions")
+add_scan_arguments(parser)
+args = parser.parse_args()
+
+service = get_ethereum_service()
+
+if not service.is_connected:
+    print("[X] Not connected to blockchain. Make sure Ganache is running.")
     exit(1)
 
 # Get contract address
-contract_address = os.getenv("ETH_CONTRACT_ADDRESS")
+contract_address = service.config.contract_address
 if not contract_address:
     print("[X] Contract address not set. Check .env file.")
     exit(1)
 
-contract = w3.eth.contract(
-    address=Web3.to_checksum_address(contract_address),
-    abi=abi
-)
+w3 = service.web3
+scanner = scanner_from_args(service, args, checkpoint_for("explorer"))
+start_block = resolve_start(scanner, args.since)
+
+REGISTRATION_TOPIC = w3.keccak(text="RegistrationRecorded(bytes32,bytes32,uint256,string)")
+LOGIN_TOPIC = w3.keccak(text="LoginRecorded(bytes32,bytes32,uint256,string)")
 
 print("=" * 70)
 print("TOURGUARD BLOCKCHAIN EXPLORER")
 print("=" * 70)
 print(f"Contract: {contract_address}")
-print(f"Network:  http://127.0.0.1:8545")
+print(f"Network:  {service.config.rpc_url}")
 
 # Get blockchain stats
 latest_block = w3.eth.block_number
 print(f"\n[+] Total Blocks: {latest_block + 1}")
+print(f"[+] Scanning:     #{start_block} to #{latest_block}")
 
 # Show all blocks with transactions
 print("\n" + "-" * 70)
 print("BLOCKS WITH REGISTRATION/LOGIN TRANSACTIONS")
 print("-" * 70)
 
-for block_num in range(latest_block + 1):
-    block = w3.eth.get_block(block_num, full_transactions=True)
+for scanned in scanner.scan(start_block, latest_block):
+    block = scanned.block
     
-    if len(block['transactions']) > 0:
-        print(f"\n[BLOCK {block_num}]")
+    if len(scanned.transactions) > 0:
+        print(f"\n[BLOCK {scanned.number}]")
         print(f"  Block Hash: {block['hash'].hex()}")
         print(f"  Timestamp:  {block['timestamp']}")
         
-        for tx in block['transactions']:
+        for tx in scanned.transactions:
             tx_hash = tx['hash'].hex()
             print(f"\n  [TX] {tx_hash}")
             print(f"       From: {tx['from']}")
             print(f"       To:   {tx['to']}")
             print(f"       Gas:  {tx['gas']}")
             
-            # Get transaction receipt for logs
-            receipt = w3.eth.get_transaction_receipt(tx['hash'])
-            
-            # Decode events
-            for log in receipt['logs']:
-                try:
-                    # Check for RegistrationRecorded event
-                    if log['topics'][0].hex() == w3.keccak(text="RegistrationRecorded(bytes32,bytes32,uint256,string)").hex():
-                        hash_id = "0x" + log['data'][2:66]
-                        print(f"       [EVENT] REGISTRATION")
-                        print(f"       Hash ID: {hash_id}")
-                    # Check for LoginRecorded event
-                    elif log['topics'][0].hex() == w3.keccak(text="LoginRecorded(bytes32,bytes32,uint256,string)").hex():
-                        hash_id = "0x" + log['data'][2:66]
-                        print(f"       [EVENT] LOGIN")
-                        print(f"       Hash ID: {hash_id}")
-                except:
-                    pass
+            # Decode events from the prefetched receipt
+            for log in scanned.receipt(tx)['logs']:
+                if not log['topics']:
+                    continue
+                # Check for RegistrationRecorded event
+                if log['topics'][0] == REGISTRATION_TOPIC:
+                    hash_id = "0x" + bytes(log['data'])[:32].hex()
+                    print(f"       [EVENT] REGISTRATION")
+                    print(f"       Hash ID: {hash_id}")
+                # Check for LoginRecorded event
+                elif log['topics'][0] == LOGIN_TOPIC:
+                    hash_id = "0x" + bytes(log['data'])[:32].hex()
+                    print(f"       [EVENT] LOGIN")
+                    print(f"       Hash ID: {hash_id}")
+
+print(f"\n[+] Checkpoint saved; run with --since last to continue from block #{latest_block + 1}")
 
 print("\n" + "=" * 70)
 print("HOW TO MATCH HASH IDs:")
@@ -4,19 +4,16 @@ TourGuard Blockchain Block Viewer
 Displays detailed blockchain information including blocks, transactions, and TourGuard statistics.
 """
 
-from web3 import Web3
 from datetime import datetime
+import argparse
 import sys
 from pathlib import Path
 
 # Add parent directory to path for blockchain module
 sys.path.insert(0, str(Path(__file__).parent))
 
-try:
-    from blockchain.ethereum_service import get_ethereum_service
-    USE_SERVICE = True
-except ImportError:
-    USE_SERVICE = False
+from blockchain.ethereum_service import get_ethereum_service
+from blockchain.scanner import add_scan_arguments, checkpoint_for, resolve_start, scanner_from_args
 
 
 def format_timestamp(timestamp):
@@ -29,9 +26,10 @@ def print_separator(char="=", length=80):
     print(char * length)
 
 
-def display_block_details(w3, block_num):
-    """Display detailed information about a specific block."""
-    block = w3.eth.get_block(block_num, full_transactions=True)
+def display_block_details(w3, scanned):
+    """Display detailed information about a scanned block."""
+    block = scanned.block
+    block_num = scanned.number
     
     print(f"\n{'='*80}")
     print(f"BLOCK #{block_num}")
@@ -44,13 +42,13 @@ def display_block_details(w3, block_num):
     print(f"Gas Used:      {block.gasUsed:,} ({block.gasUsed/block.gasLimit*100:.1f}%)")
     print(f"Transactions:  {len(block.transactions)}")
     
-    # Display transaction details
-    if len(block.transactions) > 0:
+    # Display transaction details (already filtered by the scanner)
+    if len(scanned.transactions) > 0:
         print(f"\n{'-'*80}")
         print("TRANSACTIONS:")
         print(f"{'-'*80}")
         
-        for i, tx in enumerate(block.transactions, 1):
+        for i, tx in enumerate(scanned.transactions, 1):
             print(f"\n  Transaction #{i}")
             print(f"  Hash:      {tx.hash.hex()}")
             print(f"  From:      {tx['from']}")
@@ -59,9 +57,9 @@ def display_block_details(w3, block_num):
             print(f"  Gas:       {tx.gas:,}")
             print(f"  Gas Price: {w3.from_wei(tx.gasPrice, 'gwei')} Gwei")
             
-            # Get receipt for status and gas used
+            # Receipt for status and gas used (prefetched by the scanner)
             try:
-                receipt = w3.eth.get_transaction_receipt(tx.hash)
+                receipt = scanned.receipt(tx)
                 status_icon = "✓" if receipt.status == 1 else "✗"
                 print(f"  Status:    {status_icon} {'Success' if receipt.status == 1 else 'Failed'}")
                 print(f"  Gas Used:  {receipt.gasUsed:,}")
@@ -79,10 +77,16 @@ def display_block_details(w3, block_num):
 
 def main():
     """Main function."""
-    # Connect to blockchain
-    w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+    parser = argparse.ArgumentParser(description="Display blockchain blocks and TourGuard statistics")
+    add_scan_arguments(parser)
+    args = parser.parse_args()
     
-    if not w3.is_connected():
+    # Connect through the service, for the pooled connection and the local
+    # event index
+    service = get_ethereum_service()
+    w3 = service.web3
+    
+    if w3 is None or not w3.is_connected():
         print("\n❌ Not connected to blockchain")
         print("   Make sure Ganache is running on http://127.0.0.1:8545")
         return
@@ -107,31 +111,38 @@ def main():
         balance = w3.from_wei(w3.eth.get_balance(acc), 'ether')
         print(f"{i}. {acc}: {balance:.6f} ETH")
     
-    # Display all blocks
+    if not args.all_transactions and not service.config.contract_address:
+        print("\n❌ Filtering to TourGuard transactions needs ETH_CONTRACT_ADDRESS to be set")
+        print("   (or pass --all-transactions)")
+        return
+    scanner = scanner_from_args(service, args, checkpoint_for("view_blocks"))
+    start_block = resolve_start(scanner, args.since)
+    
+    # Display blocks
     print(f"\n{'='*80}")
-    print("BLOCKCHAIN BLOCKS")
+    print(f"BLOCKCHAIN BLOCKS (#{start_block} to #{latest_block})")
     print(f"{'='*80}")
     
-    for block_num in range(latest_block + 1):
-        display_block_details(w3, block_num)
-    
-    # TourGuard statistics (if service is available)
-    if USE_SERVICE:
-        try:
-            service = get_ethereum_service()
-            if service.is_connected:
-                stats = service.get_global_stats()
-                
-                print(f"\n{'='*80}")
-                print("TOURGUARD STATISTICS")
-                print(f"{'='*80}")
-                print(f"\nContract:      {service.config.contract_address or 'Not deployed'}")
-                print(f"Total Users:   {stats.get('total_users', 0)}")
-                print(f"Registrations: {stats.get('total_registrations', 0)}")
-                print(f"Logins:        {stats.get('total_logins', 0)}")
-        except Exception as e:
-            print(f"\n⚠ Could not fetch TourGuard stats: {str(e)}")
+    for scanned in scanner.scan(start_block, latest_block):
+        if not args.all_transactions and not scanned.transactions:
+            continue
+        display_block_details(w3, scanned)
     
+    # TourGuard statistics
+    try:
+        if service.is_connected:
+            stats = service.get_global_stats()
+            
+            print(f"\n{'='*80}")
+            print("TOURGUARD STATISTICS")
+            print(f"{'='*80}")
+            print(f"\nContract:      {service.config.contract_address or 'Not deployed'}")
+            print(f"Total Users:   {stats.get('total_users', 0)}")
+            print(f"Registrations: {stats.get('total_registrations', 0)}")
+            print(f"Logins:        {stats.get('total_logins', 0)}")
+    except Exception as e:
+        print(f"\n⚠ Could not fetch TourGuard stats: {str(e)}")
+
     print(f"\n{'='*80}")
     print("API Endpoints:")
     print(f"{'='*80}")